@@ -1,44 +1,123 @@
-import tweepy
 import os
 import time
 import random
-from datetime import datetime
+from datetime import datetime, timezone
+import html
 import logging
-import requests
-from bs4 import BeautifulSoup
 import json
-from dotenv import load_dotenv
-import tweepy.client
-
-# Load environment variables from .env file
-load_dotenv()
-
-# Set up logging
-log_file_path = "/tmp/twitter_agent.log"  # Change log file path to /tmp
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(log_file_path),  # Update the log file path
-        logging.StreamHandler()
-    ]
-)
+import re
+import asyncio
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from metrics import get_metrics, timed
+from tweet_text import MAX_WEIGHTED_LENGTH, is_valid, truncate, weighted_length
+
+# tweepy, requests and openai are imported on the code paths that need them,
+# so importing this module (and a Lambda cold start) stays cheap
+
+# Load environment variables from .env file when running locally; Lambda
+# gets its configuration from the function environment
+if not os.getenv("AWS_LAMBDA_FUNCTION_NAME"):
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+
+# Handlers are set up by the entry point (logging_setup.configure_logging),
+# not at import time
 logger = logging.getLogger("TwitterAgent")
 
+# Topics used when the trending sources are slow, empty or failing
+FALLBACK_TOPICS = [
+    "Large Language Models and their applications",
+    "AI in healthcare advancements",
+    "Ethical considerations in AI development",
+    "Computer vision breakthroughs",
+    "AI for climate change solutions",
+    "Multimodal AI systems",
+    "Reinforcement learning from human feedback",
+    "AI alignment research progress"
+]
+MIN_TRENDING_TOPICS = 5
+
+# Used when a generated link is dead and the topic has no source URL
+FALLBACK_LINK = "https://arxiv.org/abs/2303.08774"
+
+# How long a successful verify_credentials() is trusted before re-checking
+CREDENTIALS_VERIFY_TTL = float(os.getenv("TWITTER_VERIFY_TTL", "3600"))
+
+# OpenAI generation settings
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4")
+OPENAI_TEMPERATURE = 0.7
+SYSTEM_PROMPT = "You are a professional AI social media manager with expertise in finding relevant resources."
+# Stream completions and stop as soon as every TWEET/LINK/COMMENT field is in
+OPENAI_STREAM = os.getenv("OPENAI_STREAM", "").lower() in ("1", "true", "yes")
+
+# Defaults for post_batch: concurrent generation workers and minimum
+# seconds between root tweets
+BATCH_MAX_WORKERS = int(os.getenv("BATCH_MAX_WORKERS", "4"))
+BATCH_POST_INTERVAL = float(os.getenv("BATCH_POST_INTERVAL", "5"))
+
+# Rate-limit bucket keys for tweet creation and lookup
+TWEET_ENDPOINT = "POST /2/tweets"
+TWEET_LOOKUP_ENDPOINT = "GET /2/tweets"
+TIMELINE_ENDPOINT = "GET /2/users/:id/tweets"
+MEDIA_UPLOAD_ENDPOINT = "POST /1.1/media/upload.json"
+
+# Attach a title card (or the source page's preview image) to tweets about a topic
+MEDIA_ATTACH = os.getenv("MEDIA_ATTACH", "").lower() in ("1", "true", "yes")
+# Host of the v1.1 media upload endpoint, e.g. a local stand-in
+MEDIA_UPLOAD_HOST = os.getenv("MEDIA_UPLOAD_HOST", "upload.twitter.com")
+
+# Queue replies for a later drain instead of sleeping between them in-process
+DEFER_REPLIES = os.getenv("DEFER_REPLIES", "").lower() in ("1", "true", "yes")
+
 class TwitterAgent:
-    def __init__(self, api_key, api_secret, access_token, access_token_secret,bearer_token):
-        """Initialize the Twitter agent with API credentials."""
+    def __init__(self, api_key, api_secret, access_token, access_token_secret,bearer_token,
+                 verify_ttl=CREDENTIALS_VERIFY_TTL, defer_replies=DEFER_REPLIES,
+                 stream_completions=OPENAI_STREAM, account_name=None, attach_media=MEDIA_ATTACH,
+                 authenticate=True):
+        """
+        Initialize the Twitter agent with API credentials.
+        
+        With authenticate=False no Twitter client is built and credentials
+        may be None: the agent can only generate content, not post it.
+        """
         self.api_key = api_key
         self.client = None
         self.api_secret = api_secret
         self.access_token = access_token
         self.access_token_secret = access_token_secret
         self.bearer_token = bearer_token  # Add Bearer Token
-        self.api = self._authenticate()
+        # Rate limits are tracked per account; access tokens start with the user ID
+        self.account_name = account_name or (access_token or "default").split("-", 1)[0]
+        # Rows stored without an account (before stores recorded one) were
+        # written by the single-account setup, so the unnamed agent takes them over
+        self._adopt_unowned = account_name is None
+        self.verify_ttl = verify_ttl
+        self._verified_at = None
+        self._user_id = None
+        self.defer_replies = defer_replies
+        self._reply_queue = None
+        self._outbox = None
+        self._bundle_buffer = None
+        self._producer = None
+        self.stream_completions = stream_completions
+        self.attach_media = attach_media
+        self._async_openai = None
+        self._scheduler = None
+        self.api = self._authenticate() if authenticate else None
+        if attach_media:
+            from media import pillow_available
+            pillow_available()  # warns once if title cards can't be rendered
         logger.info("Twitter Agent initialized")
         
     def _authenticate(self):
         """Authenticate with Twitter API."""
+        import tweepy
         try:
             auth = tweepy.OAuth1UserHandler(
                 self.api_key, self.api_secret,
@@ -50,54 +129,164 @@ class TwitterAgent:
                 access_token=self.access_token,
                 access_token_secret=self.access_token_secret
             )
+            # Feed x-rate-limit-* headers from every v2 and v1.1 (media upload)
+            # response into the rate limiter
+            from rate_limiter import get_rate_limiter
+            hook = get_rate_limiter().response_hook(self.account_name)
+            client.session.hooks["response"].append(hook)
             self.client = client
-            api = tweepy.API(auth)
-            api.verify_credentials()
-            logger.info("Authentication successful")
+            api = tweepy.API(auth, upload_host=MEDIA_UPLOAD_HOST)
+            api.session.hooks["response"].append(hook)
+            self.api = api
+            self.ensure_authenticated(force=True)
             return api
         except Exception as e:
             logger.error(f"Authentication failed: {str(e)}")
             raise
+
+    def ensure_authenticated(self, force=False):
+        """
+        Verify credentials if they have never been checked or the last check is
+        older than `verify_ttl`. Warm invocations reusing this agent skip the
+        verify_credentials() round trip entirely.
+        """
+        if not force and self._verified_at is not None and time.monotonic() - self._verified_at < self.verify_ttl:
+            return
+        with get_metrics().span("verify_credentials"):
+            user = self.api.verify_credentials()
+        self._user_id = user.id_str
+        self._verified_at = time.monotonic()
+        logger.info("Authentication successful")
+
+    def _create_tweet(self, **kwargs):
+        """
+        Call client.create_tweet through the shared rate limiter, which waits
+        or reschedules (RateLimitDeferred) instead of sending requests that
+        would be rejected, and retries 429 responses. 5xx responses are not
+        retried, as the tweet may have been created anyway.
+        Re-authenticates and retries once if the cached credentials come
+        back 401 Unauthorized.
+        """
+        import tweepy
+        from rate_limiter import get_rate_limiter
+        limiter = get_rate_limiter()
+        kind = "reply" if kwargs.get("in_reply_to_tweet_id") else "tweet"
+        
+        def send():
+            with get_metrics().span("create_tweet", kind=kind):
+                return self.client.create_tweet(**kwargs)
+        
+        def post():
+            return limiter.call(self.account_name, TWEET_ENDPOINT, send, retry_server_errors=False)
+        
+        try:
+            return post()
+        except tweepy.Unauthorized:
+            logger.warning("Twitter returned 401 Unauthorized, re-authenticating")
+            self._verified_at = None
+            self._authenticate()
+            return post()
     
-    def get_trending_ai_topics(self):
+    def _fetch_trending_topics(self, failed=None):
+        """
+        Scrape the topic sources, bypassing the topic cache. If any source
+        fails or misses the deadline, the fallback topics are added to what
+        the others returned, and its name is appended to `failed` if given.
+        """
+        # Sources (ArXiv cs.AI recent papers, TechCrunch AI news) are fetched
+        # in parallel over a shared keep-alive session with hard deadlines
+        from topic_sources import fetch_topics, get_source_stats, topic_links
+        topics, failed_sources = fetch_topics()
+        logger.debug(f"Topic source stats: {get_source_stats()}")
+        if failed_sources:
+            logger.warning(f"Adding fallback topics to a partial fetch (no topics from {failed_sources})")
+            topics += [t for t in FALLBACK_TOPICS if t not in topics]
+            if failed is not None:
+                failed.extend(failed_sources)
+        # Keep each topic's source URL alongside the cached topics, as the
+        # fallback link for tweets about it
+        links = topic_links(topics)
+        if links:
+            from topic_cache import get_topic_cache
+            get_topic_cache().set("links", links)
+        return topics
+    
+    def _source_link(self, topic):
+        """The URL of the scraped item `topic` came from, if known."""
+        from topic_sources import topic_links
+        link = topic_links([topic]).get(topic)
+        if link is None:
+            from topic_cache import get_topic_cache
+            links, _ = get_topic_cache().get("links")
+            link = (links or {}).get(topic)
+        return link
+    
+    def _check_links(self, links):
+        """Verify several links concurrently, warming the link checker's cache."""
+        try:
+            from link_checker import LINK_CHECK_ENABLED, get_link_checker
+            if LINK_CHECK_ENABLED and links:
+                get_link_checker().check_many([link.strip() for link in links])
+        except Exception as e:
+            logger.error(f"Error verifying links: {str(e)}")
+    
+    def _verified_link(self, link_part, topic=None):
+        """
+        Return a link that resolves: the generated one if it checks out, else
+        the source URL of the topic, else FALLBACK_LINK. Checks are cached,
+        so repeat links cost nothing.
+        """
+        link_part = link_part.strip()
+        try:
+            from link_checker import LINK_CHECK_ENABLED, get_link_checker, is_http_url
+            if not is_http_url(link_part):
+                logger.warning(f"Invalid link format: {link_part}")
+                result = None
+            elif not LINK_CHECK_ENABLED:
+                return link_part
+            else:
+                result = get_link_checker().check(link_part)
+                if result is None or result.ok:
+                    # Verified, or still being checked at the deadline: keep it
+                    return link_part
+                logger.warning(f"Generated link failed verification (HTTP {result.status}): {link_part}")
+        except Exception as e:
+            logger.error(f"Error verifying link {link_part}: {str(e)}")
+            return link_part if link_part.startswith("http") else FALLBACK_LINK
+        
+        source_link = self._source_link(topic) if topic else None
+        if source_link:
+            logger.info(f"Using source link for topic: {topic}")
+            return source_link
+        logger.info("Using fallback link")
+        return FALLBACK_LINK
+
+    def get_trending_ai_topics(self, use_cache=True):
         """
         Fetch trending AI topics from various sources.
         Returns a list of trending AI topics.
-        """
-        trending_topics = []
         
+        Args:
+            use_cache: Serve topics from the shared TTL cache (refreshed in the
+                background when stale) instead of scraping on every call
+        """
         try:
-            # Method 1: Scrape from ArXiv's AI section for recent papers
-            arxiv_url = "https://arxiv.org/list/cs.AI/recent"
-            response = requests.get(arxiv_url)
-            if response.status_code == 200:
-                soup = BeautifulSoup(response.text, 'html.parser')
-                titles = soup.select('div.list-title')
-                for title in titles[:5]:  # Get top 5 recent papers
-                    clean_title = title.text.replace('Title:', '').strip()
-                    trending_topics.append(clean_title)
-            
-            # Method 2: Check AI news from TechCrunch
-            techcrunch_url = "https://techcrunch.com/category/artificial-intelligence/"
-            response = requests.get(techcrunch_url)
-            if response.status_code == 200:
-                soup = BeautifulSoup(response.text, 'html.parser')
-                headlines = soup.select('h2.post-block__title a')
-                for headline in headlines[:5]:  # Get top 5 headlines
-                    trending_topics.append(headline.text.strip())
+            if use_cache:
+                from topic_cache import TOPIC_CACHE_PARTIAL_TTL, get_topic_cache
+                failed = []
+                # A partial round is cached briefly, so a source that was slow
+                # once is not left out for the whole TTL
+                trending_topics = list(get_topic_cache().get_or_load(
+                    "trending", lambda: self._fetch_trending_topics(failed),
+                    ttl_for=lambda topics: TOPIC_CACHE_PARTIAL_TTL if failed else None
+                ))
+            else:
+                trending_topics = self._fetch_trending_topics()
             
-            # If we couldn't get any trending topics, use fallback topics
-            if not trending_topics:
-                trending_topics = [
-                    "Large Language Models and their applications",
-                    "AI in healthcare advancements",
-                    "Ethical considerations in AI development",
-                    "Computer vision breakthroughs",
-                    "AI for climate change solutions",
-                    "Multimodal AI systems",
-                    "Reinforcement learning from human feedback",
-                    "AI alignment research progress"
-                ]
+            # Pad partial or empty results with fallback topics so a slow or
+            # failing source never leaves us with too few topics to pick from
+            if len(trending_topics) < MIN_TRENDING_TOPICS:
+                trending_topics += [t for t in FALLBACK_TOPICS if t not in trending_topics]
             
             logger.info(f"Found {len(trending_topics)} trending AI topics")
             return trending_topics
@@ -105,26 +294,120 @@ class TwitterAgent:
         except Exception as e:
             logger.error(f"Error fetching trending AI topics: {str(e)}")
             # Return fallback topics if there's an error
-            return [
-                "Large Language Models and their applications",
-                "AI in healthcare advancements",
-                "Ethical considerations in AI development",
-                "Computer vision breakthroughs",
-                "AI for climate change solutions"
-            ]
+            return FALLBACK_TOPICS[:5]
     
-    def generate_tweet_with_link_and_comments(self, topic=None):
+    def _pick_topics(self, topics, count=1):
         """
-        Generate a tweet about AI trends with a relevant link and multiple follow-up comments using OpenAI.
-        Returns a tuple containing the tweet and a list of follow-up comments.
+        Pick `count` random topics, leaving out ones this account has posted
+        about recently (or near-duplicates of them) before any completion is
+        paid for. Repeats are allowed only if every candidate is one.
         """
+        try:
+            from topic_history import get_topic_history
+            fresh = get_topic_history().filter_new(topics, account=self.account_name)
+        except Exception as e:
+            logger.error(f"Error checking topic history: {str(e)}")
+            fresh = list(topics)
+        
+        if not fresh:
+            logger.warning("Every candidate topic was posted recently, allowing repeats")
+            fresh = list(topics)
+        return random.sample(fresh, min(count, len(fresh)))
+
+    def _record_post(self, topic, tweet_content, tweet_id):
+        """
+        Add a posted tweet (and its topic, if known) to the topic history,
+        and register it for engagement-metrics fetching.
+        """
+        try:
+            from topic_history import get_topic_history
+            get_topic_history().record(topic=topic, tweet=tweet_content,
+                                       account=self.account_name, tweet_id=tweet_id)
+        except Exception as e:
+            logger.error(f"Error recording tweet {tweet_id} in topic history: {str(e)}")
+        try:
+            from engagement import get_engagement_store
+            get_engagement_store().record_post(tweet_id, account=self.account_name,
+                                               source=self._topic_source(topic), topic=topic)
+        except Exception as e:
+            logger.error(f"Error recording tweet {tweet_id} for engagement tracking: {str(e)}")
+    
+    def _topic_source(self, topic):
+        """Where a topic came from: the host of its scraped item, "custom", or "content" without a topic."""
         if not topic:
-            trending_topics = self.get_trending_ai_topics()
-            topic = random.choice(trending_topics)
+            return "content"
+        link = self._source_link(topic)
+        if not link:
+            return "custom"
+        from urllib.parse import urlparse
+        return urlparse(link).netloc
+    
+    def _media_ids(self, topic):
+        """
+        media_ids to attach to a tweet about `topic`, or None. The image is
+        rendered (or fetched) once per topic and uploaded once per account,
+        then served from the media cache while X still holds the upload.
+        Never fails a post: without an image the tweet goes out as text.
+        """
+        if not self.attach_media or not topic:
+            return None
+        try:
+            from media import get_media_cache, upload_media
+            from rate_limiter import get_rate_limiter
+            cache = get_media_cache()
+            image = cache.image_for(topic, self._source_link(topic))
+            if image is None:
+                logger.info(f"No image for topic: {topic}")
+                return None
+            content_hash, media_type, path = image
+            media_id = cache.media_id(self.account_name, content_hash)
+            if media_id is None:
+                limiter = get_rate_limiter()
+                with get_metrics().span("media_upload"):
+                    media_id, expires_at = upload_media(
+                        self.api, path, media_type,
+                        call=lambda func: limiter.call(self.account_name, MEDIA_UPLOAD_ENDPOINT, func)
+                    )
+                cache.set_media_id(self.account_name, content_hash, media_id, expires_at)
+                logger.info(f"Uploaded {os.path.getsize(path)} byte image as media {media_id}")
+            return [media_id]
+        except Exception as e:
+            logger.error(f"Error preparing media for topic {topic}: {str(e)}")
+            return None
+    
+    def _add_comment_instructions(self, prompt, num_comments):
+        """Append the COMMENT2/COMMENT3 instructions and the response format to a prompt."""
+        # Add additional comment prompts based on the random number
+        if num_comments >= 2:
+            prompt += """
+        4. COMMENT2: A second follow-up comment (under 200 characters) that adds more information or perspective.
+           This should be different from the first comment but still related to the topic.
+        """
+        
+        if num_comments >= 3:
+            prompt += """
+        5. COMMENT3: A third follow-up comment (under 200 characters) that concludes the thread with a call-to-action.
+           This could ask for opinions, encourage sharing, or invite further discussion.
+        """
         
-        # Determine randomly how many comments to generate (1-3)
-        num_comments = random.randint(1, 3)
+        prompt += """
+        Format your response exactly like this:
+        TWEET: [your tweet text here]
+        LINK: [your relevant URL here]
+        COMMENT1: [your first follow-up comment here]
+        """
+        
+        if num_comments >= 2:
+            prompt += "COMMENT2: [your second follow-up comment here]\n"
         
+        if num_comments >= 3:
+            prompt += "COMMENT3: [your third follow-up comment here]\n"
+        
+        return prompt
+
+    @timed("prompt_build")
+    def _build_trending_prompt(self, topic, num_comments):
+        """Render the generation prompt for a trending AI topic."""
         prompt = f"""Create a tweet about this AI topic: "{topic}".
         
         Your response should include {num_comments + 2} parts, clearly separated:
@@ -151,165 +434,720 @@ class TwitterAgent:
         3. COMMENT1: A brief follow-up comment (under 200 characters) that could be posted as a reply to the tweet.
            This should add additional insight or ask an engaging question related to the topic.
         """
+        return self._add_comment_instructions(prompt, num_comments)
+
+    @timed("prompt_build")
+    def _build_custom_prompt(self, custom_topic, num_comments):
+        """Render the generation prompt for a user-supplied topic."""
+        prompt = f"""Create a tweet about this topic: "{custom_topic}".
         
-        # Add additional comment prompts based on the random number
-        if num_comments >= 2:
-            prompt += """
-        4. COMMENT2: A second follow-up comment (under 200 characters) that adds more information or perspective.
-           This should be different from the first comment but still related to the topic.
-        """
+        Your response should include {num_comments + 2} parts, clearly separated:
         
-        if num_comments >= 3:
-            prompt += """
-        5. COMMENT3: A third follow-up comment (under 200 characters) that concludes the thread with a call-to-action.
-           This could ask for opinions, encourage sharing, or invite further discussion.
+        1. TWEET: A concise, engaging tweet (under 240 characters) that:
+           - Is professional yet conversational
+           - Includes relevant hashtags
+           - Has a call-to-action
+           - Uses emojis appropriately
+           - Sounds like you're speaking to a close friend (use phrases like "You won't believe this" or "Check this out")
+           - Focuses specifically on the topic: "{custom_topic}"
+        
+        2. LINK: A specific, relevant URL to an article, research paper, or resource about this topic.
+           The link should be a real, working URL (e.g., https://example.com/article).
+        
+        3. COMMENT1: A brief follow-up comment (under 200 characters) that could be posted as a reply to the tweet.
+           This should add additional insight or ask an engaging question related to the topic.
+        """
+        return self._add_comment_instructions(prompt, num_comments)
+
+    def _comment_count(self, topic):
         """
+        Number of follow-up comments (1-3) for `topic`. It varies between
+        topics but is fixed for each one: the count is part of the prompt,
+        so a random one would make retries miss the generation cache.
+        """
+        return 1 + zlib.crc32(topic.encode("utf-8")) % 3
+
+    def _cached_generation(self, topic, prompt, num_comments, use_cache):
+        """Look up a completion in the generation cache; returns (cache, key, cached text or None)."""
+        from generation_cache import get_generation_cache, make_generation_key
+        cache = get_generation_cache()
+        key = make_generation_key(topic, prompt, OPENAI_MODEL, OPENAI_TEMPERATURE, num_comments)
+        if not use_cache:
+            cache.record_bypass()
+            return cache, key, None
+        cached = cache.get(key)
+        if cached is not None:
+            logger.info(f"Using cached generation for topic: {topic}")
+        return cache, key, cached
+
+    def _chat_request(self, prompt, max_tokens):
+        return dict(
+            model=OPENAI_MODEL,
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=max_tokens,
+            temperature=OPENAI_TEMPERATURE
+        )
+
+    def _request_completion(self, topic, prompt, num_comments, max_tokens, use_cache=True, stream=None):
+        """
+        Send the prompt to OpenAI and return the raw completion text.
         
-        prompt += """
-        Format your response exactly like this:
-        TWEET: [your tweet text here]
-        LINK: [your relevant URL here]
-        COMMENT1: [your first follow-up comment here]
+        Completions are cached by a hash of the topic, rendered prompt, model,
+        temperature and comment count, so retries after a failed post and
+        topics that come back across runs don't pay for GPT-4 again.
+        
+        Args:
+            use_cache: Set to False to bypass the generation cache for this call
+            stream: Use the streaming path that stops once every field has
+                arrived (defaults to the agent's stream_completions setting)
         """
+        if stream is None:
+            stream = self.stream_completions
         
-        if num_comments >= 2:
-            prompt += "COMMENT2: [your second follow-up comment here]\n"
+        cache, key, cached = self._cached_generation(topic, prompt, num_comments, use_cache)
+        if cached is not None:
+            return cached
         
-        if num_comments >= 3:
-            prompt += "COMMENT3: [your third follow-up comment here]\n"
+        import openai
+        openai.api_key = os.getenv("OPENAI_API_KEY")
 
-        try:
-            
-            openai_key =  os.getenv("OPENAI_API_KEY")
-            
-            if not openai_key:
-                logger.warning("OpenAI API key not found, using template-based generation")
-                raise KeyError("OpenAI API key not found")
-            
+        if stream:
+            # The module's shared sync client, so connections are reused across calls
+            from completion_stream import stream_completion_sync
+            with get_metrics().span("llm_call", mode="stream"):
+                full_response = stream_completion_sync(openai, num_comments,
+                                                       **self._chat_request(prompt, max_tokens))
+            cache.set(key, full_response)
+            return full_response
+
+        metrics = get_metrics()
+        with metrics.span("llm_call", mode="sync"):
+            response = openai.chat.completions.create(**self._chat_request(prompt, max_tokens))
+        if getattr(response, "usage", None):
+            metrics.record("llm_prompt_tokens", response.usage.prompt_tokens, mode="sync")
+            metrics.record("llm_completion_tokens", response.usage.completion_tokens, mode="sync")
+        
+        # Extract the full response
+        full_response = response.choices[0].message.content.strip()
+        cache.set(key, full_response)
+        return full_response
+
+    async def _get_async_openai(self):
+        """
+        Return an AsyncOpenAI client bound to the running event loop. A
+        client left over from an earlier loop is closed, so its connection
+        pool doesn't linger.
+        """
+        loop = asyncio.get_running_loop()
+        if self._async_openai is None or self._async_openai[0] is not loop:
             import openai
-            openai.api_key = openai_key
-
-            response = openai.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are a professional AI social media manager with expertise in finding relevant resources."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=500,  # Increased for multiple comments
-                temperature=0.7
+            previous = self._async_openai
+            self._async_openai = (loop, openai.AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY")))
+            if previous is not None:
+                previous_loop, previous_client = previous
+                try:
+                    if previous_loop.is_closed():
+                        await previous_client.close()
+                    else:
+                        asyncio.run_coroutine_threadsafe(previous_client.close(), previous_loop)
+                except Exception as e:
+                    # Connections tied to a closed loop can't be shut down cleanly; they are dropped
+                    logger.debug(f"Could not close previous AsyncOpenAI client: {str(e)}")
+        return self._async_openai[1]
+
+    async def aclose(self):
+        """Close the AsyncOpenAI client of the running loop, e.g. before asyncio.run() returns."""
+        if self._async_openai is not None and self._async_openai[0] is asyncio.get_running_loop():
+            _, client = self._async_openai
+            self._async_openai = None
+            await client.close()
+
+    async def _arequest_completion(self, topic, prompt, num_comments, max_tokens, use_cache=True):
+        """
+        Async, streaming counterpart of _request_completion. The TWEET/LINK/
+        COMMENTn fields are parsed as they arrive and the stream is closed as
+        soon as all of them are in, so trailing chatter is never generated.
+        """
+        cache, key, cached = self._cached_generation(topic, prompt, num_comments, use_cache)
+        if cached is not None:
+            return cached
+        
+        from completion_stream import stream_completion
+        with get_metrics().span("llm_call", mode="stream"):
+            full_response = await stream_completion(
+                await self._get_async_openai(), num_comments, **self._chat_request(prompt, max_tokens)
             )
+        cache.set(key, full_response)
+        return full_response
+
+    async def agenerate_tweet_with_link_and_comments(self, topic=None, use_cache=True):
+        """
+        Async version of generate_tweet_with_link_and_comments that always
+        uses the streaming completion path.
+        Returns a tuple containing the tweet and a list of follow-up comments.
+        """
+        if not topic:
+            # Scraping the sources blocks for up to the fetch deadline
+            topics = await asyncio.to_thread(self.get_trending_ai_topics)
+            topic = self._pick_topics(topics)[0]
+        
+        bundle = await self.agenerate_bundle(topic, use_cache=use_cache)
+        return bundle["tweet"], bundle["comments"]
+
+    async def agenerate_bundle(self, topic, custom=False, use_cache=True):
+        """
+        Async version of generate_bundle that always uses the streaming
+        completion path. Returns the same dict.
+        """
+        num_comments, prompt, max_tokens = self._generation_request(topic, custom)
+        try:
+            self._require_openai_key()
+            full_response = await self._arequest_completion(topic, prompt, num_comments, max_tokens=max_tokens,
+                                                            use_cache=use_cache)
+            # Link verification does blocking I/O; keep it off the event loop
+            return await asyncio.to_thread(self._bundle_from_completion, topic, full_response)
+        except Exception as e:
+            logger.error(f"Error generating tweet with OpenAI: {str(e)}")
+            # Fallback
+            return self._template_bundle(topic, custom)
+
+    @timed("response_parse")
+    def _parse_generation(self, full_response):
+        """Split a TWEET:/LINK:/COMMENTn: completion into (tweet, link, comments)."""
+        tweet_part = ""
+        link_part = ""
+        comments = []
+        
+        # Extract each part using simple string parsing
+        lines = full_response.split('\n')
+        for line in lines:
+            if line.startswith("TWEET:"):
+                tweet_part = line.replace("TWEET:", "").strip()
+            elif line.startswith("LINK:"):
+                link_part = line.replace("LINK:", "").strip()
+            elif line.startswith("COMMENT1:"):
+                comments.append(line.replace("COMMENT1:", "").strip())
+            elif line.startswith("COMMENT2:"):
+                comments.append(line.replace("COMMENT2:", "").strip())
+            elif line.startswith("COMMENT3:"):
+                comments.append(line.replace("COMMENT3:", "").strip())
+        
+        return tweet_part, link_part, comments
+
+    def _format_final_tweet(self, tweet_part, link_part, comments, topic=None, link_verified=False):
+        """
+        Verify the link (unless `link_verified`), add a call-to-action, fit
+        the tweet to the character limit and make sure there is at least one comment.
+        Returns a tuple of (final_tweet, comments).
+        """
+        # Replace dead or malformed links, preferring the topic's source URL
+        if not link_verified:
+            link_part = self._verified_link(link_part, topic)
+        
+        # Format the tweet with a natural call-to-action before the link
+        if "check this" not in tweet_part.lower() and "check it out" not in tweet_part.lower() and "learn more" not in tweet_part.lower():
+            # If the tweet doesn't already have a call-to-action, add one
+            call_to_action_phrases = [
+                "Check this out: ",
+                "Learn more here: ",
+                "Read the full article: ",
+                "Dive deeper: ",
+                "More details here: ",
+                "Fascinating read: ",
+                "👉 ",
+                "Explore this: "
+            ]
+            call_to_action = random.choice(call_to_action_phrases)
+            suffix = f" {call_to_action}{link_part}"
+        else:
+            # If the tweet already has a call-to-action, just append the link
+            suffix = f" {link_part}"
+        
+        # Combine tweet and link, ensuring we're under the character limit as
+        # X counts it (the link as 23, emoji and CJK as 2)
+        tweet_part = truncate(tweet_part, MAX_WEIGHTED_LENGTH - weighted_length(suffix))
+        final_tweet = f"{tweet_part}{suffix}"
+        
+        # Remove any quotes
+        final_tweet = final_tweet.replace('"', '')
+        
+        # Replies have the same limit
+        comments = [truncate(comment) for comment in comments]
+        
+        # Ensure we have at least one comment
+        if not comments:
+            comments.append("What do you think about this? Let me know in the replies! 💬")
+        
+        return final_tweet, comments
+
+    def generate_tweet_with_link_and_comments(self, topic=None, use_cache=True, stream=None):
+        """
+        Generate a tweet about AI trends with a relevant link and multiple follow-up comments using OpenAI.
+        Returns a tuple containing the tweet and a list of follow-up comments.
+        
+        Args:
+            topic: Topic to write about; a trending topic is picked if omitted
+            use_cache: Set to False to force a fresh OpenAI completion
+            stream: Stream the completion and stop once all fields are parsed
+                (defaults to the agent's stream_completions setting)
+        """
+        if not topic:
+            topic = self._pick_topics(self.get_trending_ai_topics())[0]
+        
+        bundle = self.generate_bundle(topic, use_cache=use_cache, stream=stream)
+        return bundle["tweet"], bundle["comments"]
+
+    def generate_bundle(self, topic, custom=False, use_cache=True, stream=None):
+        """
+        Generate a tweet and its follow-up comments about `topic` without
+        posting anything, keeping the parsed parts apart.
+        
+        Args:
+            topic: Topic to write about
+            custom: Use the prompt for a user-supplied topic instead of the
+                trending-topic one
+            use_cache: Set to False to force a fresh OpenAI completion
+            stream: Stream the completion and stop once all fields are parsed
+                (defaults to the agent's stream_completions setting)
             
-            # Extract the full response
-            full_response = response.choices[0].message.content.strip()
-            
-            # Parse the response to extract tweet, link, and comments
-            tweet_part = ""
-            link_part = ""
-            comments = []
-            
-            # Extract each part using simple string parsing
-            lines = full_response.split('\n')
-            for line in lines:
-                if line.startswith("TWEET:"):
-                    tweet_part = line.replace("TWEET:", "").strip()
-                elif line.startswith("LINK:"):
-                    link_part = line.replace("LINK:", "").strip()
-                elif line.startswith("COMMENT1:"):
-                    comments.append(line.replace("COMMENT1:", "").strip())
-                elif line.startswith("COMMENT2:"):
-                    comments.append(line.replace("COMMENT2:", "").strip())
-                elif line.startswith("COMMENT3:"):
-                    comments.append(line.replace("COMMENT3:", "").strip())
-            
-            # Validate the link (basic check)
-            if not link_part.startswith("http"):
-                link_part = "https://arxiv.org/abs/2303.08774"  # Fallback link
-                logger.warning(f"Invalid link format: {link_part}. Using fallback link.")
-            
-            # Format the tweet with a natural call-to-action before the link
-            if "check this" not in tweet_part.lower() and "check it out" not in tweet_part.lower() and "learn more" not in tweet_part.lower():
-                # If the tweet doesn't already have a call-to-action, add one
-                call_to_action_phrases = [
-                    "Check this out: ",
-                    "Learn more here: ",
-                    "Read the full article: ",
-                    "Dive deeper: ",
-                    "More details here: ",
-                    "Fascinating read: ",
-                    "👉 ",
-                    "Explore this: "
-                ]
-                call_to_action = random.choice(call_to_action_phrases)
-                
-                # Combine tweet and link, ensuring we're under the character limit
-                max_tweet_length = 280 - len(call_to_action) - len(link_part) - 1  # -1 for space
-                if len(tweet_part) > max_tweet_length:
-                    tweet_part = tweet_part[:max_tweet_length-3] + "..."
-                
-                final_tweet = f"{tweet_part} {call_to_action}{link_part}"
-            else:
-                # If the tweet already has a call-to-action, just append the link
-                max_tweet_length = 280 - len(link_part) - 1  # -1 for space
-                if len(tweet_part) > max_tweet_length:
-                    tweet_part = tweet_part[:max_tweet_length-3] + "..."
-                
-                final_tweet = f"{tweet_part} {link_part}"
-            
-            # Remove any quotes
-            final_tweet = final_tweet.replace('"', '')
-            
-            # Ensure we have at least one comment
-            if not comments:
-                comments.append("What do you think about this? Let me know in the replies! 💬")
-            
-            return final_tweet, comments
+        Returns:
+            dict: tweet (ready to post, link included), text (the generated
+            tweet text), link (verified), comments, and fallback (True if
+            OpenAI failed and the template was used)
+        """
+        num_comments, prompt, max_tokens = self._generation_request(topic, custom)
+        try:
+            self._require_openai_key()
+            full_response = self._request_completion(topic, prompt, num_comments, max_tokens=max_tokens,
+                                                     use_cache=use_cache, stream=stream)
+            return self._bundle_from_completion(topic, full_response)
             
         except Exception as e:
             logger.error(f"Error generating tweet with OpenAI: {str(e)}")
             # Fallback
+            return self._template_bundle(topic, custom)
+
+    def _generation_request(self, topic, custom=False):
+        """Return (num_comments, prompt, max_tokens) for generating a bundle about `topic`."""
+        # How many comments to generate (1-3), fixed per topic
+        num_comments = self._comment_count(topic)
+        if custom:
+            return num_comments, self._build_custom_prompt(topic, num_comments), 400
+        return num_comments, self._build_trending_prompt(topic, num_comments), 500
+
+    def _require_openai_key(self):
+        if not os.getenv("OPENAI_API_KEY"):
+            logger.warning("OpenAI API key not found, using template-based generation")
+            raise KeyError("OpenAI API key not found")
+
+    def _bundle_from_completion(self, topic, full_response):
+        """Parse a completion into a bundle dict, verifying its link."""
+        tweet_part, link_part, comments = self._parse_generation(full_response)
+        link_part = self._verified_link(link_part, topic)
+        final_tweet, comments = self._format_final_tweet(tweet_part, link_part, comments, topic,
+                                                         link_verified=True)
+        return {"tweet": final_tweet, "text": tweet_part, "link": link_part, "comments": comments,
+                "fallback": False}
+
+    def _template_bundle(self, topic, custom=False):
+        """The canned bundle used when OpenAI is unavailable, flagged as a fallback."""
+        if custom:
+            fallback_tweet = f"Interesting thoughts on {topic}. What's your take on this topic? #Discussion"
+            fallback_comments = ["I'd love to hear your perspectives on this! Share your thoughts below. 💬"]
+        else:
             fallback_tweet = self._generate_template_tweet(topic)
             fallback_comments = ["What do you think about this? Let me know in the replies! 💬"]
-            return fallback_tweet, fallback_comments
+        return {"tweet": fallback_tweet, "text": fallback_tweet, "link": None, "comments": fallback_comments,
+                "fallback": True}
+
+    def _generate_template_tweet(self, topic):
+        """Build a simple hashtagged tweet about `topic` when OpenAI isn't available."""
+        templates = [
+            "Been reading up on {topic} lately. Where do you think this is heading? #AI #MachineLearning",
+            "So, {topic} is getting a lot of attention. What's your take? #AI #Tech",
+            "You won't believe how fast {topic} is moving. Thoughts? #AI #Innovation",
+        ]
+        template = random.choice(templates)
+        tweet = template.format(topic=topic)
+        if weighted_length(tweet) > MAX_WEIGHTED_LENGTH:
+            tweet = template.format(topic=truncate(topic, 150))
+        return tweet
+
+    @timed("prompt_build")
+    def _build_batch_prompt(self, topics, comment_counts):
+        """Render one prompt asking for a tweet bundle per topic, in numbered ITEM sections."""
+        topic_lines = "\n".join(
+            f'        ITEM {i}: "{topic}" ({count} follow-up comment{"s" if count > 1 else ""})'
+            for i, (topic, count) in enumerate(zip(topics, comment_counts), start=1)
+        )
+        return f"""Create a tweet for each of these {len(topics)} AI topics:
+{topic_lines}
+        
+        For every topic write:
+        
+        1. TWEET: A concise, engaging tweet (under 240 characters) that:
+           - Is professional yet conversational, like you're speaking to a close friend
+           - Includes relevant hashtags like #AI #MachineLearning
+           - Focus only on the tweet text, no additional commentary
+           - Has a call-to-action
+           - must be like a human written tweet
+        
+        2. LINK: A specific, relevant URL to an article, research paper, or resource about the topic.
+           The link should be a real, working URL (e.g., https://example.com/article).
+        
+        3. COMMENT1, COMMENT2, ...: As many follow-up comments (under 200 characters each) as listed
+           for the topic. Each adds insight or asks an engaging question; the last one invites discussion.
+        
+        Format your response exactly like this, one section per topic, in the same order:
+        ITEM 1
+        TWEET: [tweet text]
+        LINK: [relevant URL]
+        COMMENT1: [first follow-up comment]
+        ITEM 2
+        ...
+        """
+
+    @timed("response_parse")
+    def _split_batch_response(self, full_response, count):
+        """Split a batched completion into per-item (tweet, link, comments), keyed by item number."""
+        items = {}
+        current = None
+        lines = []
+        for line in full_response.split('\n') + ["ITEM 0"]:
+            line = line.strip()
+            match = re.match(r"^\**ITEM\s+(\d+)", line, re.IGNORECASE)
+            if match:
+                if current is not None and 1 <= current <= count:
+                    items[current] = self._parse_generation("\n".join(lines))
+                current = int(match.group(1))
+                lines = []
+            elif current is not None:
+                lines.append(line)
+        return items
 
-    def post_tweet_with_comments(self, content=None):
-        """Post a tweet to Twitter and then post multiple follow-up comments."""
+    def generate_batch(self, topics, batch_size=5, use_cache=True):
+        """
+        Generate tweet bundles for many topics with one completion per
+        `batch_size` topics, spreading request latency and system-prompt
+        tokens over the batch.
+        
+        Args:
+            topics: Topics to write about
+            batch_size: Topics per OpenAI request
+            use_cache: Set to False to force fresh completions
+            
+        Returns:
+            list: A bundle dict for each topic, in order, as returned by
+            generate_bundle(): fallback is True where the template was used.
+            Items the model leaves out are regenerated one at a time.
+        """
+        topics = list(topics)
+        if not os.getenv("OPENAI_API_KEY"):
+            logger.warning("OpenAI API key not found, using template-based generation")
+            return [self._template_bundle(topic) for topic in topics]
+        
+        bundles = []
+        for start in range(0, len(topics), batch_size):
+            chunk = topics[start:start + batch_size]
+            comment_counts = [self._comment_count(topic) for topic in chunk]
+            prompt = self._build_batch_prompt(chunk, comment_counts)
+            try:
+                full_response = self._request_completion(
+                    chunk, prompt, comment_counts,
+                    max_tokens=150 + 200 * len(chunk), use_cache=use_cache, stream=False
+                )
+                items = self._split_batch_response(full_response, len(chunk))
+            except Exception as e:
+                logger.error(f"Error generating batch with OpenAI: {str(e)}")
+                items = {}
+            
+            # Check every link of the chunk at once; formatting below then hits the cache
+            self._check_links([link_part for _, link_part, _ in items.values()])
+            
+            for i, topic in enumerate(chunk, start=1):
+                if i in items and items[i][0]:
+                    tweet_part, link_part, comments = items[i]
+                    link_part = self._verified_link(link_part, topic)
+                    final_tweet, comments = self._format_final_tweet(
+                        tweet_part, link_part, comments[:comment_counts[i - 1]], topic, link_verified=True
+                    )
+                    bundles.append({"tweet": final_tweet, "text": tweet_part, "link": link_part,
+                                    "comments": comments, "fallback": False})
+                else:
+                    logger.warning(f"Batch response missing item {i}, generating it separately: {topic}")
+                    bundles.append(self.generate_bundle(topic, use_cache=use_cache))
+        
+        logger.info(f"Generated {len(bundles)} tweet bundles in {-(-len(topics) // batch_size)} batched requests")
+        return bundles
+
+    def post_tweet_with_comments(self, content=None, defer_replies=None):
+        """
+        Post a tweet to Twitter and then post multiple follow-up comments.
+        
+        Without `content`, a bundle left in the outbox by an earlier failed
+        post is posted if one is due, else one from the pre-generated bundle
+        buffer, and only if that is empty is a new one generated inline.
+        """
+        topic = None
         if not content:
-            tweet_content, comments = self.generate_tweet_with_link_and_comments()
+            pending = self.outbox.claim_due(1, account=self.account_name, root_posted=False)
+            if pending:
+                logger.info(f"Posting bundle {pending[0]} left in the outbox instead of generating a new one")
+                try:
+                    return self._post_outbox_bundle(pending[0], defer_replies, claimed=True)
+                except Exception as e:
+                    logger.error(f"Failed to post tweet or comments: {str(e)}")
+                    return None, None
+            topic, (tweet_content, comments) = self._next_bundle()
         else:
             tweet_content = content
             comments = ["What are your thoughts on this? Let's discuss! 💬"]
         
+        return self.post_tweet_with_comments_content(tweet_content, comments, defer_replies, topic=topic)
+
+    @property
+    def bundle_buffer(self):
+        """The buffer of pre-generated bundles, opened on first use."""
+        if self._bundle_buffer is None:
+            from bundle_buffer import BundleBuffer
+            self._bundle_buffer = self._adopt(BundleBuffer())
+        return self._bundle_buffer
+
+    def _pop_buffered_bundle(self):
+        """
+        Pop the next pre-generated bundle whose topic has not been posted
+        since it was buffered. Returns (topic, (tweet, comments)) or None.
+        """
+        from bundle_buffer import BUNDLE_BUFFER_PATH, BUNDLE_BUFFER_SIZE
+        if self._bundle_buffer is None and (not BUNDLE_BUFFER_SIZE or not os.path.exists(BUNDLE_BUFFER_PATH)):
+            return None
         try:
-            # Post the initial tweet using the v2 API
-            tweet_response = self.client.create_tweet(text=tweet_content)
-            tweet_id = tweet_response.data['id']
-            logger.info(f"Tweet posted successfully: {tweet_content}")
+            from topic_history import get_topic_history
+            history = get_topic_history()
+            while True:
+                bundle = self.bundle_buffer.pop(self.account_name)
+                if bundle is None:
+                    return None
+                topic, tweet_content, comments = bundle
+                if topic and history.is_duplicate(topic, account=self.account_name):
+                    logger.info(f"Dropping buffered bundle, topic was posted since: {topic}")
+                    continue
+                return topic, (tweet_content, comments)
+        except Exception as e:
+            logger.error(f"Error reading the bundle buffer: {str(e)}")
+            return None
+
+    def _next_bundle(self):
+        """Return (topic, (tweet, comments)): a buffered bundle if one is ready, else a freshly generated one."""
+        buffered = self._pop_buffered_bundle()
+        if buffered:
+            logger.info(f"Using a pre-generated bundle about: {buffered[0]}")
+            return buffered
+        topic = self._pick_topics(self.get_trending_ai_topics())[0]
+        return topic, self.generate_tweet_with_link_and_comments(topic)
+
+    def refill_buffer(self, count=None):
+        """
+        Generate bundles for fresh trending topics until the buffer is full,
+        so later posts skip scraping and generation. Meant for idle time:
+        the background producer, or an off-peak "refill_buffer" invocation.
+        
+        Args:
+            count: Bundles to add (defaults to what the buffer is short of)
             
-            # Post each follow-up comment as a reply to the initial tweet
-            comment_responses = []
-            parent_id = tweet_id  # Start with the original tweet as parent
+        Returns:
+            int: Number of bundles added
+        """
+        buffer = self.bundle_buffer
+        buffer.evict_expired()
+        needed = buffer.shortfall(self.account_name) if count is None else count
+        if needed <= 0:
+            return 0
+        
+        # Skip topics posted recently or already waiting in the buffer
+        buffered = buffer.topics(self.account_name)
+        trending_topics = self.get_trending_ai_topics()
+        try:
+            from topic_history import get_topic_history
+            fresh = get_topic_history().filter_new(buffered + trending_topics, account=self.account_name)
+        except Exception as e:
+            logger.error(f"Error checking topic history: {str(e)}")
+            fresh = list(trending_topics)
+        fresh = [topic for topic in fresh if topic not in buffered]
+        if not fresh:
+            logger.info("No fresh topics to buffer")
+            return 0
+        
+        topics = random.sample(fresh, min(needed, len(fresh)))
+        added = 0
+        for topic, bundle in zip(topics, self.generate_batch(topics)):
+            if bundle["fallback"]:
+                # Canned template text is only worth posting when nothing better exists; never queue it up
+                logger.warning(f"Not buffering template bundle about: {topic}")
+                continue
+            tweet_content, comments = bundle["tweet"], bundle["comments"]
+            if not is_valid(tweet_content) or not comments:
+                logger.warning(f"Not buffering invalid bundle about: {topic}")
+                continue
+            buffer.put(topic, tweet_content, comments, account=self.account_name)
+            added += 1
+            if self.attach_media:
+                # Render the image now too, so posting the bundle only uploads it
+                try:
+                    from media import get_media_cache
+                    get_media_cache().image_for(topic, self._source_link(topic))
+                except Exception as e:
+                    logger.error(f"Error preparing media for topic {topic}: {str(e)}")
+        logger.info(f"Buffered {added} bundles, {buffer.size(self.account_name)} ready")
+        return added
+
+    def start_buffer_producer(self, interval=300):
+        """
+        Keep the bundle buffer full from a background thread, checking every
+        `interval` seconds, for long-running processes. Returns the thread.
+        """
+        if self._producer is not None:
+            return self._producer[0]
+        stop = threading.Event()
+        
+        def produce():
+            while not stop.is_set():
+                try:
+                    self.refill_buffer()
+                except Exception as e:
+                    logger.error(f"Error refilling the bundle buffer: {str(e)}")
+                stop.wait(interval)
+        
+        thread = threading.Thread(target=produce, name="bundle-producer", daemon=True)
+        self._producer = (thread, stop)
+        thread.start()
+        return thread
+
+    def stop_buffer_producer(self):
+        if self._producer is not None:
+            self._producer[1].set()
+            self._producer = None
+
+    @property
+    def reply_queue(self):
+        """The durable queue deferred replies are written to, opened on first use."""
+        if self._reply_queue is None:
+            from reply_queue import ReplyQueue
+            self._reply_queue = self._adopt(ReplyQueue())
+        return self._reply_queue
+
+    @property
+    def outbox(self):
+        """The durable outbox bundles are written to before posting, opened on first use."""
+        if self._outbox is None:
+            from outbox import Outbox
+            self._outbox = self._adopt(Outbox())
+        return self._outbox
+
+    def _adopt(self, store):
+        """Assign the rows of `store` that have no account to this agent's, if it takes them over."""
+        if self._adopt_unowned:
+            adopted = store.adopt(self.account_name)
+            if adopted:
+                logger.info(f"Assigned {adopted} rows without an account in {store.path} to {self.account_name}")
+        return store
+
+    def _post_replies(self, parent_id, parts, key, defer_replies=None):
+        """
+        Post each follow-up comment in `parts` (outbox part dicts of bundle
+        `key`) as a reply to `parent_id`, with a random 5-15 second gap
+        between them to look natural, marking each in the outbox once posted.
+        
+        When deferring, the replies are written to the reply queue with their
+        due times and this returns straight away; drain_replies() posts them.
+        """
+        if defer_replies is None:
+            defer_replies = self.defer_replies
+        
+        if defer_replies:
+            delays = [random.uniform(5, 15) for _ in parts]
+            self.reply_queue.enqueue(parent_id, [part['text'] for part in parts], delays, account=self.account_name,
+                                     keys=[f"{key}:{part['position']}" for part in parts])
+            self.outbox.mark_queued(key, [part['position'] for part in parts])
+            return []
+        
+        comment_responses = []
+        for part in parts:
+            # Add a small delay between comments to make it look more natural
+            time.sleep(random.uniform(5, 15))  # Random delay between 5-15 seconds
             
-            for comment in comments:
-                # Add a small delay between comments to make it look more natural
-                time.sleep(random.uniform(5, 15))  # Random delay between 5-15 seconds
-                
-                comment_response = self.client.create_tweet(
-                    text=comment,
-                    in_reply_to_tweet_id=parent_id
-                )
-                comment_id = comment_response.data['id']
-                logger.info(f"Follow-up comment posted successfully: {comment}")
-                comment_responses.append(comment_response)
-                
-                # For a thread-like structure, make each comment a reply to the previous one
-                # Uncomment the next line if you want comments to form a thread
-                # parent_id = comment_id
+            self.outbox.mark_sending(key, part['position'])
+            comment_response = self._create_tweet(
+                text=part['text'],
+                in_reply_to_tweet_id=parent_id
+            )
+            self.outbox.mark_posted(key, part['position'], comment_response.data['id'])
+            logger.info(f"Follow-up comment {comment_response.data['id']} posted in reply to {parent_id}")
+            comment_responses.append(comment_response)
             
-            return tweet_response, comment_responses
-        except Exception as e:
-            logger.error(f"Failed to post tweet or comments: {str(e)}")
-            return None, None
+            # For a thread-like structure, make each comment a reply to the previous one
+            # Uncomment the next line if you want comments to form a thread
+            # parent_id = comment_response.data['id']
+        
+        return comment_responses
+
+    def drain_replies(self, limit=50):
+        """
+        Post every deferred reply that is due now, without waiting for ones
+        that are not. Returns the IDs of the replies posted.
+        """
+        if self._reply_queue is None and not self.defer_replies:
+            from reply_queue import REPLY_QUEUE_PATH
+            if not os.path.exists(REPLY_QUEUE_PATH):
+                return []
+        
+        def post_reply(text, parent_id):
+            response = self._create_tweet(text=text, in_reply_to_tweet_id=parent_id)
+            logger.info(f"Follow-up comment {response.data['id']} posted in reply to {parent_id}")
+            return response.data['id']
+        
+        results = self.reply_queue.drain(post_reply, limit=limit, account=self.account_name)
+        return [posted_id for _, posted_id in results if posted_id]
     
+    def fetch_engagement(self, limit=None):
+        """
+        Fetch public metrics for this account's tweets that are still inside
+        the engagement window and due a refresh, 100 IDs per lookup request,
+        and append them to the engagement store.
+        
+        Args:
+            limit: Maximum number of tweets to refresh in this call
+            
+        Returns:
+            int: Number of metrics snapshots stored
+        """
+        from engagement import LOOKUP_BATCH_SIZE, get_engagement_store
+        from rate_limiter import get_rate_limiter
+        store = get_engagement_store()
+        limiter = get_rate_limiter()
+        tweet_ids = store.due_ids(account=self.account_name, limit=limit)
+        stored = 0
+        for start in range(0, len(tweet_ids), LOOKUP_BATCH_SIZE):
+            chunk = tweet_ids[start:start + LOOKUP_BATCH_SIZE]
+            try:
+                response = limiter.call(self.account_name, TWEET_LOOKUP_ENDPOINT, lambda: self.client.get_tweets(
+                    ids=chunk, tweet_fields=["public_metrics"], user_auth=True
+                ))
+            except Exception as e:
+                logger.error(f"Failed to fetch metrics for {len(chunk)} tweets: {str(e)}")
+                break
+            fetched_at = time.time()
+            stored += store.append_metrics(
+                [(tweet.id, fetched_at, tweet.public_metrics or {}) for tweet in response.data or []]
+            )
+            # Deleted or protected tweets come back as errors; don't ask again until the next refresh
+            store.mark_fetched(chunk, fetched_at)
+        logger.info(f"Stored metrics for {stored} of {len(tweet_ids)} tweets due a refresh")
+        return stored
+
     def post_tweet(self, content=None):
         """Post a tweet to Twitter."""
         if not content:
@@ -319,7 +1157,7 @@ class TwitterAgent:
         try:
             # Corrected the call to post_tweet_v2
             tweet = self.post_tweet_v3(content)  # Removed 'self' from the call
-            logger.info(f"Tweet posted successfully: {content}")
+            logger.info("Tweet posted successfully")
             return tweet
         except Exception as e:
             logger.error(f"Failed to post tweet: {str(e)}")
@@ -332,39 +1170,100 @@ class TwitterAgent:
         
         try:
             # Corrected the call to post_tweet_v2
-            response = self.client.create_tweet( text=content )
-            logger.info(f"Tweet posted successfully: {response}")
+            response = self._create_tweet( text=content )
+            logger.info(f"Tweet {response.data['id']} posted successfully")
             return response
         except Exception as e:
             logger.error(f"Failed to post tweet: {str(e)}")
             return None
 
-    def schedule_tweets(self, frequency_hours=24):
+    def _scheduled_post_job(self, name="tweets", interval_hours=24, jitter_minutes=0, missed="run_once",
+                            prefetch_minutes=10, custom_topic=None):
+        """Build a scheduler Job that generates a bundle ahead of its slot and posts it on time."""
+        from scheduler import Job
+        
+        def prepare():
+            if not custom_topic:
+                return self._next_bundle()
+            return custom_topic, self.generate_tweet_with_link_and_comments(custom_topic)
+        
+        def post(prepared):
+            topic, (tweet_content, comments) = prepared
+            self.post_tweet_with_comments_content(tweet_content, comments, topic=topic)
+        
+        return Job(
+            name, post,
+            interval=interval_hours * 3600,
+            jitter=jitter_minutes * 60,
+            missed=missed,
+            prepare=prepare,
+            prefetch=prefetch_minutes * 60
+        )
+
+    def build_scheduler(self, jobs=None, state_path=None, start_now=False):
+        """
+        Create a Scheduler with one posting job per spec.
+        
+        Args:
+            jobs: List of dicts with the keyword arguments of _scheduled_post_job
+                (name, interval_hours, jitter_minutes, missed, prefetch_minutes,
+                custom_topic); defaults to one daily job
+            state_path: Where the schedule is persisted (defaults to SCHEDULER_STATE_PATH)
+            start_now: Give jobs with no persisted slot their first slot now
+                rather than one interval from now
+        """
+        from scheduler import SCHEDULER_STATE_PATH, Scheduler
+        scheduler = Scheduler(state_path or SCHEDULER_STATE_PATH)
+        for spec in jobs or [{}]:
+            scheduler.add_job(self._scheduled_post_job(**spec), first_slot=time.time() if start_now else None)
+        return scheduler
+
+    def schedule_tweets(self, frequency_hours=24, jitter_minutes=0, missed="run_once", prefetch_minutes=10):
         """
         Schedule tweets to be posted at regular intervals.
         
+        Runs until interrupted (Ctrl-C or SIGTERM). Posting slots stay
+        `frequency_hours` apart regardless of how long each post takes, and
+        content for the next slot is generated `prefetch_minutes` early. A
+        background producer keeps the bundle buffer full in the meantime.
+        
         Args:
             frequency_hours: Hours between tweets
+            jitter_minutes: Random delay of up to this many minutes after each slot
+            missed: What to do about slots missed while stopped: "skip",
+                "run_once" or "catch_up"
+            prefetch_minutes: How early to generate content for the next slot
         """
         logger.info(f"Starting scheduled tweets every {frequency_hours} hours")
         
         try:
-            while True:
-                # Get trending topics and generate tweet
-                trending_topics = self.get_trending_ai_topics()
-                topic = random.choice(trending_topics)
-                tweet_content = self.generate_tweet_with_link_and_comments(topic)
-                self.post_tweet(tweet_content)
-                
-                # Sleep for the specified number of hours
-                time.sleep(frequency_hours * 3600)
-        except KeyboardInterrupt:
-            logger.info("Tweet scheduling stopped by user")
+            scheduler = self.build_scheduler([{
+                "interval_hours": frequency_hours,
+                "jitter_minutes": jitter_minutes,
+                "missed": missed,
+                "prefetch_minutes": prefetch_minutes
+            }], start_now=True)
+            self.start_buffer_producer()
+            scheduler.run_forever()
+            logger.info("Tweet scheduling stopped")
         except Exception as e:
             logger.error(f"Error in tweet scheduling: {str(e)}")
+        finally:
+            self.stop_buffer_producer()
+
+    def run_due_jobs(self, jobs=None):
+        """
+        Run whichever scheduled jobs are due now and return their names; for
+        cron/EventBridge-triggered invocations instead of a long-lived daemon.
+        """
+        # Keep the scheduler on warm agents so prefetched content survives between invocations
+        if self._scheduler is None or self._scheduler[0] != jobs:
+            self._scheduler = (jobs, self.build_scheduler(jobs))
+        return self._scheduler[1].run_pending()
 
     def post_tweet_v2(self, content):
         """Post a tweet to Twitter using API v2."""
+        import requests
         url = "https://api.twitter.com/2/tweets"
         headers = {
             "Authorization": f"Bearer {self.bearer_token}",
@@ -377,205 +1276,291 @@ class TwitterAgent:
         response = requests.post(url, headers=headers, json=payload)
         
         if response.status_code == 201:
-            logger.info(f"Tweet posted successfully: {content}")
-            return response.json()
+            data = response.json()
+            logger.info(f"Tweet {data['data']['id']} posted successfully")
+            return data
         else:
-            logger.error(f"Failed to post tweet: {response.status_code} - {response.text}")
+            logger.error(f"Failed to post tweet: HTTP {response.status_code}", extra={"response_body": response.text})
             return None
 
-    def generate_and_post_custom_tweet(self, custom_topic):
+    def generate_and_post_custom_tweet(self, custom_topic, defer_replies=None, use_cache=True, stream=None):
         """
         Generate and post a tweet about a custom topic provided by the user.
         
         Args:
             custom_topic (str): The topic to generate a tweet about
+            defer_replies (bool): Queue the follow-up comments instead of
+                posting them inline (defaults to the agent setting)
+            use_cache (bool): Set to False to force a fresh OpenAI completion
+            stream (bool): Stream the completion and stop once all fields are
+                parsed (defaults to the agent's stream_completions setting)
             
         Returns:
             tuple: The tweet response and comment responses
         """
         if not custom_topic or custom_topic.strip() == "":
             logger.warning("No custom topic provided. Using trending topics instead.")
-            return self.post_tweet_with_comments()
+            return self.post_tweet_with_comments(defer_replies=defer_replies)
         
         logger.info(f"Generating tweet about custom topic: {custom_topic}")
         
-        # Determine randomly how many comments to generate (1-3)
-        num_comments = random.randint(1, 3)
-        
-        prompt = f"""Create a tweet about this topic: "{custom_topic}".
+        # Falls back to a template (still posted) if OpenAI is unavailable
+        bundle = self.generate_bundle(custom_topic, custom=True, use_cache=use_cache, stream=stream)
+        return self.post_tweet_with_comments_content(bundle["tweet"], bundle["comments"], defer_replies,
+                                                     topic=custom_topic)
+
+    def _post_bundle(self, tweet_content, comments, defer_replies=None, topic=None):
+        """
+        Post a tweet and its follow-up comments, letting any error propagate.
         
-        Your response should include {num_comments + 2} parts, clearly separated:
+        The bundle is written to the outbox first, so if posting fails
+        partway resume_outbox() (or the next post_tweet_with_comments())
+        finishes it without generating it again. Posting a bundle the outbox
+        has already posted returns the stored IDs and sends nothing.
+        """
+        key = self.outbox.add(tweet_content, comments, topic=topic, account=self.account_name)
+        return self._post_outbox_bundle(key, defer_replies)
+
+    def _find_sent_tweet(self, text, since):
+        """
+        Look through this account's tweets since `since` (a Unix time) for
+        one with `text`, to learn whether a create_tweet call that was cut
+        off reached X. Links are compared loosely, as X rewrites them to t.co.
         
-        1. TWEET: A concise, engaging tweet (under 240 characters) that:
-           - Is professional yet conversational
-           - Includes relevant hashtags
-           - Has a call-to-action
-           - Uses emojis appropriately
-           - Sounds like you're speaking to a close friend (use phrases like "You won't believe this" or "Check this out")
-           - Focuses specifically on the topic: "{custom_topic}"
+        Returns:
+            str: The tweet's ID, or None if the account has no such tweet
+        """
+        from rate_limiter import get_rate_limiter
+        if self._user_id is None:
+            self.ensure_authenticated(force=True)
         
-        2. LINK: A specific, relevant URL to an article, research paper, or resource about this topic.
-           The link should be a real, working URL (e.g., https://example.com/article).
+        def comparable(value):
+            return " ".join(re.sub(r"https?://\S+", "", html.unescape(value)).split())
         
-        3. COMMENT1: A brief follow-up comment (under 200 characters) that could be posted as a reply to the tweet.
-           This should add additional insight or ask an engaging question related to the topic.
+        # A minute of slack for clock skew between us and X
+        start_time = datetime.fromtimestamp(since - 60, timezone.utc)
+        response = get_rate_limiter().call(self.account_name, TIMELINE_ENDPOINT, lambda: self.client.get_users_tweets(
+            self._user_id, start_time=start_time, max_results=100, user_auth=True
+        ))
+        wanted = comparable(text)
+        for tweet in response.data or []:
+            if comparable(tweet.text) == wanted:
+                return str(tweet.id)
+        return None
+
+    def _confirm_sent(self, bundle):
         """
+        Settle the parts of outbox `bundle` left "sending" by an attempt that
+        died or lost its connection mid-request: a part found on the
+        account's timeline is marked posted (updating `bundle` in place).
         
-        # Add additional comment prompts based on the random number
-        if num_comments >= 2:
-            prompt += """
-        4. COMMENT2: A second follow-up comment (under 200 characters) that adds more information or perspective.
-           This should be different from the first comment but still related to the topic.
+        Returns:
+            list: Positions of the parts that could not be found
         """
-        
-        if num_comments >= 3:
-            prompt += """
-        5. COMMENT3: A third follow-up comment (under 200 characters) that concludes the thread with a call-to-action.
-           This could ask for opinions, encourage sharing, or invite further discussion.
+        from outbox import POSTED, SENDING
+        key = bundle['key']
+        missing = []
+        for part in bundle['parts']:
+            if part['status'] != SENDING:
+                continue
+            tweet_id = self._find_sent_tweet(part['text'], bundle['created_at'])
+            if tweet_id is None:
+                missing.append(part['position'])
+                continue
+            self.outbox.mark_posted(key, part['position'], tweet_id)
+            part['status'], part['tweet_id'] = POSTED, tweet_id
+            if part['position'] == 0:
+                self._record_post(bundle['topic'], part['text'], tweet_id)
+            logger.info(f"Part {part['position']} of bundle {key} had reached X as tweet {tweet_id}")
+        return missing
+
+    def _post_outbox_bundle(self, key, defer_replies=None, claimed=False):
         """
+        Post whatever parts of outbox bundle `key` are not out yet: the root
+        tweet unless it already has an ID, then the remaining replies.
         
-        prompt += """
-        Format your response exactly like this:
-        TWEET: [your tweet text here]
-        LINK: [your relevant URL here]
-        COMMENT1: [your first follow-up comment here]
+        Returns:
+            tuple: The tweet response and comment responses; parts posted by
+            an earlier attempt are returned as stored responses carrying their IDs
         """
+        import tweepy
+        from outbox import POSTED, QUEUED
+        from rate_limiter import is_permanent_error
+        bundle = self.outbox.get(key)
+        root, replies = bundle['parts'][0], bundle['parts'][1:]
         
-        if num_comments >= 2:
-            prompt += "COMMENT2: [your second follow-up comment here]\n"
+        def stored(part):
+            return tweepy.Response({'id': part['tweet_id'], 'text': part['text']}, {}, [], {})
         
-        if num_comments >= 3:
-            prompt += "COMMENT3: [your third follow-up comment here]\n"
-
+        if bundle['status'] == POSTED:
+            logger.info(f"Bundle {key} was already posted as tweet {root['tweet_id']}")
+            return stored(root), [stored(part) for part in replies if part['status'] == POSTED]
+        if not claimed and not self.outbox.claim(key):
+            raise RuntimeError(f"Bundle {key} is {bundle['status']} and cannot be posted now")
+        
+        # Never resend a part blindly: an earlier attempt may have got it to X
         try:
-            
-            openai_key =  os.getenv("OPENAI_API_KEY")
-            
-            if not openai_key:
-                logger.warning("OpenAI API key not found, using template-based generation")
-                return self._generate_template_tweet(custom_topic)
-            
-            import openai
-            openai.api_key = openai_key
-
-            response = openai.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are a professional AI social media manager with expertise in finding relevant resources."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=400,  # Increased for multiple comments
-                temperature=0.7
-            )
-            
-            # Extract the full response
-            full_response = response.choices[0].message.content.strip()
-            
-            # Parse the response to extract tweet, link, and comments
-            tweet_part = ""
-            link_part = ""
-            comments = []
-            
-            # Extract each part using simple string parsing
-            lines = full_response.split('\n')
-            for line in lines:
-                if line.startswith("TWEET:"):
-                    tweet_part = line.replace("TWEET:", "").strip()
-                elif line.startswith("LINK:"):
-                    link_part = line.replace("LINK:", "").strip()
-                elif line.startswith("COMMENT1:"):
-                    comments.append(line.replace("COMMENT1:", "").strip())
-                elif line.startswith("COMMENT2:"):
-                    comments.append(line.replace("COMMENT2:", "").strip())
-                elif line.startswith("COMMENT3:"):
-                    comments.append(line.replace("COMMENT3:", "").strip())
-            
-            # Validate the link (basic check)
-            if not link_part.startswith("http"):
-                link_part = "https://arxiv.org/abs/2303.08774"  # Fallback link
-                logger.warning(f"Invalid link format: {link_part}. Using fallback link.")
-            
-            # Format the tweet with a natural call-to-action before the link
-            if "check this" not in tweet_part.lower() and "check it out" not in tweet_part.lower() and "learn more" not in tweet_part.lower():
-                # If the tweet doesn't already have a call-to-action, add one
-                call_to_action_phrases = [
-                    "Check this out: ",
-                    "Learn more here: ",
-                    "Read the full article: ",
-                    "Dive deeper: ",
-                    "More details here: ",
-                    "Fascinating read: ",
-                    "👉 ",
-                    "Explore this: "
-                ]
-                call_to_action = random.choice(call_to_action_phrases)
-                
-                # Combine tweet and link, ensuring we're under the character limit
-                max_tweet_length = 280 - len(call_to_action) - len(link_part) - 1  # -1 for space
-                if len(tweet_part) > max_tweet_length:
-                    tweet_part = tweet_part[:max_tweet_length-3] + "..."
-                
-                final_tweet = f"{tweet_part} {call_to_action}{link_part}"
-            else:
-                # If the tweet already has a call-to-action, just append the link
-                max_tweet_length = 280 - len(link_part) - 1  # -1 for space
-                if len(tweet_part) > max_tweet_length:
-                    tweet_part = tweet_part[:max_tweet_length-3] + "..."
-                
-                final_tweet = f"{tweet_part} {link_part}"
-            
-            # Remove any quotes
-            final_tweet = final_tweet.replace('"', '')
-            
-            # Ensure we have at least one comment
-            if not comments:
-                comments.append("What do you think about this? Let me know in the replies! 💬")
-            
-            # Post the tweet and comments
-            return self.post_tweet_with_comments_content(final_tweet, comments)
-            
+            missing = self._confirm_sent(bundle)
         except Exception as e:
-            logger.error(f"Error generating custom tweet with OpenAI: {str(e)}")
-            # Fallback
-            fallback_tweet = f"Interesting thoughts on {custom_topic}. What's your take on this topic? #Discussion"
-            fallback_comments = ["I'd love to hear your perspectives on this! Share your thoughts below. 💬"]
-            return self.post_tweet_with_comments_content(fallback_tweet, fallback_comments)
-
-    def post_tweet_with_comments_content(self, tweet_content, comments):
-        """Post a specific tweet content to Twitter and then post the provided follow-up comments."""
+            # The parts stay "sending", so the next attempt checks them again
+            status = self.outbox.fail(key, f"Could not look up unconfirmed parts: {str(e)}")
+            logger.warning(f"Bundle {key} left in the outbox ({status}) after: {str(e)}")
+            raise
+        if missing:
+            error = f"parts {missing} were being sent when an attempt stopped and are not on the timeline"
+            self.outbox.fail(key, f"Needs review: {error}", permanent=True)
+            logger.error(f"Bundle {key} failed and needs review: {error}")
+            raise RuntimeError(f"Bundle {key} needs review: {error}")
+        
         try:
-            # Post the initial tweet using the v2 API
-            tweet_response = self.client.create_tweet(text=tweet_content)
+            if root['status'] == POSTED:
+                tweet_response = stored(root)
+                logger.info(f"Resuming bundle {key} after tweet {root['tweet_id']}")
+            else:
+                # Post the initial tweet using the v2 API
+                media_ids = self._media_ids(bundle['topic'])
+                self.outbox.mark_sending(key, 0)
+                tweet_response = self._create_tweet(text=root['text'], media_ids=media_ids)
+                self.outbox.mark_posted(key, 0, tweet_response.data['id'])
+                logger.info(f"Tweet {tweet_response.data['id']} posted successfully ({len(root['text'])} chars)")
+                self._record_post(bundle['topic'], root['text'], tweet_response.data['id'])
             tweet_id = tweet_response.data['id']
-            logger.info(f"Tweet posted successfully: {tweet_content}")
             
-            # Post each follow-up comment as a reply to the initial tweet
-            comment_responses = []
-            parent_id = tweet_id  # Start with the original tweet as parent
-            
-            for comment in comments:
-                # Add a small delay between comments to make it look more natural
-                time.sleep(random.uniform(5, 15))  # Random delay between 5-15 seconds
-                
-                comment_response = self.client.create_tweet(
-                    text=comment,
-                    in_reply_to_tweet_id=parent_id
-                )
-                comment_id = comment_response.data['id']
-                logger.info(f"Follow-up comment posted successfully: {comment}")
-                comment_responses.append(comment_response)
-                
-                # For a thread-like structure, make each comment a reply to the previous one
-                # Uncomment the next line if you want comments to form a thread
-                # parent_id = comment_id
+            # Post each follow-up comment not yet posted or queued as a reply to the initial tweet
+            remaining = [part for part in replies if part['status'] not in (POSTED, QUEUED)]
+            comment_responses = [stored(part) for part in replies if part['status'] == POSTED]
+            comment_responses += self._post_replies(tweet_id, remaining, key, defer_replies)
+            self.outbox.complete(key)
+        except Exception as e:
+            retry_at = getattr(e, "retry_at", None)
+            if retry_at or (isinstance(e, tweepy.HTTPException) and not isinstance(e, tweepy.TwitterServerError)):
+                # X turned the request down (or nothing was sent), so the part is known
+                # not to be out; after a 5xx it stays "sending" for the next attempt to check
+                self.outbox.unmark_sending(key)
+            if retry_at:
+                # Rate limited before sending: not a failed attempt, just later
+                self.outbox.reschedule(key, retry_at)
+            else:
+                # A 4xx rejection (duplicate, bad request, ...) would only be rejected again
+                status = self.outbox.fail(key, str(e), permanent=is_permanent_error(e))
+                logger.warning(f"Bundle {key} left in the outbox ({status}) after: {str(e)}")
+            raise
+        
+        return tweet_response, comment_responses
+
+    def resume_outbox(self, limit=10, defer_replies=None, root_posted=None):
+        """
+        Finish posting bundles that an earlier attempt left in the outbox and
+        that are due for a retry, without generating anything.
+        
+        Args:
+            limit: Maximum number of bundles to resume
+            defer_replies: Queue their remaining replies (defaults to the agent setting)
+            root_posted: True to only finish bundles whose tweet is already
+                out, False to only post ones whose tweet is not, None for both
             
-            return tweet_response, comment_responses
+        Returns:
+            list: The root tweet IDs of the bundles completed
+        """
+        if self._outbox is None:
+            from outbox import OUTBOX_PATH
+            if not os.path.exists(OUTBOX_PATH):
+                return []
+        
+        tweet_ids = []
+        for key in self.outbox.claim_due(limit, account=self.account_name, root_posted=root_posted):
+            try:
+                tweet_response, _ = self._post_outbox_bundle(key, defer_replies, claimed=True)
+                tweet_ids.append(tweet_response.data['id'])
+            except Exception as e:
+                logger.error(f"Failed to resume outbox bundle {key}: {str(e)}")
+        return tweet_ids
+
+    def post_tweet_with_comments_content(self, tweet_content, comments, defer_replies=None, topic=None):
+        """
+        Post a specific tweet content to Twitter and then post the provided follow-up comments.
+        `topic`, if given, is recorded in the topic history alongside the tweet.
+        """
+        try:
+            return self._post_bundle(tweet_content, comments, defer_replies, topic=topic)
         except Exception as e:
             logger.error(f"Failed to post tweet or comments: {str(e)}")
             return None, None
 
+    def post_batch(self, topics=None, count=None, max_workers=BATCH_MAX_WORKERS,
+                   post_interval=BATCH_POST_INTERVAL, defer_replies=True, executor=None):
+        """
+        Generate and post tweets for many topics in one go.
+        
+        Content is generated concurrently on up to `max_workers` threads and
+        each bundle is posted as soon as it is ready, at most one root tweet
+        every `post_interval` seconds.
+        
+        Args:
+            topics: Topics to post about
+            count: Number of trending topics to post about when `topics` is omitted
+            max_workers: Concurrent generation workers
+            post_interval: Minimum seconds between root tweets
+            defer_replies: Queue follow-up comments instead of sleeping between them
+            executor: Shared thread pool to generate on instead of a private
+                one (max_workers is then ignored)
+            
+        Returns:
+            list: One dict per topic, in input order, with tweet_id,
+            comment_ids, timings (seconds) and error
+        """
+        if not topics:
+            trending_topics = self.get_trending_ai_topics()
+            topics = self._pick_topics(trending_topics, count or 1)
+        topics = list(topics)
+        logger.info(f"Posting batch of {len(topics)} topics for {self.account_name}")
+        
+        def generate(topic):
+            start = time.monotonic()
+            bundle = self.generate_tweet_with_link_and_comments(topic)
+            return bundle, time.monotonic() - start
+        
+        results = [{'topic': topic, 'tweet_id': None, 'comment_ids': [], 'timings': {}, 'error': None}
+                   for topic in topics]
+        last_post = None
+        own_executor = executor is None
+        if own_executor:
+            executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+        try:
+            futures = {executor.submit(generate, topic): i for i, topic in enumerate(topics)}
+            for future in as_completed(futures):
+                result = results[futures[future]]
+                try:
+                    (tweet_content, comments), generate_seconds = future.result()
+                    result['timings']['generate'] = round(generate_seconds, 3)
+                    
+                    if last_post is not None:
+                        wait = post_interval - (time.monotonic() - last_post)
+                        if wait > 0:
+                            time.sleep(wait)
+                    start = time.monotonic()
+                    last_post = start
+                    tweet_response, comment_responses = self._post_bundle(tweet_content, comments, defer_replies,
+                                                                          topic=result['topic'])
+                    result['timings']['post'] = round(time.monotonic() - start, 3)
+                    result['tweet_id'] = tweet_response.data['id']
+                    result['comment_ids'] = [resp.data['id'] for resp in comment_responses]
+                except Exception as e:
+                    logger.error(f"Failed to post batch item '{result['topic']}': {str(e)}")
+                    result['error'] = str(e)
+        finally:
+            if own_executor:
+                executor.shutdown(wait=False)
+        
+        posted = sum(1 for result in results if result['tweet_id'])
+        logger.info(f"Batch finished: {posted}/{len(topics)} tweets posted")
+        return results
+
 
 if __name__ == "__main__":
+    from logging_setup import configure_logging
+    configure_logging()
+    
     # Load credentials from environment variables for security
     api_key =  os.getenv("TWITTER_API_KEY")
     api_secret =  os.getenv("TWITTER_API_SECRET")
@@ -0,0 +1,276 @@
+"""
+Offline end-to-end benchmark of the agent against local stand-in servers.
+
+arXiv/TechCrunch pages come from benchmarks/fixtures, chat completions from a
+fake endpoint with configurable latency, and tweets (and media uploads) go to a
+fake X API with configurable rate limits (see standins.py), so nothing leaves
+the machine.
+Each stage is timed over several runs, then run once more under tracemalloc
+for its peak memory. Usage:
+
+    python benchmarks/bench_end_to_end.py [--runs 10] [--llm-latency 0.5]
+        [--tweet-limit 10000] [--batch 8] [--json out.json]
+"""
+import argparse
+import asyncio
+import hashlib
+import io
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(ROOT))
+sys.path.insert(0, ROOT)
+
+from standins import FakeOpenAI, FakeX, FixtureServer, redirect_hosts  # noqa: E402
+
+TOPIC = "Long-horizon planning in LLM agents"
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def configure_environment(workdir, openai_url):
+    """Point every cache, queue and client at the work directory and the stand-ins."""
+    os.environ.update({
+        "AWS_LAMBDA_FUNCTION_NAME": "bench",  # skip .env loading
+        "OPENAI_API_KEY": "sk-bench",
+        "OPENAI_BASE_URL": f"{openai_url}/v1",
+        "TWITTER_API_KEY": "bench-key",
+        "TWITTER_API_SECRET": "bench-secret",
+        "TWITTER_ACCESS_TOKEN": "1-bench-token",
+        "TWITTER_ACCESS_TOKEN_SECRET": "bench-token-secret",
+        "TWITTER_BEARER_TOKEN": "bench-bearer",
+        "TOPIC_CACHE_PATH": os.path.join(workdir, "topics.json"),
+        "GENERATION_CACHE_DIR": "",  # memory tier only, reset between runs
+        "REPLY_QUEUE_PATH": os.path.join(workdir, "replies.db"),
+        "SCHEDULER_STATE_PATH": os.path.join(workdir, "schedule.json"),
+        "TOPIC_HISTORY_PATH": os.path.join(workdir, "history.db"),
+        "OUTBOX_PATH": os.path.join(workdir, "outbox.db"),
+        "BUNDLE_BUFFER_PATH": os.path.join(workdir, "buffer.db"),
+        "ENGAGEMENT_DIR": os.path.join(workdir, "engagement"),
+        "MEDIA_CACHE_DIR": os.path.join(workdir, "media"),
+        "BUNDLE_BUFFER_SIZE": "0",  # stages generate inline unless they fill the buffer themselves
+        "METRICS_SINK": "memory",
+        "LOG_LEVEL": "WARNING",  # keep per-request logs out of the timings
+        "LOG_FILE": "",
+    })
+
+
+def reset_caches():
+    """Drop cached topics and completions so the next run does the real work."""
+    import generation_cache
+    import topic_cache
+    generation_cache._shared_cache = None
+    topic_cache.get_topic_cache().invalidate()
+
+
+def measure(name, func, runs, cold=True, items=1, setup=None):
+    """Time `func` over `runs` runs, then once more under tracemalloc. `setup` runs untimed before each."""
+    if not cold:
+        func()  # warm-up, so the timed runs see warm caches and connections
+    latencies = []
+    for _ in range(runs):
+        if cold:
+            reset_caches()
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - start)
+    if cold:
+        reset_caches()
+    if setup:
+        setup()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    total = sum(latencies)
+    result = {
+        "runs": runs,
+        "mean_ms": round(statistics.mean(latencies) * 1000, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "max_ms": round(max(latencies) * 1000, 2),
+        "throughput_per_s": round(runs * items / total, 3) if total else None,
+        "peak_kib": round(peak / 1024, 1),
+    }
+    print(f"{name:<28} {result['mean_ms']:>9.1f} {result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} "
+          f"{result['throughput_per_s'] or 0:>9.2f} {result['peak_kib']:>10.1f}")
+    return result
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(ROOT),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_stages(args):
+    import lambda_function
+    from agent import TwitterAgent
+
+    credentials = [os.environ[name] for name in (
+        "TWITTER_API_KEY", "TWITTER_API_SECRET", "TWITTER_ACCESS_TOKEN",
+        "TWITTER_ACCESS_TOKEN_SECRET", "TWITTER_BEARER_TOKEN")]
+    agent = TwitterAgent(*credentials, defer_replies=True)
+    media_agent = TwitterAgent(*credentials, defer_replies=True, attach_media=True)
+    tweet, comments = agent.generate_tweet_with_link_and_comments(TOPIC, use_cache=False, stream=False)
+    event = {"task": "post_tweet_with_comments", "defer_replies": True}
+
+    def lambda_cold():
+        lambda_function._agent = None
+        lambda_function.lambda_handler(event, None)
+
+    def cached_generation():
+        agent.generate_tweet_with_link_and_comments(TOPIC, stream=False)
+
+    async def agenerate():
+        try:
+            return await agent.agenerate_tweet_with_link_and_comments(TOPIC)
+        finally:
+            await agent.aclose()
+
+    posts = itertools.count()
+
+    def post_content():
+        # The outbox posts identical bundles only once; number them so every run posts
+        agent.post_tweet_with_comments_content(f"{tweet} ({next(posts)})", comments, defer_replies=True)
+
+    def buffer_bundle():
+        # Unrelated topics, so the topic history doesn't drop them as repeats
+        n = next(posts)
+        agent.bundle_buffer.put(hashlib.sha1(str(n).encode()).hexdigest(), f"{tweet} ({n})", comments,
+                                account=agent.account_name)
+
+    image_path = os.path.join(os.path.dirname(os.environ["MEDIA_CACHE_DIR"]), "image.png")
+
+    def write_image():
+        # New bytes every run, so nothing is served from the media cache
+        with open(image_path, "wb") as f:
+            f.write(os.urandom(args.image_kib * 1024))
+
+    def post_with_media():
+        n = next(posts)
+        media_agent.post_tweet_with_comments_content(f"{tweet} ({n})", comments, defer_replies=True,
+                                                     topic=media_topic)
+
+    from media import upload_media
+    media_topic = agent.get_trending_ai_topics()[0]
+    batch_topics = [f"{TOPIC} #{i}" for i in range(args.batch)]
+
+    from bulk_generate import generate_bundles, read_items
+    bulk_agent = TwitterAgent(None, None, None, None, None, authenticate=False)
+    bulk_lines = [json.dumps({"id": i, "topic": topic}) for i, topic in enumerate(batch_topics)]
+    runs = args.runs
+    print(f"{'stage':<28} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'per s':>9} {'peak KiB':>10}")
+    return {
+        "authenticate": measure("authenticate", lambda: TwitterAgent(*credentials), runs, cold=False),
+        "get_trending_ai_topics": measure(
+            "get_trending_ai_topics", lambda: agent.get_trending_ai_topics(use_cache=False), runs),
+        "get_trending_ai_topics_cached": measure(
+            "get_trending_ai_topics_cached", agent.get_trending_ai_topics, runs, cold=False),
+        "generate": measure(
+            "generate", lambda: agent.generate_tweet_with_link_and_comments(TOPIC, stream=False), runs),
+        "generate_stream": measure(
+            "generate_stream", lambda: agent.generate_tweet_with_link_and_comments(TOPIC, stream=True), runs),
+        "agenerate": measure(
+            "agenerate", lambda: asyncio.run(agenerate()), runs),
+        "generate_cached": measure("generate_cached", cached_generation, runs, cold=False),
+        "post_tweet_with_comments_content": measure(
+            "post_tweet_with_comments_content", post_content, runs),
+        "post_tweet_with_comments": measure(
+            "post_tweet_with_comments", lambda: agent.post_tweet_with_comments(defer_replies=True), runs),
+        "post_tweet_with_comments_buffered": measure(
+            "post_tweet_with_comments_buffered", lambda: agent.post_tweet_with_comments(defer_replies=True), runs,
+            setup=buffer_bundle),
+        "upload_media": measure(
+            "upload_media", lambda: upload_media(agent.api, image_path, "image/png"), runs, setup=write_image),
+        "post_tweet_with_media": measure("post_tweet_with_media", post_with_media, runs, cold=False),
+        "generate_and_post_custom_tweet": measure(
+            "generate_and_post_custom_tweet",
+            lambda: agent.generate_and_post_custom_tweet(TOPIC, defer_replies=True), runs),
+        "post_batch": measure(
+            "post_batch", lambda: agent.post_batch(topics=batch_topics, post_interval=0, defer_replies=True),
+            max(1, runs // 2), items=args.batch),
+        "bulk_generate": measure(
+            "bulk_generate", lambda: generate_bundles(bulk_agent, read_items(bulk_lines), io.StringIO()),
+            max(1, runs // 2), items=args.batch),
+        "lambda_handler_cold": measure("lambda_handler_cold", lambda_cold, runs),
+        "lambda_handler_warm": measure(
+            "lambda_handler_warm", lambda: lambda_function.lambda_handler(event, None), runs, cold=False),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Seconds before the first token")
+    parser.add_argument("--llm-token-latency", type=float, default=0.005, help="Seconds per streamed word")
+    parser.add_argument("--source-latency", type=float, default=0.05, help="Seconds per fixture page")
+    parser.add_argument("--x-latency", type=float, default=0.05, help="Seconds per X API request")
+    parser.add_argument("--tweet-limit", type=int, default=10000, help="Tweets allowed per rate-limit window")
+    parser.add_argument("--tweet-window", type=float, default=900, help="Rate-limit window in seconds")
+    parser.add_argument("--batch", type=int, default=8, help="Topics per post_batch run")
+    parser.add_argument("--image-kib", type=int, default=3072, help="Size of the image upload_media sends")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write the results to this file as JSON")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    with tempfile.TemporaryDirectory() as workdir, \
+            FixtureServer(latency=args.source_latency) as fixtures, \
+            FakeOpenAI(latency=args.llm_latency, per_token_latency=args.llm_token_latency) as fake_openai, \
+            FakeX(latency=args.x_latency, limit=args.tweet_limit, window=args.tweet_window) as fake_x:
+        configure_environment(workdir, fake_openai.url)
+        redirect_hosts({
+            "https://api.twitter.com": fake_x.url,
+            "https://upload.twitter.com": fake_x.url,
+            "https://arxiv.org": fixtures.url,
+            "https://techcrunch.com": fixtures.url,
+        })
+        stages = run_stages(args)
+        counters = {
+            "completion_requests": fake_openai.requests,
+            "streamed_tokens": fake_openai.streamed_tokens,
+            "tweets_posted": len(fake_x.posted),
+            "tweets_rate_limited": fake_x.rejected,
+            "media_uploads": fake_x.uploads,
+            "media_appends": fake_x.appends,
+            "max_concurrent_appends": fake_x.max_concurrent_appends,
+        }
+
+    print(f"\n{counters}")
+    if args.json:
+        summary = {
+            "benchmark": "end_to_end",
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": vars(args),
+            "stages": stages,
+            "counters": counters,
+        }
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"Wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Cold-start import profile for the Lambda entry point.
+
+Imports each target in a fresh interpreter under `-X importtime`, repeats the
+run to get a latency distribution (we care about p99, not only the mean), and
+prints the slowest modules from the median run. Usage:
+
+    python benchmarks/bench_import_time.py [--runs 30] [--top 15] [--json out.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Interpreter startup alone, what the handler imports at cold start, and what
+# a post pulls in on first use
+TARGETS = {
+    "interpreter": "pass",
+    "lambda_function": "import lambda_function",
+    "post_path": "import lambda_function, tweepy, openai, topic_sources",
+}
+
+
+def profile_once(statement):
+    """Return (total_us, {module: cumulative_us}) for one fresh interpreter."""
+    env = dict(os.environ, AWS_LAMBDA_FUNCTION_NAME="bench", PYTHONDONTWRITEBYTECODE="1")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    modules = {}
+    total = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue  # header line
+        cumulative = int(cumulative)
+        modules[name.strip()] = cumulative
+        if not name.startswith("  "):  # top-level import
+            total += cumulative
+    return total, modules
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=30)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--json", help="Write the summary to this file as JSON")
+    args = parser.parse_args()
+
+    report = {}
+    for label, statement in TARGETS.items():
+        runs = [profile_once(statement) for _ in range(args.runs)]
+        totals = [total for total, _ in runs]
+        median_run = sorted(runs, key=lambda run: run[0])[len(runs) // 2][1]
+        slowest = sorted(median_run.items(), key=lambda item: item[1], reverse=True)[:args.top]
+        report[label] = {
+            "statement": statement,
+            "runs": args.runs,
+            "mean_ms": statistics.mean(totals) / 1000,
+            "p50_ms": percentile(totals, 50) / 1000,
+            "p99_ms": percentile(totals, 99) / 1000,
+            "slowest_modules_ms": {name: us / 1000 for name, us in slowest},
+        }
+
+        print(f"{label}: {statement}")
+        print(f"  mean {report[label]['mean_ms']:.1f} ms  p50 {report[label]['p50_ms']:.1f} ms"
+              f"  p99 {report[label]['p99_ms']:.1f} ms  ({args.runs} runs)")
+        for name, ms in report[label]["slowest_modules_ms"].items():
+            print(f"    {ms:8.1f} ms  {name}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Micro-benchmark: full BeautifulSoup trees vs streaming selector extraction.
+
+Runs both parsers over the saved fixtures and reports mean time per parse and
+peak traced memory. Usage:
+
+    python benchmarks/bench_topic_parsing.py [--repeat 50]
+"""
+import argparse
+import os
+import sys
+import timeit
+import tracemalloc
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from topic_sources import parse_arxiv_listing, parse_feed, parse_techcrunch_category  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def legacy_arxiv(html, limit=5):
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+    return [t.text.replace('Title:', '').strip() for t in soup.select('div.list-title')[:limit]]
+
+
+def legacy_techcrunch(html, limit=5):
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+    return [h.text.strip() for h in soup.select('h2.post-block__title a')[:limit]]
+
+
+def legacy_feed(xml, limit=5):
+    from bs4 import BeautifulSoup, XMLParsedAsHTMLWarning
+    warnings.filterwarnings("ignore", category=XMLParsedAsHTMLWarning)
+    soup = BeautifulSoup(xml, 'html.parser')
+    return [item.title.text.strip() for item in soup.find_all('item')[:limit]]
+
+
+CASES = [
+    ("arxiv_cs_ai_recent.html", legacy_arxiv, parse_arxiv_listing),
+    ("techcrunch_ai.html", legacy_techcrunch, parse_techcrunch_category),
+    ("arxiv_cs_ai.rss", legacy_feed, parse_feed),
+]
+
+
+def measure(func, body, repeat):
+    seconds = min(timeit.repeat(lambda: func(body), number=1, repeat=repeat))
+    tracemalloc.start()
+    func(body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'fixture':28} {'parser':10} {'best ms':>9} {'peak KiB':>9}")
+    for fixture, legacy, streaming in CASES:
+        with open(os.path.join(FIXTURES, fixture), encoding="utf-8") as f:
+            body = f.read()
+        legacy_result = legacy(body)
+        # The streaming parsers also return each item's link; compare titles
+        streaming_result = [title for title, _ in streaming(body)]
+        if legacy_result != streaming_result:
+            print(f"  ! {fixture}: results differ\n    {legacy_result}\n    {streaming_result}")
+        for label, func in (("bs4", legacy), ("streaming", streaming)):
+            seconds, peak = measure(func, body, args.repeat)
+            print(f"{fixture:28} {label:10} {seconds * 1000:9.2f} {peak / 1024:9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Micro-benchmark: X weighted length and truncation throughput.
+
+Builds a synthetic batch of tweets shaped like generated ones (ASCII text
+with links, emoji, CJK, over-length drafts) and reports how many per second
+weighted_length(), is_valid() and truncate() get through, next to plain len()
+as the floor. Usage:
+
+    python benchmarks/bench_tweet_length.py [--count 10000] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tweet_text import MAX_WEIGHTED_LENGTH, is_valid, truncate, weighted_length  # noqa: E402
+
+WORDS = ("agents planning benchmark reasoning model scaling retrieval multimodal alignment "
+         "open weights inference latency dataset evaluation robotics").split()
+LINKS = ["https://arxiv.org/abs/2503.15000", "https://techcrunch.com/2025/03/20/ai-agents/", "arxiv.org/abs/2303.08774"]
+EXTRAS = ["🚀", "🤖", "👩‍🔬", "🇪🇺", "👍🏽", "大規模言語モデル", "#AI", "#MachineLearning", "café", "—"]
+
+
+def make_tweet(rng, words):
+    parts = [rng.choice(WORDS) for _ in range(words)]
+    for _ in range(rng.randint(0, 3)):
+        parts.insert(rng.randrange(len(parts) + 1), rng.choice(EXTRAS))
+    if rng.random() < 0.2:
+        # Plain ASCII, the common case
+        parts = [part for part in parts if part.isascii()]
+    return " ".join(parts) + " Check this out: " + rng.choice(LINKS)
+
+
+def throughput(func, texts, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts:
+            func(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return len(texts) / best, best / len(texts) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--count", type=int, default=10000, help="Tweets per batch")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    tweets = [make_tweet(rng, rng.randint(8, 35)) for _ in range(args.count)]
+    drafts = [make_tweet(rng, rng.randint(45, 70)) for _ in range(args.count)]
+    over = sum(1 for text in tweets + drafts if weighted_length(text) > MAX_WEIGHTED_LENGTH)
+    print(f"{len(tweets)} tweets + {len(drafts)} long drafts, {over} over {MAX_WEIGHTED_LENGTH} weighted chars")
+
+    print()
+    print(f"{'operation':24} {'per s':>12} {'us each':>9}")
+    for label, func, texts in (
+        ("len (floor)", len, tweets),
+        ("weighted_length", weighted_length, tweets),
+        ("is_valid", is_valid, tweets),
+        ("truncate (fits)", truncate, tweets),
+        ("truncate (over-length)", truncate, drafts),
+    ):
+        per_second, micros = throughput(func, texts, args.repeat)
+        print(f"{label:24} {per_second:12,.0f} {micros:9.2f}")
+
+    bad = [text for text in map(truncate, drafts) if weighted_length(text) > MAX_WEIGHTED_LENGTH]
+    if bad:
+        print(f"\n  ! {len(bad)} truncated drafts still over the limit, e.g. {bad[0]!r}")
+
+
+if __name__ == "__main__":
+    main()
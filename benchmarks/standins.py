@@ -0,0 +1,402 @@
+"""
+Local stand-ins for the services TweetSage talks to, for offline benchmarks.
+
+- FixtureServer: serves the saved arXiv / TechCrunch pages with ETag support,
+  and answers any other path (a linked article) with a small page whose
+  og:image is an /images/ path served as `image_bytes` of PNG
+- FakeOpenAI: /v1/chat/completions with configurable latency, streaming included
+- FakeX: /2/tweets (posting, and lookups with made-up public metrics),
+  /2/users/:id/tweets (the newest tweets it accepted),
+  /1.1/media/upload.json (simple and chunked INIT/APPEND/FINALIZE uploads)
+  and /1.1/account/verify_credentials.json, with a configurable rate limit on
+  posting reported through x-rate-limit-* headers
+
+redirect_hosts() points real hostnames at a stand-in, e.g. tweepy's hard-coded
+api.twitter.com at a FakeX, or arxiv.org at a FixtureServer.
+"""
+import hashlib
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+COMPLETION_TEXT = (
+    "TWEET: So, this new paper is wild. Agents that plan for hours without losing the plot? "
+    "Here's what I think: it's a big deal for #AI #MachineLearning. What do you think?\n"
+    "LINK: https://arxiv.org/abs/2503.14499\n"
+    "COMMENT1: The benchmark design is the interesting part: tasks are timed against human experts.\n"
+    "COMMENT2: If the trend holds, month-long tasks are within reach this decade. Can you imagine that?\n"
+    "COMMENT3: Would you trust an agent with a week-long project? Let me know below!\n"
+    "I hope these suggestions help you craft an engaging thread about the topic!"
+)
+
+
+class _QuietHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients dropping keep-alive connections (or closing a stream early) is expected
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+
+class _Server:
+    """Run a handler class on an ephemeral localhost port in a daemon thread."""
+
+    handler = None
+
+    def __init__(self):
+        handler = type(self.handler.__name__, (self.handler,), {"standin": self})
+        self.httpd = _QuietHTTPServer(("127.0.0.1", 0), handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.httpd.server_port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def send_body(self, status, body, content_type="application/json", headers=None):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length)
+
+    def read_json(self):
+        return json.loads(self.read_body() or b"{}")
+
+    def read_form(self):
+        """Fields of a urlencoded or multipart/form-data body, as str (or bytes for file parts)."""
+        content_type = self.headers.get("Content-Type", "")
+        body = self.read_body()
+        if not content_type.startswith("multipart/form-data"):
+            return {name: values[0] for name, values in parse_qs(body.decode()).items()}
+        message = BytesParser(policy=HTTP).parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode() + body)
+        form = {}
+        for part in message.iter_parts():
+            value = part.get_payload(decode=True)
+            form[part.get_param("name", header="content-disposition")] = (
+                value if part.get_filename() else value.decode()
+            )
+        return form
+
+
+class _FixtureHandler(_Handler):
+    def do_HEAD(self):
+        path = self.path.split("?", 1)[0]
+        status = 404 if path.startswith("/dead/") else 200
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        name = self.standin.routes.get(path)
+        if name is None:
+            if path.startswith("/dead/"):
+                return self.send_body(404, b"not found", "text/html")
+            if path.startswith("/images/"):
+                size = self.standin.image_bytes
+                return self.send_body(200, PNG_SIGNATURE + b"\0" * (size - len(PNG_SIGNATURE)), "image/png")
+            image = "/images/" + hashlib.md5(path.encode()).hexdigest() + ".png"
+            page = f'<html><head><title>Article</title><meta property="og:image" content="{image}"></head></html>'
+            return self.send_body(200, page.encode(), "text/html")
+        with open(os.path.join(FIXTURES, name), "rb") as f:
+            body = f.read()
+        etag = '"%s"' % hashlib.md5(body).hexdigest()
+        if self.standin.etags and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        time.sleep(self.standin.latency)
+        headers = {"ETag": etag} if self.standin.etags else {}
+        self.send_body(200, body, "text/html; charset=utf-8", headers)
+
+
+class FixtureServer(_Server):
+    """Serves saved pages at their real paths (and /arxiv, /techcrunch, /rss); paths under /dead/ are 404s."""
+
+    handler = _FixtureHandler
+
+    def __init__(self, latency=0.0, etags=True, image_bytes=64 * 1024):
+        super().__init__()
+        self.latency = latency
+        self.etags = etags
+        self.image_bytes = image_bytes
+        self.routes = {
+            "/arxiv": "arxiv_cs_ai_recent.html",
+            "/list/cs.AI/recent": "arxiv_cs_ai_recent.html",
+            "/techcrunch": "techcrunch_ai.html",
+            "/category/artificial-intelligence/": "techcrunch_ai.html",
+            "/rss": "arxiv_cs_ai.rss",
+        }
+
+
+class _OpenAIHandler(_Handler):
+    def do_POST(self):
+        request = self.read_json()
+        standin = self.standin
+        standin.requests += 1
+        if request.get("stream"):
+            return self._stream(request)
+        time.sleep(standin.latency + standin.per_token_latency * len(standin.text.split()))
+        self.send_body(200, {
+            "id": "chatcmpl-bench", "object": "chat.completion", "created": int(time.time()),
+            "model": request.get("model", "gpt-4"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": standin.text}}],
+            "usage": {"prompt_tokens": len(str(request.get("messages")).split()),
+                      "completion_tokens": len(standin.text.split()),
+                      "total_tokens": 0},
+        })
+
+    def _stream(self, request):
+        standin = self.standin
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        time.sleep(standin.latency)
+        try:
+            for word in standin.text.split(" "):
+                chunk = {"id": "chatcmpl-bench", "object": "chat.completion.chunk", "created": int(time.time()),
+                         "model": request.get("model", "gpt-4"),
+                         "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}]}
+                self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode())
+                standin.streamed_tokens += 1
+                time.sleep(standin.per_token_latency)
+            self._write_chunk(b"data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client closed the stream early
+
+    def _write_chunk(self, data):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+
+class FakeOpenAI(_Server):
+    """
+    Chat-completions endpoint. Each response takes `latency` seconds plus
+    `per_token_latency` per word; set OPENAI_BASE_URL to `url + "/v1"`.
+    """
+
+    handler = _OpenAIHandler
+
+    def __init__(self, latency=0.5, per_token_latency=0.005, text=COMPLETION_TEXT):
+        super().__init__()
+        self.latency = latency
+        self.per_token_latency = per_token_latency
+        self.text = text
+        self.requests = 0
+        self.streamed_tokens = 0
+
+
+class _XHandler(_Handler):
+    def do_GET(self):
+        if self.path.startswith("/1.1/account/verify_credentials.json"):
+            time.sleep(self.standin.latency)
+            return self.send_body(200, {"id": 1, "id_str": "1", "screen_name": "tweetsage_bench"})
+        if self.path.startswith("/2/tweets?"):
+            return self.lookup()
+        if self.path.startswith("/2/users/"):
+            return self.timeline()
+        self.send_body(404, {"title": "Not Found"})
+
+    def lookup(self):
+        """GET /2/tweets?ids=...: made-up public metrics for tweets this stand-in accepted."""
+        ids = parse_qs(urlparse(self.path).query).get("ids", [""])[0].split(",")
+        standin = self.standin
+        time.sleep(standin.latency)
+        with standin.lock:
+            standin.lookups += 1
+            known = [tweet_id for tweet_id in ids if tweet_id in standin.tweets]
+        data = []
+        for tweet_id in known:
+            seed = int(tweet_id) % 997
+            data.append({"id": tweet_id, "text": standin.tweets[tweet_id], "edit_history_tweet_ids": [tweet_id],
+                         "public_metrics": {"retweet_count": seed % 7, "reply_count": seed % 5,
+                                            "like_count": seed % 40, "quote_count": seed % 3,
+                                            "bookmark_count": seed % 4, "impression_count": 200 + seed}})
+        errors = [{"value": tweet_id, "detail": f"Could not find tweet with ids: [{tweet_id}].",
+                   "title": "Not Found Error", "type": "https://api.twitter.com/2/problems/resource-not-found"}
+                  for tweet_id in ids if tweet_id not in standin.tweets]
+        body = {"data": data} if data else {}
+        if errors:
+            body["errors"] = errors
+        self.send_body(200, body)
+
+    def timeline(self):
+        """GET /2/users/:id/tweets: the newest 100 tweets this stand-in accepted, newest first."""
+        standin = self.standin
+        time.sleep(standin.latency)
+        with standin.lock:
+            newest = list(standin.tweets.items())[-100:][::-1]
+            standin.lookups += 1
+        data = [{"id": tweet_id, "text": text, "edit_history_tweet_ids": [tweet_id]} for tweet_id, text in newest]
+        self.send_body(200, {"data": data, "meta": {"result_count": len(data)}} if data else
+                       {"meta": {"result_count": 0}})
+
+    def upload(self):
+        """POST /1.1/media/upload.json: a simple upload, or one step of a chunked one."""
+        form = self.read_form()
+        standin = self.standin
+        command = form.get("command")
+        time.sleep(standin.latency)
+        with standin.lock:
+            if command in (None, "INIT"):
+                media_id = str(next(standin.ids))
+                size = int(form["total_bytes"]) if command == "INIT" else len(form["media"])
+                standin.media[media_id] = {"size": size, "segments": {}, "finalized": command is None}
+            else:
+                media_id = form.get("media_id")
+                if media_id not in standin.media:
+                    return self.send_body(400, {"errors": [{"code": 324, "message": "Invalid media_id"}]})
+            upload = standin.media[media_id]
+            if command is None:
+                standin.uploads += 1
+            elif command == "APPEND":
+                standin.appends += 1
+                standin.appending += 1
+                standin.max_concurrent_appends = max(standin.max_concurrent_appends, standin.appending)
+        if command == "APPEND":
+            # Hold the segment like a slow uplink would, so concurrent APPENDs overlap
+            time.sleep(standin.append_latency)
+            with standin.lock:
+                standin.appending -= 1
+                upload["segments"][int(form["segment_index"])] = len(form["media"])
+            return self.send_body(204, b"")
+        if command == "FINALIZE":
+            received = sum(upload["segments"].values())
+            if received != upload["size"]:
+                return self.send_body(400, {"errors": [{"code": 324, "message":
+                                                        f"Got {received} of {upload['size']} bytes"}]})
+            with standin.lock:
+                upload["finalized"] = True
+                standin.uploads += 1
+        body = {"media_id": int(media_id), "media_id_string": media_id, "size": upload["size"]}
+        if command != "INIT":
+            body["expires_after_secs"] = 86400
+        self.send_body(202 if command == "INIT" else 200, body)
+
+    def do_POST(self):
+        if self.path.startswith("/1.1/media/upload.json"):
+            return self.upload()
+        if not self.path.startswith("/2/tweets"):
+            return self.send_body(404, {"title": "Not Found"})
+        request = self.read_json()
+        standin = self.standin
+        time.sleep(standin.latency)
+        with standin.lock:
+            now = time.time()
+            if now >= standin.reset_at:
+                standin.remaining = standin.limit
+                standin.reset_at = now + standin.window
+            headers = {
+                "x-rate-limit-limit": str(standin.limit),
+                "x-rate-limit-reset": str(int(standin.reset_at)),
+            }
+            if standin.remaining <= 0:
+                standin.rejected += 1
+                headers["x-rate-limit-remaining"] = "0"
+                return self.send_body(429, {"title": "Too Many Requests"}, headers=headers)
+            standin.remaining -= 1
+            standin.posted.append(request)
+            headers["x-rate-limit-remaining"] = str(standin.remaining)
+            tweet_id = str(next(standin.ids))
+            standin.tweets[tweet_id] = request.get("text", "")
+        self.send_body(201, {"data": {"id": tweet_id, "text": request.get("text", ""),
+                                      "edit_history_tweet_ids": [tweet_id]}}, headers=headers)
+
+
+class FakeX(_Server):
+    """X API stand-in allowing `limit` tweets per `window` seconds."""
+
+    handler = _XHandler
+
+    def __init__(self, latency=0.05, limit=10000, window=900):
+        super().__init__()
+        self.latency = latency
+        self.limit = limit
+        self.window = window
+        self.remaining = limit
+        self.reset_at = time.time() + window
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1900000000000000000)
+        self.posted = []
+        self.tweets = {}
+        self.rejected = 0
+        self.lookups = 0
+        self.media = {}
+        self.uploads = 0
+        self.appends = 0
+        self.appending = 0
+        self.max_concurrent_appends = 0
+        self.append_latency = latency
+
+
+def redirect_hosts(mapping):
+    """
+    Route every requests.Session call to a host in `mapping` (e.g.
+    {"https://arxiv.org": fixtures.url}) to its stand-in. tweepy and the topic
+    sources build URLs from real hostnames, so benchmarks patch the transport
+    instead of the code under test.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    class _Redirect(HTTPAdapter):
+        def send(self, request, **kwargs):
+            for host, base_url in mapping.items():
+                if request.url.startswith(host):
+                    request.url = base_url + request.url[len(host):]
+                    break
+            return super().send(request, **kwargs)
+
+    original_init = requests.Session.__init__
+
+    def __init__(self, *args, **kwargs):
+        original_init(self, *args, **kwargs)
+        adapter = _Redirect()
+        for host in mapping:
+            self.mount(host, adapter)
+
+    requests.Session.__init__ = __init__
+
+
+def redirect_twitter_to(base_url):
+    """Point api.twitter.com and upload.twitter.com at a FakeX."""
+    redirect_hosts({"https://api.twitter.com": base_url, "https://upload.twitter.com": base_url})
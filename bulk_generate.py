@@ -0,0 +1,202 @@
+"""
+Generate tweet bundles for a stream of topics, without posting anything.
+
+Reads JSONL topics (a file or stdin), one per line: either a JSON string or
+an object like {"id": "mon-am", "topic": "...", "custom": true}. Bundles
+are generated concurrently and written to JSONL as each one completes:
+
+    {"id": ..., "line": 3, "topic": ..., "tweet": ..., "text": ..., "link": ...,
+     "comments": [...], "fallback": false, "weighted_length": 212,
+     "timings": {"queued_ms": ..., "total_ms": ..., "llm_call": ..., ...}}
+
+Items that fail are written with an "error" field instead, including ones
+OpenAI could not generate (the agent's canned template is not kept). The
+output file is also the checkpoint: rerunning with the same output skips
+every item it already holds a bundle for and retries the failed ones, so an
+interrupted run, or one cut short by an OpenAI outage, resumes where it stopped.
+No Twitter client is built, so no Twitter credentials are needed. Usage:
+
+    python bulk_generate.py topics.jsonl -o bundles.jsonl [--workers 4] [--custom]
+    cat topics.jsonl | python bulk_generate.py - > bundles.jsonl
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from metrics import get_metrics
+from tweet_text import weighted_length
+
+logger = logging.getLogger("TwitterAgent")
+
+BULK_MAX_WORKERS = int(os.getenv("BULK_MAX_WORKERS", "4"))
+# Items read ahead of the workers; together with the workers this bounds memory
+BULK_READ_AHEAD = 2
+
+
+def read_items(lines, custom=False):
+    """
+    Parse JSONL topic lines lazily.
+
+    Yields:
+        dict: id (the line's "id", else its line number), line, topic and
+        custom; or id, line and error for a line that is not a usable topic
+    """
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            value = json.loads(line)
+        except ValueError as e:
+            yield {"id": number, "line": number, "error": f"Invalid JSON: {str(e)}"}
+            continue
+        if isinstance(value, str):
+            value = {"topic": value}
+        if not isinstance(value, dict) or not isinstance(value.get("topic"), str) or not value["topic"].strip():
+            yield {"id": number, "line": number, "error": "Expected a topic string or an object with a \"topic\""}
+            continue
+        yield {"id": value.get("id", number), "line": number, "topic": value["topic"].strip(),
+               "custom": bool(value.get("custom", custom))}
+
+
+def completed_ids(path):
+    """
+    IDs of the bundles already written to the output file at `path`, for
+    resuming. A last line cut short by an interrupted run is removed.
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "rb+") as f:
+        end = 0
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            end += len(line)
+            if "error" not in record and not record.get("fallback"):
+                done.add(json.dumps(record.get("id")))
+        f.truncate(end)
+    return done
+
+
+def _generate(agent, item, submitted_at, use_cache):
+    started_at = time.perf_counter()
+    record = {"id": item["id"], "line": item["line"], "topic": item["topic"]}
+    try:
+        with get_metrics().collect(this_thread=True) as stages:
+            bundle = agent.generate_bundle(item["topic"], custom=item["custom"], use_cache=use_cache)
+        if bundle["fallback"]:
+            # Template text, not generated content: leave the item for a resumed run to retry
+            record["error"] = "OpenAI generation failed, only the template fallback was available"
+        else:
+            record.update(bundle)
+            record["weighted_length"] = weighted_length(bundle["tweet"])
+    except Exception as e:
+        logger.error(f"Error generating bundle for line {item['line']}: {str(e)}")
+        record["error"] = str(e)
+        stages = {}
+    finished_at = time.perf_counter()
+    record["timings"] = dict(stages, queued_ms=round((started_at - submitted_at) * 1000, 1),
+                             total_ms=round((finished_at - started_at) * 1000, 1))
+    return record
+
+
+def generate_bundles(agent, items, output, max_workers=BULK_MAX_WORKERS, skip=(), use_cache=True):
+    """
+    Generate a bundle for each item and write it to `output` as a JSON line
+    as soon as it is ready, in completion order.
+
+    Items are pulled from `items` only as workers free up, so an arbitrarily
+    long input is processed in bounded memory.
+
+    Args:
+        agent: A TwitterAgent (one built with authenticate=False will do)
+        items: Item dicts, as yielded by read_items()
+        output: Text file to write records to; flushed after each one
+        max_workers: Bundles generated at once
+        skip: JSON-encoded IDs of items to leave out, from completed_ids()
+        use_cache: Set to False to force fresh OpenAI completions
+
+    Returns:
+        dict: Counts of generated, failed and skipped items, and the elapsed seconds
+    """
+    counts = {"generated": 0, "failed": 0, "skipped": 0}
+    start = time.perf_counter()
+
+    def write(record):
+        output.write(json.dumps(record, ensure_ascii=False) + "\n")
+        output.flush()
+        counts["failed" if "error" in record else "generated"] += 1
+
+    pending = set()
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bulk-generate") as executor:
+        for item in items:
+            if json.dumps(item["id"]) in skip:
+                counts["skipped"] += 1
+                continue
+            if "error" in item:
+                write(item)
+                continue
+            if len(pending) >= max_workers * BULK_READ_AHEAD:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    write(future.result())
+            pending.add(executor.submit(_generate, agent, item, time.perf_counter(), use_cache))
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                write(future.result())
+
+    counts["elapsed_s"] = round(time.perf_counter() - start, 3)
+    logger.info(f"Bulk generation finished: {counts}")
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("input", nargs="?", default="-", help="JSONL of topics, or - for stdin (the default)")
+    parser.add_argument("-o", "--output", default="-",
+                        help="JSONL file to write bundles to (appended to and resumed from), or - for stdout")
+    parser.add_argument("--workers", type=int, default=BULK_MAX_WORKERS, help="Bundles generated at once")
+    parser.add_argument("--custom", action="store_true",
+                        help="Use the custom-topic prompt for lines that don't set \"custom\"")
+    parser.add_argument("--no-cache", action="store_true", help="Always request fresh completions")
+    parser.add_argument("--restart", action="store_true", help="Overwrite the output instead of resuming")
+    args = parser.parse_args(argv)
+
+    from logging_setup import configure_logging
+    # Keep stdout for the bundles
+    configure_logging(stream=sys.stderr)
+    from agent import TwitterAgent
+    agent = TwitterAgent(None, None, None, None, None, authenticate=False)
+
+    skip = set()
+    if args.output != "-" and not args.restart:
+        skip = completed_ids(args.output)
+        if skip:
+            logger.info(f"Resuming {args.output}: {len(skip)} bundles already written")
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    output = sys.stdout if args.output == "-" else open(args.output, "w" if args.restart else "a",
+                                                        encoding="utf-8")
+    try:
+        counts = generate_bundles(agent, read_items(source, args.custom), output, args.workers, skip,
+                                  use_cache=not args.no_cache)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+    print(json.dumps(counts), file=sys.stderr)
+    return 1 if counts["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger("TwitterAgent")
+
+BUNDLE_BUFFER_PATH = os.getenv("BUNDLE_BUFFER_PATH", "/tmp/twitter_agent_buffer.db")
+# Ready-to-post bundles the producer keeps per account; 0 disables the buffer
+BUNDLE_BUFFER_SIZE = int(os.getenv("BUNDLE_BUFFER_SIZE", "3"))
+# Seconds a bundle may wait before it is considered stale news and dropped
+BUNDLE_BUFFER_TTL = float(os.getenv("BUNDLE_BUFFER_TTL", "21600"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS bundles (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    account TEXT,
+    topic TEXT,
+    tweet TEXT NOT NULL,
+    comments TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS bundles_account ON bundles (account, expires_at);
+"""
+
+
+class BundleBuffer:
+    """
+    Durable SQLite buffer of generated, ready-to-post bundles.
+
+    A producer (refill) tops it up to `capacity` bundles per account ahead
+    of time, and the post path pops the oldest one instead of scraping and
+    generating inline. Bundles older than `ttl` are evicted unposted.
+    """
+
+    def __init__(self, path=BUNDLE_BUFFER_PATH, capacity=BUNDLE_BUFFER_SIZE, ttl=BUNDLE_BUFFER_TTL):
+        self.path = path
+        self.capacity = capacity
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def adopt(self, account):
+        """Give bundles stored without an account to `account`. Returns how many there were."""
+        with self._lock:
+            return self._conn.execute("UPDATE bundles SET account = ? WHERE account IS NULL", (account,)).rowcount
+
+    def evict_expired(self, now=None):
+        """Drop bundles past their expiry. Returns how many were dropped."""
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM bundles WHERE expires_at <= ?", (now or time.time(),))
+        if cursor.rowcount:
+            logger.info(f"Evicted {cursor.rowcount} expired bundles from the buffer")
+        return cursor.rowcount
+
+    def put(self, topic, tweet, comments, account=None, ttl=None):
+        """Add a bundle, to be posted within `ttl` seconds (defaults to the buffer's)."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO bundles (account, topic, tweet, comments, created_at, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (account, topic, tweet, json.dumps(list(comments)), now, now + (ttl or self.ttl))
+            )
+
+    def pop(self, account=None):
+        """
+        Remove and return the oldest unexpired bundle of `account`.
+
+        Returns:
+            tuple: (topic, tweet, comments), or None if the buffer is empty
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT id, topic, tweet, comments FROM bundles "
+                    "WHERE expires_at > ? AND (? IS NULL OR account = ?) "
+                    "ORDER BY id LIMIT 1", (time.time(), account, account)
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute("DELETE FROM bundles WHERE id = ?", (row[0],))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        return row[1], row[2], json.loads(row[3])
+
+    def topics(self, account=None):
+        """Topics of the unexpired bundles waiting for `account`."""
+        with self._lock:
+            return [row[0] for row in self._conn.execute(
+                "SELECT topic FROM bundles WHERE expires_at > ? AND (? IS NULL OR account = ?) "
+                "ORDER BY id", (time.time(), account, account)
+            ) if row[0]]
+
+    def size(self, account=None):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM bundles WHERE expires_at > ? AND (? IS NULL OR account = ?)",
+                (time.time(), account, account)
+            ).fetchone()[0]
+
+    def shortfall(self, account=None):
+        """How many bundles `account` is short of a full buffer."""
+        return max(0, self.capacity - self.size(account))
@@ -0,0 +1,103 @@
+import logging
+import re
+
+logger = logging.getLogger("TwitterAgent")
+
+_FIELD = re.compile(r"^(TWEET|LINK|COMMENT\d+):")
+
+
+class CompletionFieldParser:
+    """
+    Incrementally collect a TWEET:/LINK:/COMMENTn: completion as it streams.
+
+    Text is fed in arbitrary deltas; a field counts as received once its line
+    is terminated by a newline (or the stream ends). `complete` turns true as
+    soon as TWEET, LINK and COMMENT1..num_comments have all been received, at
+    which point the rest of the stream can be dropped.
+    """
+
+    def __init__(self, num_comments):
+        self.required = {"TWEET", "LINK"} | {f"COMMENT{i}" for i in range(1, num_comments + 1)}
+        self.seen = set()
+        self.lines = []
+        self._buffer = ""
+
+    def feed(self, delta):
+        """Add a streamed delta; returns True once every required field is in."""
+        if delta:
+            self._buffer += delta
+            *lines, self._buffer = self._buffer.split("\n")
+            for line in lines:
+                self._add_line(line)
+        return self.complete
+
+    def close(self):
+        """Flush a final unterminated line when the stream ends."""
+        if self._buffer:
+            self._add_line(self._buffer)
+            self._buffer = ""
+
+    def _add_line(self, line):
+        if self.complete:
+            return
+        self.lines.append(line)
+        match = _FIELD.match(line)
+        if match:
+            self.seen.add(match.group(1))
+
+    @property
+    def complete(self):
+        return self.required <= self.seen
+
+    @property
+    def text(self):
+        """The completion text received up to the last required field."""
+        return "\n".join(self.lines).strip()
+
+
+def stream_completion_sync(client, num_comments, **request):
+    """
+    Blocking counterpart of stream_completion(), for an openai.OpenAI
+    client (or the openai module's default client): stops reading and
+    closes the stream as soon as all required fields have arrived.
+
+    Returns:
+        str: The completion text, as parsed so far
+    """
+    parser = CompletionFieldParser(num_comments)
+    stream = client.chat.completions.create(stream=True, **request)
+    try:
+        for chunk in stream:
+            if chunk.choices and parser.feed(chunk.choices[0].delta.content):
+                logger.debug("All completion fields received, closing stream early")
+                break
+    finally:
+        stream.close()
+    parser.close()
+    return parser.text
+
+
+async def stream_completion(client, num_comments, **request):
+    """
+    Stream a chat completion and stop reading as soon as all required fields
+    have arrived, closing the stream so no further tokens are generated.
+
+    Args:
+        client: An openai.AsyncOpenAI client
+        num_comments: Number of COMMENTn fields the prompt asked for
+        request: Arguments for client.chat.completions.create
+
+    Returns:
+        str: The completion text, as parsed so far
+    """
+    parser = CompletionFieldParser(num_comments)
+    stream = await client.chat.completions.create(stream=True, **request)
+    try:
+        async for chunk in stream:
+            if chunk.choices and parser.feed(chunk.choices[0].delta.content):
+                logger.debug("All completion fields received, closing stream early")
+                break
+    finally:
+        await stream.close()
+    parser.close()
+    return parser.text
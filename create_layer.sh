@@ -18,23 +18,37 @@ python3 -m venv venv
 echo "✅ Activating virtual environment..."
 source venv/bin/activate
 
-# 3. Install dependencies from requirements.txt
-echo "📦 Installing dependencies from requirements.txt..."
-pip install -r requirements.txt
-
-# 4. Create a directory for Lambda Layer
+# 3. Create a directory for Lambda Layer
 echo "📁 Creating python directory..."
 mkdir -p python
 
-# 5. Install all dependencies into the 'python' directory
+# 4. Install all dependencies into the 'python' directory
 echo "📥 Installing dependencies into Lambda Layer..."
-pip install --target=python -r requirements.txt
+pip install --no-compile --target=python -r requirements.txt
+# Optional extras: WITH_MEDIA=1 adds Pillow for title cards (MEDIA_ATTACH)
+if [ "${WITH_MEDIA:-0}" = "1" ]; then
+  pip install --no-compile --target=python -r requirements-media.txt
+fi
 
-# 6. Zip the layer
+# 5. Strip what the function never imports at runtime: packaging tools,
+#    dotenv (Lambda reads the function environment), tests and type stubs
+echo "✂️ Stripping unused packages and files..."
+rm -rf python/bin python/pip* python/setuptools* python/wheel* python/_distutils_hack python/dotenv python/python_dotenv*
+find python -type d \( -name "tests" -o -name "test" -o -name "__pycache__" \) -prune -exec rm -rf {} +
+find python -type f \( -name "*.pyi" -o -name "*.pyc" \) -delete
+find python -path "*.dist-info/*" -type f ! -name "METADATA" ! -name "entry_points.txt" ! -name "top_level.txt" ! -path "*/licenses/*" -delete
+
+# 6. Bytecode-compile the rest so cold starts don't compile on import (the
+#    layer is read-only at runtime, so Python could never cache these itself).
+#    Run this script with the same Python version as the Lambda runtime.
+echo "⚙️ Bytecode-compiling dependencies..."
+python -m compileall -q -j 0 --invalidation-mode unchecked-hash python
+
+# 7. Zip the layer
 echo "🗜️ Zipping the layer..."
-zip -r lambda_layer.zip python/
+zip -r -q -9 lambda_layer.zip python/
 
-# 7. Cleanup
+# 8. Cleanup
 echo "🧹 Deactivating virtual environment and cleaning up..."
 deactivate
 rm -rf venv
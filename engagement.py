@@ -0,0 +1,316 @@
+import json
+import logging
+import os
+import struct
+import threading
+import time
+
+logger = logging.getLogger("TwitterAgent")
+
+ENGAGEMENT_DIR = os.getenv("ENGAGEMENT_DIR", "/tmp/twitter_agent_engagement")
+# Tweets are refreshed while younger than this; engagement has mostly settled after a week
+ENGAGEMENT_WINDOW = float(os.getenv("ENGAGEMENT_WINDOW_DAYS", "7")) * 86400
+# Minimum seconds between two fetches of the same tweet
+ENGAGEMENT_REFRESH_INTERVAL = float(os.getenv("ENGAGEMENT_REFRESH_INTERVAL", "3600"))
+# Tweets per lookup request; the most GET /2/tweets accepts
+LOOKUP_BATCH_SIZE = 100
+
+# Fixed-width little-endian records, appended as they come in. The same
+# layouts as NumPy structured dtypes let summaries load a file in one read.
+POST_FORMAT = struct.Struct("<qdIHI")
+POST_FIELDS = ("tweet_id", "posted_at", "account", "source", "topic")
+POST_DTYPE = [("tweet_id", "<i8"), ("posted_at", "<f8"), ("account", "<u4"), ("source", "<u2"), ("topic", "<u4")]
+METRIC_FORMAT = struct.Struct("<qdqIIIII")
+# One record per tweet looked up (found or not), so fetch times are appended rather than rewritten
+FETCH_FORMAT = struct.Struct("<qd")
+METRIC_FIELDS = ("tweet_id", "fetched_at", "impressions", "likes", "retweets", "replies", "quotes", "bookmarks")
+METRIC_DTYPE = [("tweet_id", "<i8"), ("fetched_at", "<f8"), ("impressions", "<i8"), ("likes", "<u4"),
+                ("retweets", "<u4"), ("replies", "<u4"), ("quotes", "<u4"), ("bookmarks", "<u4")]
+# public_metrics keys, in METRIC_FIELDS order after fetched_at
+PUBLIC_METRICS = ("impression_count", "like_count", "retweet_count", "reply_count", "quote_count", "bookmark_count")
+INTERACTIONS = ("likes", "retweets", "replies", "quotes", "bookmarks")
+
+HOUR_OF_WEEK = "hour_of_week"
+SOURCE = "source"
+TOPIC = "topic"
+GROUPINGS = (HOUR_OF_WEEK, SOURCE, TOPIC)
+
+
+def hour_of_week(timestamp):
+    """Hour of the week in UTC, 0 for Monday 00:00 to 167 for Sunday 23:00."""
+    # The epoch fell on a Thursday, 72 hours after a Monday midnight
+    return (int(timestamp // 3600) + 72) % 168
+
+
+class EngagementStore:
+    """
+    Compact, append-only store of posted tweets and their public metrics.
+
+    posts.bin holds one fixed-width record per posted tweet (ID, time and
+    the account, source and topic as indices into labels.jsonl), metrics.bin
+    one record per metrics snapshot and fetches.bin one (tweet ID, time) per
+    lookup, so recording and refreshing only ever append. A cursor
+    (cursor.json) marks the first post still inside the engagement window:
+    older posts are never read again when picking what to refresh, and
+    their fetch records are compacted away.
+    """
+
+    def __init__(self, directory=ENGAGEMENT_DIR, window=ENGAGEMENT_WINDOW,
+                 refresh_interval=ENGAGEMENT_REFRESH_INTERVAL):
+        self.directory = directory
+        self.window = window
+        self.refresh_interval = refresh_interval
+        os.makedirs(directory, exist_ok=True)
+        self.posts_path = os.path.join(directory, "posts.bin")
+        self.metrics_path = os.path.join(directory, "metrics.bin")
+        self.labels_path = os.path.join(directory, "labels.jsonl")
+        self.fetches_path = os.path.join(directory, "fetches.bin")
+        self.cursor_path = os.path.join(directory, "cursor.json")
+        self._lock = threading.Lock()
+        self._labels = self._read_labels()
+        self._label_index = {kind: {label: i for i, label in enumerate(labels)}
+                             for kind, labels in self._labels.items()}
+        # offset: index of the first post inside the window
+        self._cursor = self._read_json(self.cursor_path, {"offset": 0})
+        # tweet ID -> last fetch, for posts inside the window
+        self._fetched = {}
+        fetches = self._read_records(self.fetches_path, FETCH_FORMAT)
+        for tweet_id, fetched_at in fetches:
+            self._fetched[tweet_id] = max(fetched_at, self._fetched.get(tweet_id, 0))
+        self._fetch_records = len(fetches)
+
+    def _read_json(self, path, default):
+        if not os.path.exists(path):
+            return default
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable {path}: {str(e)}")
+            return default
+
+    def _write_json(self, path, data):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def _read_labels(self):
+        labels = {"account": [], "source": [], "topic": []}
+        if not os.path.exists(self.labels_path):
+            return labels
+        with open(self.labels_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    kind, label = json.loads(line)
+                except ValueError:
+                    # A line cut short by a crash; its label was never used by a record
+                    break
+                labels[kind].append(label)
+        return labels
+
+    def _label(self, kind, label):
+        label = label or ""
+        index = self._label_index[kind].get(label)
+        if index is None:
+            index = self._label_index[kind][label] = len(self._labels[kind])
+            self._labels[kind].append(label)
+            with open(self.labels_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps([kind, label], ensure_ascii=False) + "\n")
+        return index
+
+    def _append(self, path, record_format, rows):
+        data = b"".join(record_format.pack(*row) for row in rows)
+        with open(path, "ab") as f:
+            # A record cut short by a crash would shift every later one; drop it
+            f.truncate(f.tell() - f.tell() % record_format.size)
+            f.write(data)
+
+    def record_post(self, tweet_id, account=None, source=None, topic=None, posted_at=None):
+        """Register a posted tweet, so its metrics get fetched."""
+        with self._lock:
+            row = (int(tweet_id), posted_at or time.time(), self._label("account", account),
+                   self._label("source", source), self._label("topic", topic))
+            self._append(self.posts_path, POST_FORMAT, [row])
+
+    def append_metrics(self, snapshots):
+        """
+        Append metrics snapshots.
+
+        Args:
+            snapshots: (tweet_id, fetched_at, public_metrics dict) tuples, as
+                returned by a tweets lookup with tweet_fields=public_metrics
+        """
+        rows = [(int(tweet_id), fetched_at) + tuple(int(metrics.get(key) or 0) for key in PUBLIC_METRICS)
+                for tweet_id, fetched_at, metrics in snapshots]
+        with self._lock:
+            self._append(self.metrics_path, METRIC_FORMAT, rows)
+        return len(rows)
+
+    def _read_records(self, path, record_format, start=0):
+        if not os.path.exists(path):
+            return []
+        with open(path, "rb") as f:
+            f.seek(start * record_format.size)
+            data = f.read()
+        data = data[:len(data) - len(data) % record_format.size]
+        return list(record_format.iter_unpack(data))
+
+    def due_ids(self, account=None, now=None, limit=None):
+        """
+        Tweet IDs of `account` still inside the engagement window and not
+        fetched for `refresh_interval` seconds, least recently fetched first.
+        Advances the cursor past posts that have left the window.
+        """
+        now = now or time.time()
+        with self._lock:
+            offset = self._cursor["offset"]
+            posts = self._read_records(self.posts_path, POST_FORMAT, offset)
+            expired = 0
+            for _, posted_at, _, _, _ in posts:
+                if now - posted_at <= self.window:
+                    break
+                expired += 1
+            fetched = self._fetched
+            if expired:
+                for tweet_id, *_ in posts[:expired]:
+                    fetched.pop(tweet_id, None)
+                self._cursor["offset"] = offset + expired
+                self._write_json(self.cursor_path, self._cursor)
+                if self._fetch_records > 2 * len(fetched) + LOOKUP_BATCH_SIZE:
+                    self._compact_fetches()
+            account_index = self._label_index["account"].get(account or "", -1) if account is not None else None
+            due = []
+            for tweet_id, _, account_id, _, _ in posts[expired:]:
+                last_fetched = fetched.get(tweet_id, 0)
+                if (account_index is None or account_id == account_index) \
+                        and now - last_fetched >= self.refresh_interval:
+                    due.append((last_fetched, tweet_id))
+        due.sort()
+        return [tweet_id for _, tweet_id in due[:limit]]
+
+    def mark_fetched(self, tweet_ids, fetched_at=None):
+        fetched_at = fetched_at or time.time()
+        rows = [(int(tweet_id), fetched_at) for tweet_id in tweet_ids]
+        with self._lock:
+            self._append(self.fetches_path, FETCH_FORMAT, rows)
+            self._fetch_records += len(rows)
+            for tweet_id, _ in rows:
+                self._fetched[tweet_id] = fetched_at
+
+    def _compact_fetches(self):
+        """Rewrite fetches.bin with only the latest fetch of posts still inside the window."""
+        tmp_path = f"{self.fetches_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(b"".join(FETCH_FORMAT.pack(*row) for row in self._fetched.items()))
+        os.replace(tmp_path, self.fetches_path)
+        self._fetch_records = len(self._fetched)
+
+    def load(self):
+        """
+        Return (posts, metrics) as NumPy structured arrays (POST_DTYPE,
+        METRIC_DTYPE) if NumPy is installed, else as lists of dicts.
+        """
+        try:
+            import numpy as np
+        except ImportError:
+            posts = [dict(zip(POST_FIELDS, row)) for row in self._read_records(self.posts_path, POST_FORMAT)]
+            metrics = [dict(zip(METRIC_FIELDS, row)) for row in self._read_records(self.metrics_path, METRIC_FORMAT)]
+            return posts, metrics
+        arrays = []
+        for path, dtype in ((self.posts_path, POST_DTYPE), (self.metrics_path, METRIC_DTYPE)):
+            dtype = np.dtype(dtype)
+            count = os.path.getsize(path) // dtype.itemsize if os.path.exists(path) else 0
+            arrays.append(np.fromfile(path, dtype=dtype, count=count) if count else np.zeros(0, dtype=dtype))
+        return tuple(arrays)
+
+    def summary(self, by=HOUR_OF_WEEK, account=None):
+        """
+        Engagement of posted tweets grouped by hour of the week (UTC), source
+        or topic, from each tweet's latest metrics snapshot. Vectorised with
+        NumPy when it is installed; it is optional and not in the Lambda
+        layer, where the same totals are computed in plain Python.
+
+        Args:
+            by: "hour_of_week" (0 = Monday 00:00 UTC), "source" or "topic"
+            account: Only include tweets of this account
+
+        Returns:
+            dict: group -> {tweets, engagement (mean interactions per tweet),
+            impressions (mean), engagement_rate (interactions / impressions)}
+        """
+        if by not in GROUPINGS:
+            raise ValueError(f"Unknown grouping: {by}")
+        account_index = self._label_index["account"].get(account or "", -1) if account is not None else None
+        posts, metrics = self.load()
+        if isinstance(posts, list):
+            totals = self._python_totals(posts, metrics, by, account_index)
+        else:
+            totals = self._numpy_totals(posts, metrics, by, account_index)
+
+        result = {}
+        for key, (tweets, interactions, impressions) in totals.items():
+            label = key if by == HOUR_OF_WEEK else self._labels[by][key]
+            result[label] = {
+                "tweets": tweets,
+                "engagement": round(interactions / tweets, 3),
+                "impressions": round(impressions / tweets, 1),
+                "engagement_rate": round(interactions / impressions, 5) if impressions else None,
+            }
+        return result
+
+    def _python_totals(self, posts, metrics, by, account_index):
+        latest = {}
+        for row in metrics:
+            if row["fetched_at"] >= latest.get(row["tweet_id"], {"fetched_at": -1})["fetched_at"]:
+                latest[row["tweet_id"]] = row
+        totals = {}
+        for post in posts:
+            row = latest.get(post["tweet_id"])
+            if row is None or (account_index is not None and post["account"] != account_index):
+                continue
+            key = hour_of_week(post["posted_at"]) if by == HOUR_OF_WEEK else post[by]
+            tweets, interactions, impressions = totals.get(key, (0, 0, 0))
+            totals[key] = (tweets + 1, interactions + sum(row[name] for name in INTERACTIONS),
+                           impressions + row["impressions"])
+        return totals
+
+    def _numpy_totals(self, posts, metrics, by, account_index):
+        import numpy as np
+        if account_index is not None:
+            posts = posts[posts["account"] == account_index]
+        if not len(posts) or not len(metrics):
+            return {}
+        # Latest snapshot per tweet: sort by (tweet_id, fetched_at), keep the last of each run
+        metrics = metrics[np.lexsort((metrics["fetched_at"], metrics["tweet_id"]))]
+        last = np.append(metrics["tweet_id"][1:] != metrics["tweet_id"][:-1], True)
+        metrics = metrics[last]
+        # Join posts to their snapshot
+        index = np.searchsorted(metrics["tweet_id"], posts["tweet_id"])
+        index[index == len(metrics)] = 0
+        found = metrics["tweet_id"][index] == posts["tweet_id"]
+        posts, metrics = posts[found], metrics[index[found]]
+
+        if by == HOUR_OF_WEEK:
+            keys = ((posts["posted_at"] // 3600).astype(np.int64) + 72) % 168
+        else:
+            keys = posts[by].astype(np.int64)
+        interactions = sum(metrics[name].astype(np.float64) for name in INTERACTIONS)
+        tweets = np.bincount(keys)
+        interaction_totals = np.bincount(keys, weights=interactions)
+        impression_totals = np.bincount(keys, weights=metrics["impressions"].astype(np.float64))
+        return {int(key): (int(tweets[key]), float(interaction_totals[key]), float(impression_totals[key]))
+                for key in np.flatnonzero(tweets)}
+
+
+_shared_store = None
+_shared_lock = threading.Lock()
+
+
+def get_engagement_store():
+    """Return the process-wide engagement store, opening it on first use."""
+    global _shared_store
+    with _shared_lock:
+        if _shared_store is None:
+            _shared_store = EngagementStore()
+        return _shared_store
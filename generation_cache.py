@@ -0,0 +1,138 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger("TwitterAgent")
+
+GENERATION_CACHE_DIR = os.getenv("GENERATION_CACHE_DIR", "/tmp/twitter_agent_generations")
+GENERATION_CACHE_TTL = float(os.getenv("GENERATION_CACHE_TTL", str(7 * 86400)))
+GENERATION_CACHE_MEMORY_ENTRIES = int(os.getenv("GENERATION_CACHE_MEMORY_ENTRIES", "128"))
+GENERATION_CACHE_DISK_ENTRIES = int(os.getenv("GENERATION_CACHE_DISK_ENTRIES", "2000"))
+
+
+def make_generation_key(topic, prompt, model, temperature, num_comments):
+    """Content address for a generation: sha256 over everything that shapes the completion."""
+    payload = json.dumps([topic, prompt, model, temperature, num_comments], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class GenerationCache:
+    """
+    Two-tier cache of raw LLM completions keyed by make_generation_key().
+
+    The memory tier is a small LRU; the disk tier is one JSON file per key
+    under `directory`, so warm containers and local reruns share results.
+    Entries older than `ttl` are ignored and removed on read.
+    """
+
+    def __init__(self, directory=GENERATION_CACHE_DIR, ttl=GENERATION_CACHE_TTL,
+                 memory_entries=GENERATION_CACHE_MEMORY_ENTRIES, disk_entries=GENERATION_CACHE_DISK_ENTRIES):
+        self.directory = directory
+        self.ttl = ttl
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "bypassed": 0}
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _remember(self, key, created_at, value):
+        self._memory[key] = (created_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _read_disk(self, key):
+        if not self.directory:
+            return None
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable generation cache entry {path}: {str(e)}")
+            return None
+        if time.time() - entry["created_at"] > self.ttl:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return entry["created_at"], entry["value"]
+
+    def get(self, key):
+        """Return the cached completion for `key`, or None."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and time.time() - entry[0] <= self.ttl:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return entry[1]
+            self._memory.pop(key, None)
+
+        entry = self._read_disk(key)
+        with self._lock:
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self._remember(key, *entry)
+            self.stats["disk_hits"] += 1
+            return entry[1]
+
+    def set(self, key, value):
+        created_at = time.time()
+        with self._lock:
+            self._remember(key, created_at, value)
+        if not self.directory:
+            return
+        tmp_path = f"{self._path(key)}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump({"created_at": created_at, "value": value}, f)
+            os.replace(tmp_path, self._path(key))
+            self._prune_disk()
+        except OSError as e:
+            logger.warning(f"Could not persist generation cache entry: {str(e)}")
+
+    def _prune_disk(self):
+        """Drop the oldest files once the disk tier exceeds `disk_entries`."""
+        names = [name for name in os.listdir(self.directory) if name.endswith(".json")]
+        if len(names) <= self.disk_entries:
+            return
+        paths = sorted((os.path.join(self.directory, name) for name in names), key=os.path.getmtime)
+        for path in paths[:len(paths) - self.disk_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def record_bypass(self):
+        with self._lock:
+            self.stats["bypassed"] += 1
+
+    def hit_rate(self):
+        """Fraction of lookups (bypasses excluded) answered from either tier."""
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        lookups = hits + self.stats["misses"]
+        return hits / lookups if lookups else 0.0
+
+
+_shared_cache = None
+
+
+def get_generation_cache():
+    """Return the process-wide generation cache, creating it on first use."""
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = GenerationCache()
+    return _shared_cache
@@ -1,6 +1,54 @@
 import os
 import json
-from agent import TwitterAgent
+from agent import BATCH_MAX_WORKERS, BATCH_POST_INTERVAL, TwitterAgent
+from logging_setup import configure_logging, flush_logs
+from metrics import get_metrics
+
+# Agent reused across warm invocations of the same container, so clients,
+# HTTP sessions and the credential check are not rebuilt on every call
+_agent = None
+_agent_credentials = None
+
+def get_agent(api_key, api_secret, access_token, access_token_secret, bearer_token):
+    """Return the cached TwitterAgent, creating it on first use or when credentials change."""
+    global _agent, _agent_credentials
+    credentials = (api_key, api_secret, access_token, access_token_secret, bearer_token)
+    if _agent is None or _agent_credentials != credentials:
+        _agent = TwitterAgent(*credentials)
+        _agent_credentials = credentials
+    else:
+        _agent.ensure_authenticated()
+    return _agent
+
+_account_pool = None
+_account_pool_key = None
+
+def post_all_accounts(event):
+    """Post for every account in the ACCOUNTS_CONFIG file (or event "config") from this one invocation."""
+    global _account_pool, _account_pool_key
+    from multi_account import ACCOUNTS_CONFIG_PATH, AccountPool
+    config = event.get('config', ACCOUNTS_CONFIG_PATH)
+    max_workers = event.get('max_workers', BATCH_MAX_WORKERS)
+    # Rebuild the pool when the event names another config, the file is
+    # edited or the worker count changes, instead of reusing the first one
+    pool_key = (config, os.path.getmtime(config), max_workers)
+    if _account_pool is None or _account_pool_key != pool_key:
+        if _account_pool is not None:
+            _account_pool.shutdown()
+        _account_pool = AccountPool.from_config(config, max_workers=max_workers)
+        _account_pool_key = pool_key
+    results = _account_pool.post_all(
+        names=event.get('accounts'),
+        post_interval=event.get('post_interval', BATCH_POST_INTERVAL),
+        defer_replies=event.get('defer_replies', True)
+    )
+    return {
+        'statusCode': 200,
+        'body': json.dumps({
+            'message': f"Posted for {len(results)} accounts",
+            'results': results
+        })
+    }
 
 def lambda_handler(event, context):
     """
@@ -13,9 +61,56 @@ def lambda_handler(event, context):
     Expected event format:
     {
         "task": "post_tweet_with_comments",
-        "custom_topic": "Optional custom topic for the tweet"
+        "custom_topic": "Optional custom topic for the tweet",
+        "defer_replies": true
     }
+    
+    Batch event format, to fill a posting window in one invocation:
+    {
+        "task": "post_batch",
+        "topics": ["Topic one", "Topic two"],   # or "count": 5 trending topics
+        "max_workers": 4,
+        "post_interval": 5
+    }
+    
+    With "defer_replies" (or DEFER_REPLIES set) the handler returns as soon as
+    the root tweet is posted and the follow-up comments are queued. Every
+    invocation first posts any queued replies that are due; the
+    "drain_replies" task does only that, for a frequent EventBridge schedule.
+    
+    Without a custom_topic, post_tweet_with_comments posts a bundle from the
+    pre-generated buffer when one is ready; the "refill_buffer" task tops
+    the buffer up and is meant for off-peak schedules.
+    
+    Bundles whose posting failed partway stay in the outbox: the next
+    post_tweet_with_comments posts a pending one instead of generating, and
+    the "resume_outbox" task retries every bundle that is due.
+    
+    Successful responses include a "timings" breakdown: total milliseconds
+    spent in each stage (source_fetch, html_parse, prompt_build, llm_call,
+    response_parse, create_tweet, ...) during this invocation.
     """
+    configure_logging()
+    metrics = get_metrics()
+    with metrics.collect() as timings:
+        with metrics.span('invocation', task=event.get('task', 'post_tweet_with_comments')):
+            response = run_task(event)
+    metrics.flush()
+    flush_logs()
+    
+    body = json.loads(response['body'])
+    if isinstance(body, dict):
+        body['timings'] = timings
+        response['body'] = json.dumps(body)
+    return response
+
+def run_task(event):
+    """Run the task named in a lambda_handler event and return the handler response."""
+    # Multi-account mode serves every account in the config file and doesn't
+    # need the single-account credentials below
+    if event.get('task') == 'post_all_accounts':
+        return post_all_accounts(event)
+    
     # Load credentials from environment variables
     api_key = os.environ.get("TWITTER_API_KEY")
     api_secret = os.environ.get("TWITTER_API_SECRET")
@@ -30,8 +125,13 @@ def lambda_handler(event, context):
             'body': json.dumps('Twitter API credentials not found in environment variables')
         }
     
-    # Create the Twitter agent
-    agent = TwitterAgent(api_key, api_secret, access_token, access_token_secret, bearer_token)
+    # Create the Twitter agent, or reuse the one from a previous warm invocation
+    agent = get_agent(api_key, api_secret, access_token, access_token_secret, bearer_token)
+    
+    # Post replies deferred by earlier invocations that have come due, and
+    # finish threads whose tweet went out but whose replies did not
+    drained_ids = agent.drain_replies()
+    agent.resume_outbox(root_posted=True)
     
     # Get the task from the event
     task = event.get('task', 'post_tweet_with_comments')
@@ -39,10 +139,11 @@ def lambda_handler(event, context):
     # Execute the requested task
     if task == 'post_tweet_with_comments':
         custom_topic = event.get('custom_topic')
+        defer_replies = event.get('defer_replies')
         if custom_topic:
-            tweet_response, comment_responses = agent.generate_and_post_custom_tweet(custom_topic)
+            tweet_response, comment_responses = agent.generate_and_post_custom_tweet(custom_topic, defer_replies=defer_replies)
         else:
-            tweet_response, comment_responses = agent.post_tweet_with_comments()
+            tweet_response, comment_responses = agent.post_tweet_with_comments(defer_replies=defer_replies)
         
         # Return the response
         return {
@@ -50,7 +151,84 @@ def lambda_handler(event, context):
             'body': json.dumps({
                 'message': 'Tweet and comments posted successfully',
                 'tweet_id': tweet_response.data['id'] if tweet_response else None,
-                'comment_ids': [resp.data['id'] for resp in comment_responses] if comment_responses else []
+                'comment_ids': [resp.data['id'] for resp in comment_responses] if comment_responses else [],
+                'drained_reply_ids': drained_ids
+            })
+        }
+    elif task == 'post_batch':
+        results = agent.post_batch(
+            topics=event.get('topics'),
+            count=event.get('count'),
+            max_workers=event.get('max_workers', BATCH_MAX_WORKERS),
+            post_interval=event.get('post_interval', BATCH_POST_INTERVAL),
+            defer_replies=event.get('defer_replies', True)
+        )
+        return {
+            'statusCode': 200,
+            'body': json.dumps({
+                'message': f"{sum(1 for r in results if r['tweet_id'])} of {len(results)} tweets posted",
+                'results': results,
+                'drained_reply_ids': drained_ids
+            })
+        }
+    elif task == 'run_scheduled':
+        ran = agent.run_due_jobs(event.get('jobs'))
+        return {
+            'statusCode': 200,
+            'body': json.dumps({
+                'message': f"Ran {len(ran)} scheduled jobs",
+                'jobs_run': ran,
+                'drained_reply_ids': drained_ids
+            })
+        }
+    elif task == 'fetch_engagement':
+        stored = agent.fetch_engagement(event.get('limit'))
+        return {
+            'statusCode': 200,
+            'body': json.dumps({
+                'message': f"Stored metrics for {stored} tweets",
+                'drained_reply_ids': drained_ids
+            })
+        }
+    elif task == 'engagement_summary':
+        from engagement import get_engagement_store
+        summary = get_engagement_store().summary(event.get('by', 'hour_of_week'), account=agent.account_name)
+        return {
+            'statusCode': 200,
+            'body': json.dumps({
+                'message': f"Engagement by {event.get('by', 'hour_of_week')}",
+                'summary': summary,
+                'drained_reply_ids': drained_ids
+            })
+        }
+    elif task == 'refill_buffer':
+        added = agent.refill_buffer(event.get('count'))
+        return {
+            'statusCode': 200,
+            'body': json.dumps({
+                'message': f"Buffered {added} bundles",
+                'ready_bundles': agent.bundle_buffer.size(agent.account_name),
+                'drained_reply_ids': drained_ids
+            })
+        }
+    elif task == 'resume_outbox':
+        resumed_ids = agent.resume_outbox(limit=event.get('limit', 10), defer_replies=event.get('defer_replies'))
+        return {
+            'statusCode': 200,
+            'body': json.dumps({
+                'message': f"Resumed {len(resumed_ids)} bundles from the outbox",
+                'tweet_ids': resumed_ids,
+                'pending_bundles': agent.outbox.pending_count(agent.account_name),
+                'drained_reply_ids': drained_ids
+            })
+        }
+    elif task == 'drain_replies':
+        return {
+            'statusCode': 200,
+            'body': json.dumps({
+                'message': 'Due replies posted',
+                'drained_reply_ids': drained_ids,
+                'pending_replies': agent.reply_queue.pending_count()
             })
         }
     else:
@@ -0,0 +1,156 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urlparse
+
+from metrics import get_metrics
+
+logger = logging.getLogger("TwitterAgent")
+
+LINK_CHECK_ENABLED = os.getenv("LINK_CHECK", "1").lower() not in ("0", "false", "no")
+# Per-request (connect, read) timeout and the overall wait for a round of checks, in seconds
+LINK_CHECK_TIMEOUT = (
+    float(os.getenv("LINK_CHECK_CONNECT_TIMEOUT", "1")),
+    float(os.getenv("LINK_CHECK_READ_TIMEOUT", "2")),
+)
+LINK_CHECK_DEADLINE = float(os.getenv("LINK_CHECK_DEADLINE", "3"))
+# How long a verdict is trusted: good links for a day, bad ones for an hour
+LINK_CHECK_TTL = float(os.getenv("LINK_CHECK_TTL", "86400"))
+LINK_CHECK_BAD_TTL = float(os.getenv("LINK_CHECK_BAD_TTL", "3600"))
+LINK_CHECK_MAX_ENTRIES = 2000
+LINK_CHECK_WORKERS = 8
+
+# Servers that refuse HEAD answer with one of these; retry with a one-byte GET
+HEAD_UNSUPPORTED = {403, 405, 501}
+
+# ok: the link resolves; status: final HTTP status (None if no response);
+# url: where it ends up after redirects
+LinkResult = namedtuple("LinkResult", "ok status url")
+
+
+def is_http_url(url):
+    parsed = urlparse(url or "")
+    return parsed.scheme in ("http", "https") and bool(parsed.netloc)
+
+
+class LinkChecker:
+    """
+    Checks that URLs resolve with HEAD (or a ranged GET) requests.
+
+    Checks run concurrently on a small thread pool over the shared keep-alive
+    session. Results are cached per URL, good and bad with separate TTLs, and
+    a URL already being checked is never requested twice: callers wait on the
+    same in-flight check.
+    """
+
+    def __init__(self, session=None, timeout=LINK_CHECK_TIMEOUT, deadline=LINK_CHECK_DEADLINE,
+                 ttl=LINK_CHECK_TTL, bad_ttl=LINK_CHECK_BAD_TTL, max_entries=LINK_CHECK_MAX_ENTRIES,
+                 max_workers=LINK_CHECK_WORKERS):
+        self._session = session
+        self.timeout = timeout
+        self.deadline = deadline
+        self.ttl = ttl
+        self.bad_ttl = bad_ttl
+        self.max_entries = max_entries
+        self.max_workers = max_workers
+        self._cache = OrderedDict()  # url -> (expires_at, LinkResult)
+        self._inflight = {}
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        if self._session is None:
+            from topic_sources import get_session
+            self._session = get_session()
+        return self._session
+
+    def _probe(self, url):
+        try:
+            with get_metrics().span("link_check"):
+                response = self.session.head(url, allow_redirects=True, timeout=self.timeout)
+                response.close()
+                if response.status_code in HEAD_UNSUPPORTED:
+                    response = self.session.get(url, headers={"Range": "bytes=0-0"}, allow_redirects=True,
+                                                timeout=self.timeout, stream=True)
+                    response.close()
+            return LinkResult(response.status_code < 400, response.status_code, response.url)
+        except Exception as e:
+            logger.info(f"Link check failed for {url}: {type(e).__name__}")
+            return LinkResult(False, None, url)
+
+    def _check(self, url):
+        result = self._probe(url)
+        ttl = self.ttl if result.ok else self.bad_ttl
+        with self._lock:
+            self._cache[url] = (time.time() + ttl, result)
+            self._cache.move_to_end(url)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+            self._inflight.pop(url, None)
+        return result
+
+    def cached(self, url):
+        """Return the cached result for `url`, or None if there is no fresh one."""
+        with self._lock:
+            entry = self._cache.get(url)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                del self._cache[url]
+                return None
+            self._cache.move_to_end(url)
+            return entry[1]
+
+    def check_many(self, urls, deadline=None):
+        """
+        Check `urls` concurrently, waiting at most `deadline` seconds.
+
+        Returns:
+            dict: url -> LinkResult, or None for checks still running at the
+            deadline (they finish in the background and land in the cache)
+        """
+        deadline = self.deadline if deadline is None else deadline
+        results = {}
+        futures = {}
+        for url in dict.fromkeys(urls):
+            if not is_http_url(url):
+                results[url] = LinkResult(False, None, url)
+                continue
+            cached = self.cached(url)
+            if cached is not None:
+                results[url] = cached
+                continue
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                        thread_name_prefix="link-check")
+                future = self._inflight.get(url)
+                if future is None:
+                    future = self._inflight[url] = self._executor.submit(self._check, url)
+            futures[url] = future
+
+        if futures:
+            wait(futures.values(), timeout=deadline)
+        for url, future in futures.items():
+            results[url] = future.result() if future.done() else None
+        return results
+
+    def check(self, url, deadline=None):
+        return self.check_many([url], deadline)[url]
+
+
+_shared_checker = None
+_shared_lock = threading.Lock()
+
+
+def get_link_checker():
+    """Return the process-wide link checker and its result cache."""
+    global _shared_checker
+    with _shared_lock:
+        if _shared_checker is None:
+            _shared_checker = LinkChecker()
+        return _shared_checker
@@ -0,0 +1,180 @@
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+# Logging is configured by the entry points (lambda_handler, agent.py's
+# __main__) calling configure_logging(), never as a side effect of an import
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Rotating log file; empty disables it. Lambda only needs stdout.
+LOG_FILE = os.getenv("LOG_FILE", "" if os.getenv("AWS_LAMBDA_FUNCTION_NAME") else "/tmp/twitter_agent.log")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(5 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "3"))
+# "json" for one structured object per line, "text" for the classic format
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_MAX_FIELD_LENGTH = int(os.getenv("LOG_MAX_FIELD_LENGTH", "1000"))
+# Fraction of DEBUG records kept when LOG_LEVEL=DEBUG
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "1.0"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Chatty third-party loggers, kept at WARNING whatever LOG_LEVEL says
+QUIET_LOGGERS = ("httpx", "httpcore", "openai", "urllib3", "requests_oauthlib", "oauthlib")
+
+# Attributes every LogRecord has; anything else came in through `extra=`
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+def truncate(value, limit=LOG_MAX_FIELD_LENGTH):
+    value = value if isinstance(value, str) else str(value)
+    if len(value) <= limit:
+        return value
+    return f"{value[:limit]}...[{len(value) - limit} more chars]"
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with every field capped at `max_length` characters."""
+
+    def __init__(self, max_length=LOG_MAX_FIELD_LENGTH):
+        super().__init__()
+        self.max_length = max_length
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": truncate(record.getMessage(), self.max_length),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = truncate(record.exc_text, self.max_length)
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value if isinstance(value, (int, float, bool)) or value is None \
+                    else truncate(value, self.max_length)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class DebugSampler(logging.Filter):
+    """Keep only a `rate` fraction of DEBUG records; other levels always pass."""
+
+    def __init__(self, rate=LOG_DEBUG_SAMPLE_RATE):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno > logging.DEBUG or self.rate >= 1 or random.random() < self.rate
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """A QueueHandler that drops records instead of blocking when the queue is full."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # The stock prepare() folds the traceback into msg; keep it in
+        # exc_text instead, where formatters put it after the message (and the
+        # JSON one into its own, separately truncated "exc" field)
+        record = copy.copy(record)
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            # Tracebacks hold frames, which shouldn't cross to the writer thread
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener = None
+_lock = threading.Lock()
+
+
+def configure_logging(level=LOG_LEVEL, log_file=LOG_FILE, max_bytes=LOG_MAX_BYTES,
+                      backup_count=LOG_BACKUP_COUNT, fmt=LOG_FORMAT,
+                      max_field_length=LOG_MAX_FIELD_LENGTH, debug_sample_rate=LOG_DEBUG_SAMPLE_RATE,
+                      force=False, stream=None):
+    """
+    Route all logging through a queue to a background thread that writes to
+    `stream` (stdout by default) and, if `log_file` is set, a size-rotated file. Log calls on the
+    request path only enqueue the record. Safe to call more than once; later
+    calls are no-ops unless `force` is set.
+
+    Returns:
+        logging.handlers.QueueListener: The running listener
+    """
+    global _listener
+    with _lock:
+        if _listener is not None and not force:
+            return _listener
+        if _listener is not None:
+            _listener.stop()
+
+        formatter = JsonFormatter(max_field_length) if fmt == "json" else logging.Formatter(TEXT_FORMAT)
+        handlers = [logging.StreamHandler(stream or sys.stdout)]
+        if log_file:
+            handlers.append(logging.handlers.RotatingFileHandler(
+                log_file, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+            ))
+        for handler in handlers:
+            handler.setFormatter(formatter)
+
+        log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        queue_handler = DroppingQueueHandler(log_queue)
+        queue_handler.addFilter(DebugSampler(debug_sample_rate))
+        _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+
+        root = logging.getLogger()
+        # Replace whatever was there (e.g. the Lambda runtime's synchronous handler)
+        for existing in list(root.handlers):
+            root.removeHandler(existing)
+        root.addHandler(queue_handler)
+        root.setLevel(level)
+        for name in QUIET_LOGGERS:
+            logging.getLogger(name).setLevel(max(logging.WARNING, root.level))
+
+        _listener.start()
+        return _listener
+
+
+def flush_logs(timeout=1.0):
+    """
+    Wait up to `timeout` seconds for queued records to be written. Lambda
+    calls this before returning, since the container may be frozen straight
+    after and the writer thread with it.
+    """
+    if _listener is None:
+        return
+    deadline = time.monotonic() + timeout
+    while _listener.queue.unfinished_tasks and time.monotonic() < deadline:
+        time.sleep(0.005)
+
+
+def _shutdown():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(_shutdown)
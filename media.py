@@ -0,0 +1,357 @@
+import hashlib
+import io
+import json
+import logging
+import mmap
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlparse
+
+logger = logging.getLogger("TwitterAgent")
+
+MEDIA_CACHE_DIR = os.getenv("MEDIA_CACHE_DIR", "/tmp/twitter_agent_media")
+# Seconds a rendered or fetched image is reused for the same topic
+MEDIA_CACHE_TTL = float(os.getenv("MEDIA_CACHE_TTL", str(7 * 86400)))
+MEDIA_CACHE_MAX_FILES = int(os.getenv("MEDIA_CACHE_MAX_FILES", "200"))
+# Files larger than this are uploaded in INIT/APPEND/FINALIZE segments of this size (X allows up to 5 MB)
+MEDIA_CHUNK_SIZE = int(os.getenv("MEDIA_CHUNK_SIZE", str(1024 * 1024)))
+MEDIA_UPLOAD_WORKERS = int(os.getenv("MEDIA_UPLOAD_WORKERS", "4"))
+# Largest image X accepts for a tweet
+MEDIA_MAX_BYTES = 5 * 1024 * 1024
+# An uploaded media_id is reused until this many seconds before X expires it
+MEDIA_ID_MARGIN = 3600
+# Longest wait for X to finish processing an upload (GIFs and videos only)
+MEDIA_PROCESSING_TIMEOUT = 60
+
+# Bump when the title card layout changes, so cached renders are not reused
+CARD_VERSION = 1
+CARD_SIZE = (1200, 675)
+CARD_BACKGROUND = (17, 24, 39)
+CARD_FOREGROUND = (243, 244, 246)
+CARD_ACCENT = (96, 165, 250)
+CARD_MARGIN = 72
+
+# Preview images are looked for in the first bytes of a page, where <head> is
+PREVIEW_PAGE_BYTES = 256 * 1024
+PREVIEW_TIMEOUT = (1, 3)
+IMAGE_TYPES = {"image/png": ".png", "image/jpeg": ".jpg", "image/gif": ".gif", "image/webp": ".webp"}
+
+_META_TAG = re.compile(r"<meta\b[^>]*>", re.IGNORECASE)
+_PREVIEW_PROPERTY = re.compile(r"""(?:property|name)\s*=\s*["'](?:og:image|og:image:url|twitter:image)["']""",
+                               re.IGNORECASE)
+_CONTENT = re.compile(r"""content\s*=\s*["']([^"']+)["']""", re.IGNORECASE)
+
+
+_pillow_available = None
+
+
+def pillow_available():
+    """
+    Whether Pillow can be imported, so title cards can be rendered. It is
+    an optional extra (requirements-media.txt); without it the source
+    page's preview image is used. Logs a warning the first time it is missing.
+    """
+    global _pillow_available
+    if _pillow_available is None:
+        import importlib.util
+        _pillow_available = importlib.util.find_spec("PIL") is not None
+        if not _pillow_available:
+            logger.warning("Pillow is not installed, so no title cards will be rendered; tweets get the "
+                           "source page's preview image instead (pip install -r requirements-media.txt)")
+    return _pillow_available
+
+
+def _font(image_font, size):
+    for name in ("DejaVuSans-Bold.ttf", "Arial Bold.ttf", "LiberationSans-Bold.ttf"):
+        try:
+            return image_font.truetype(name, size)
+        except OSError:
+            pass
+    try:
+        return image_font.load_default(size=size)
+    except TypeError:
+        # Pillow < 10.1 has a single bitmap size
+        return image_font.load_default()
+
+
+def _wrap(draw, text, font, width):
+    lines = []
+    for word in text.split():
+        if lines and draw.textlength(f"{lines[-1]} {word}", font=font) <= width:
+            lines[-1] = f"{lines[-1]} {word}"
+        else:
+            lines.append(word)
+    return lines
+
+
+def render_title_card(title, source=None, size=CARD_SIZE):
+    """
+    Render a title card (the topic in large type over the source name) as PNG.
+
+    Args:
+        title: Headline to draw, e.g. a paper title
+        source: Smaller caption under it, e.g. "arxiv.org"
+        size: (width, height) in pixels; the default is X's 16:9 preview shape
+
+    Returns:
+        bytes: The PNG, or None if Pillow is not installed
+    """
+    if not pillow_available():
+        return None
+    from PIL import Image, ImageDraw, ImageFont
+    width, height = size
+    image = Image.new("RGB", size, CARD_BACKGROUND)
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((0, 0, 12, height), fill=CARD_ACCENT)
+
+    # Largest type at which the title fits in five lines
+    for font_size in (64, 56, 48, 40, 34):
+        font = _font(ImageFont, font_size)
+        lines = _wrap(draw, title, font, width - 2 * CARD_MARGIN)
+        if len(lines) <= 5:
+            break
+    else:
+        lines = lines[:4] + [lines[4] + " …"]
+    line_height = int(font_size * 1.25)
+    y = (height - line_height * len(lines)) // 2 - font_size // 2
+    for line in lines:
+        draw.text((CARD_MARGIN, y), line, font=font, fill=CARD_FOREGROUND)
+        y += line_height
+    if source:
+        draw.text((CARD_MARGIN, height - CARD_MARGIN - 32), source, font=_font(ImageFont, 32), fill=CARD_ACCENT)
+
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def fetch_preview_image(page_url, session=None):
+    """
+    Download the preview image (og:image or twitter:image) a page declares.
+
+    Returns:
+        tuple: (bytes, media type), or None if the page has no usable image
+    """
+    if session is None:
+        from topic_sources import get_session
+        session = get_session()
+    with session.get(page_url, timeout=PREVIEW_TIMEOUT, stream=True) as response:
+        if response.status_code >= 400:
+            return None
+        head = next(response.iter_content(PREVIEW_PAGE_BYTES), b"").decode("utf-8", "replace")
+    image_url = None
+    for tag in _META_TAG.findall(head):
+        content = _CONTENT.search(tag)
+        if content and _PREVIEW_PROPERTY.search(tag):
+            image_url = urljoin(page_url, content.group(1).strip())
+            break
+    if image_url is None:
+        return None
+
+    with session.get(image_url, timeout=PREVIEW_TIMEOUT, stream=True) as response:
+        media_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+        if response.status_code >= 400 or media_type not in IMAGE_TYPES:
+            logger.info(f"No usable preview image at {image_url} ({response.status_code} {media_type})")
+            return None
+        data = bytearray()
+        for chunk in response.iter_content(64 * 1024):
+            data += chunk
+            if len(data) > MEDIA_MAX_BYTES:
+                logger.info(f"Preview image {image_url} is over {MEDIA_MAX_BYTES} bytes, skipping it")
+                return None
+    return bytes(data), media_type
+
+
+class MediaCache:
+    """
+    On-disk cache of tweet images and their uploads.
+
+    Encoded images are stored once under their sha256 (`<hash><ext>`), so a
+    topic rendered again, or two topics sharing a preview image, cost one
+    file. index.json maps each topic to its image and each (account, image)
+    to the media_id it was uploaded as, which is reused until shortly
+    before X expires it.
+    """
+
+    def __init__(self, directory=MEDIA_CACHE_DIR, ttl=MEDIA_CACHE_TTL, max_files=MEDIA_CACHE_MAX_FILES):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_files = max_files
+        os.makedirs(directory, exist_ok=True)
+        self.index_path = os.path.join(directory, "index.json")
+        self._lock = threading.Lock()
+        self._index = {"images": {}, "uploads": {}}
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path) as f:
+                    self._index.update(json.load(f))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable media index {self.index_path}: {str(e)}")
+
+    def _write_index(self):
+        now = time.time()
+        self._index["images"] = {key: entry for key, entry in self._index["images"].items()
+                                 if now - entry["created_at"] <= self.ttl}
+        for uploads in self._index["uploads"].values():
+            for content_hash in [h for h, entry in uploads.items() if entry["expires_at"] <= now]:
+                del uploads[content_hash]
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, self.index_path)
+
+    def path(self, content_hash, media_type):
+        return os.path.join(self.directory, content_hash + IMAGE_TYPES.get(media_type, ".bin"))
+
+    def put(self, data, media_type):
+        """Store encoded image bytes. Returns their content hash."""
+        content_hash = hashlib.sha256(data).hexdigest()
+        path = self.path(content_hash, media_type)
+        if not os.path.exists(path):
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self._prune()
+        return content_hash
+
+    def _prune(self):
+        """Drop the oldest images once there are more than `max_files`."""
+        paths = [os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                 if os.path.splitext(name)[1] in IMAGE_TYPES.values()]
+        if len(paths) <= self.max_files:
+            return
+        for path in sorted(paths, key=os.path.getmtime)[:len(paths) - self.max_files]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def image_for(self, topic, link=None, session=None):
+        """
+        The image for a tweet about `topic`: a rendered title card, or the
+        preview image of `link` (its source page) when Pillow is missing.
+        Made once per topic and served from disk after that.
+
+        Returns:
+            tuple: (content hash, media type, path), or None if there is no image
+        """
+        key = hashlib.sha256(json.dumps([CARD_VERSION, topic, link]).encode("utf-8")).hexdigest()
+        with self._lock:
+            entry = self._index["images"].get(key)
+        if entry and time.time() - entry["created_at"] <= self.ttl:
+            path = self.path(entry["hash"], entry["type"])
+            if os.path.exists(path):
+                return entry["hash"], entry["type"], path
+
+        from metrics import get_metrics
+        with get_metrics().span("media_render"):
+            image = None
+            data = render_title_card(topic, urlparse(link).netloc if link else None)
+            if data is not None:
+                image = data, "image/png"
+            elif link:
+                image = fetch_preview_image(link, session)
+        if image is None:
+            return None
+        data, media_type = image
+        content_hash = self.put(data, media_type)
+        with self._lock:
+            self._index["images"][key] = {"hash": content_hash, "type": media_type, "created_at": time.time()}
+            self._write_index()
+        return content_hash, media_type, self.path(content_hash, media_type)
+
+    def media_id(self, account, content_hash, now=None):
+        """A media_id `account` uploaded this image as, if it is still valid for a while."""
+        with self._lock:
+            entry = self._index["uploads"].get(account or "", {}).get(content_hash)
+        if entry and entry["expires_at"] - MEDIA_ID_MARGIN > (now or time.time()):
+            return entry["media_id"]
+        return None
+
+    def set_media_id(self, account, content_hash, media_id, expires_at):
+        with self._lock:
+            uploads = self._index["uploads"].setdefault(account or "", {})
+            uploads[content_hash] = {"media_id": str(media_id), "expires_at": expires_at}
+            self._write_index()
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MEDIA_UPLOAD_WORKERS, thread_name_prefix="media-upload")
+        return _executor
+
+
+def upload_media(api, path, media_type, call=None, chunk_size=MEDIA_CHUNK_SIZE):
+    """
+    Upload an image file with the v1.1 media endpoint.
+
+    Files up to `chunk_size` go up in one request. Larger ones use the
+    chunked INIT/APPEND/FINALIZE flow: segments are sliced from a memory
+    map of the file, so only the ones in flight are in memory, and
+    APPENDed concurrently.
+
+    Args:
+        api: An authenticated tweepy.API
+        path: The file to upload
+        media_type: Its MIME type
+        call: Wraps each request, e.g. to run it through the rate limiter
+
+    Returns:
+        tuple: (media_id string, expiry timestamp)
+    """
+    call = call or (lambda func: func())
+    size = os.path.getsize(path)
+    category = "tweet_gif" if media_type == "image/gif" else "tweet_image"
+    if size <= chunk_size:
+        with open(path, "rb") as f:
+            data = f.read()
+        media = call(lambda: api.simple_upload(os.path.basename(path), file=io.BytesIO(data),
+                                               media_category=category))
+        return media.media_id_string, time.time() + (getattr(media, "expires_after_secs", None) or 86400)
+
+    media_id = call(lambda: api.chunked_upload_init(size, media_type, media_category=category)).media_id_string
+    segments = range((size + chunk_size - 1) // chunk_size)
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+
+        def append(index):
+            segment = mapped[index * chunk_size:(index + 1) * chunk_size]
+            call(lambda: api.chunked_upload_append(media_id, segment, index))
+
+        # Consume the results so a failed segment raises here
+        list(_get_executor().map(append, segments))
+
+    media = call(lambda: api.chunked_upload_finalize(media_id))
+    deadline = time.time() + MEDIA_PROCESSING_TIMEOUT
+    processing = getattr(media, "processing_info", None)
+    while processing and processing.get("state") in ("pending", "in_progress"):
+        if time.time() >= deadline:
+            raise TimeoutError(f"Media {media_id} still processing after {MEDIA_PROCESSING_TIMEOUT}s")
+        time.sleep(processing.get("check_after_secs", 1))
+        media = call(lambda: api.get_media_upload_status(media_id))
+        processing = getattr(media, "processing_info", None)
+    if processing and processing.get("state") == "failed":
+        raise RuntimeError(f"X could not process media {media_id}: {processing.get('error')}")
+    return media_id, time.time() + (getattr(media, "expires_after_secs", None) or 86400)
+
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def get_media_cache():
+    """Return the process-wide media cache, creating it on first use."""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = MediaCache()
+        return _shared_cache
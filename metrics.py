@@ -0,0 +1,215 @@
+import atexit
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger("TwitterAgent")
+
+# Where metrics go: "memory", "jsonl", "emf" (CloudWatch Embedded Metric
+# Format on stdout) or "none". Lambda defaults to EMF, everything else to memory.
+METRICS_SINK = os.getenv("METRICS_SINK", "emf" if os.getenv("AWS_LAMBDA_FUNCTION_NAME") else "memory")
+METRICS_NAMESPACE = os.getenv("METRICS_NAMESPACE", "TweetSage")
+METRICS_PATH = os.getenv("METRICS_PATH", "/tmp/twitter_agent_metrics.jsonl")
+# Buffered records are handed to the sink once this many have accumulated
+METRICS_FLUSH_SIZE = int(os.getenv("METRICS_FLUSH_SIZE", "100"))
+
+MILLISECONDS = "Milliseconds"
+COUNT = "Count"
+
+
+class InMemorySink:
+    """Keeps the most recent records in memory, for tests, benchmarks and local runs."""
+
+    def __init__(self, max_records=10000):
+        self.records = deque(maxlen=max_records)
+        self._lock = threading.Lock()
+
+    def emit(self, records):
+        with self._lock:
+            self.records.extend(records)
+
+    def summary(self):
+        """Return {metric name: {count, total, mean, max}} over the retained records."""
+        with self._lock:
+            records = list(self.records)
+        summary = {}
+        for record in records:
+            entry = summary.setdefault(record["name"], {"unit": record["unit"], "count": 0, "total": 0.0, "max": 0.0})
+            entry["count"] += 1
+            entry["total"] += record["value"]
+            entry["max"] = max(entry["max"], record["value"])
+        for entry in summary.values():
+            entry["mean"] = entry["total"] / entry["count"]
+        return summary
+
+
+class JsonLinesSink:
+    """Appends one JSON object per record to `path`."""
+
+    def __init__(self, path=METRICS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def emit(self, records):
+        lines = "".join(json.dumps(record) + "\n" for record in records)
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(lines)
+
+
+class EmfSink:
+    """
+    Writes records to stdout in CloudWatch Embedded Metric Format, so Lambda
+    turns log lines into metrics without any PutMetricData calls. Records
+    sharing dimensions are grouped into one document per flush.
+    """
+
+    def __init__(self, namespace=METRICS_NAMESPACE, stream=None):
+        self.namespace = namespace
+        self.stream = stream
+
+    def emit(self, records):
+        groups = {}
+        for record in records:
+            dimensions = tuple(sorted(record["dimensions"].items()))
+            groups.setdefault(dimensions, []).append(record)
+        stream = self.stream or sys.stdout
+        for dimensions, group in groups.items():
+            document = dict(dimensions)
+            units = {}
+            for record in group:
+                document.setdefault(record["name"], []).append(record["value"])
+                units[record["name"]] = record["unit"]
+            document["_aws"] = {
+                "Timestamp": int(group[-1]["timestamp"] * 1000),
+                "CloudWatchMetrics": [{
+                    "Namespace": self.namespace,
+                    "Dimensions": [[name for name, _ in dimensions]],
+                    "Metrics": [{"Name": name, "Unit": unit} for name, unit in units.items()],
+                }],
+            }
+            stream.write(json.dumps(document) + "\n")
+        stream.flush()
+
+
+class NullSink:
+    def emit(self, records):
+        pass
+
+
+def make_sink(kind=METRICS_SINK):
+    if kind == "memory":
+        return InMemorySink()
+    if kind == "jsonl":
+        return JsonLinesSink()
+    if kind == "emf":
+        return EmfSink()
+    if kind == "none":
+        return NullSink()
+    raise ValueError(f"Unknown metrics sink: {kind}")
+
+
+class Metrics:
+    """
+    Records stage timings and counters and hands them to a sink in batches.
+
+    Use span() to time a block, record() for other values (token counts),
+    and collect() to also gather a {stage: total ms} breakdown of everything
+    timed while it is open, e.g. for one Lambda invocation.
+    """
+
+    def __init__(self, sink, flush_size=METRICS_FLUSH_SIZE):
+        self.sink = sink
+        self.flush_size = flush_size
+        self._pending = []
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def record(self, name, value, unit=COUNT, **dimensions):
+        record = {"name": name, "value": value, "unit": unit,
+                  "dimensions": {key: str(val) for key, val in dimensions.items()},
+                  "timestamp": time.time()}
+        with self._lock:
+            self._pending.append(record)
+            if unit == MILLISECONDS:
+                for collector, thread_id in self._collectors:
+                    if thread_id is None or thread_id == threading.get_ident():
+                        collector[name] = round(collector.get(name, 0.0) + value, 1)
+            flush = len(self._pending) >= self.flush_size
+        if flush:
+            self.flush()
+
+    @contextmanager
+    def span(self, name, **dimensions):
+        """Time the enclosed block as metric `name`, in milliseconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - start) * 1000, MILLISECONDS, **dimensions)
+
+    @contextmanager
+    def collect(self, this_thread=False):
+        """
+        Yield a dict that fills with {stage: total ms} for spans closed inside
+        the block: on any thread, or only the calling one if `this_thread`
+        (e.g. one item among several processed concurrently).
+        """
+        collector = {}
+        entry = (collector, threading.get_ident() if this_thread else None)
+        with self._lock:
+            self._collectors.append(entry)
+        try:
+            yield collector
+        finally:
+            with self._lock:
+                self._collectors.remove(entry)
+
+    def flush(self):
+        with self._lock:
+            records, self._pending = self._pending, []
+        if not records:
+            return
+        try:
+            self.sink.emit(records)
+        except Exception as e:
+            logger.warning(f"Could not write {len(records)} metrics: {str(e)}")
+
+
+def timed(name, **dimensions):
+    """Decorator form of Metrics.span() on the shared metrics instance."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with get_metrics().span(name, **dimensions):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+_shared_metrics = None
+_shared_lock = threading.Lock()
+
+
+def get_metrics():
+    """Return the process-wide metrics instance, using the METRICS_SINK sink."""
+    global _shared_metrics
+    with _shared_lock:
+        if _shared_metrics is None:
+            _shared_metrics = Metrics(make_sink())
+            atexit.register(_shared_metrics.flush)
+        return _shared_metrics
+
+
+def set_sink(sink):
+    """Swap the sink of the shared metrics instance, flushing what the old one had pending."""
+    metrics = get_metrics()
+    metrics.flush()
+    metrics.sink = sink
+    return metrics
@@ -0,0 +1,121 @@
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from agent import BATCH_MAX_WORKERS, BATCH_POST_INTERVAL, TwitterAgent
+
+logger = logging.getLogger("TwitterAgent")
+
+ACCOUNTS_CONFIG_PATH = os.getenv("ACCOUNTS_CONFIG", "accounts.json")
+
+CREDENTIAL_FIELDS = ("api_key", "api_secret", "access_token", "access_token_secret", "bearer_token")
+
+
+def _resolve(value):
+    """Config values written as "$NAME" are read from the environment, so secrets can stay out of the file."""
+    if isinstance(value, str) and value.startswith("$"):
+        return os.getenv(value[1:])
+    return value
+
+
+def load_accounts(path=ACCOUNTS_CONFIG_PATH):
+    """
+    Load account definitions from a JSON config file of the form:
+
+        {"accounts": [{"name": "brand-a", "api_key": "$BRAND_A_API_KEY", ...,
+                       "topics": ["Optional fixed topics"], "posts": 1}]}
+
+    Returns:
+        list: One dict per account with resolved credentials
+    """
+    with open(path) as f:
+        config = json.load(f)
+    accounts = []
+    for entry in config.get("accounts", []):
+        account = {key: _resolve(value) for key, value in entry.items()}
+        missing = [field for field in CREDENTIAL_FIELDS[:4] if not account.get(field)]
+        if not account.get("name") or missing:
+            raise ValueError(f"Account {account.get('name')!r} is missing {missing or ['name']}")
+        accounts.append(account)
+    return accounts
+
+
+class AccountPool:
+    """
+    Serve several X accounts from one process.
+
+    Each account gets its own TwitterAgent (and so its own tweepy client and
+    per-account rate-limit buckets), created once and kept in the pool. All
+    accounts share the process-wide topic cache, generation cache and rate
+    limiter, and generate content on one shared worker pool.
+    """
+
+    def __init__(self, accounts, max_workers=BATCH_MAX_WORKERS):
+        self.accounts = {account["name"]: account for account in accounts}
+        self._agents = {}
+        self._lock = threading.Lock()
+        self.generation_executor = ThreadPoolExecutor(max_workers=max(1, max_workers),
+                                                      thread_name_prefix="generation")
+        self.account_executor = ThreadPoolExecutor(max_workers=max(1, len(self.accounts)),
+                                                   thread_name_prefix="account")
+
+    @classmethod
+    def from_config(cls, path=ACCOUNTS_CONFIG_PATH, max_workers=BATCH_MAX_WORKERS):
+        return cls(load_accounts(path), max_workers=max_workers)
+
+    def agent(self, name):
+        """Return the pooled agent for `name`, authenticating it on first use."""
+        with self._lock:
+            agent = self._agents.get(name)
+        if agent is None:
+            account = self.accounts[name]
+            agent = TwitterAgent(*(account.get(field) for field in CREDENTIAL_FIELDS), account_name=name)
+            with self._lock:
+                agent = self._agents.setdefault(name, agent)
+        else:
+            agent.ensure_authenticated()
+        return agent
+
+    def _post_for_account(self, name, post_interval, defer_replies):
+        account = self.accounts[name]
+        agent = self.agent(name)
+        # As in single-account mode: post due deferred replies and retry
+        # bundles an earlier attempt left in the outbox before generating more
+        agent.drain_replies()
+        agent.resume_outbox(defer_replies=defer_replies)
+        return agent.post_batch(
+            topics=account.get("topics"),
+            count=account.get("posts", 1),
+            post_interval=post_interval,
+            defer_replies=defer_replies,
+            executor=self.generation_executor
+        )
+
+    def post_all(self, names=None, post_interval=BATCH_POST_INTERVAL, defer_replies=True):
+        """
+        Generate and post for every account (or just `names`) concurrently,
+        after draining each account's due replies and resuming its outbox.
+
+        Returns:
+            dict: account name -> post_batch results, or {"error": ...} if the
+            account could not be served at all
+        """
+        names = list(names or self.accounts)
+        futures = {
+            name: self.account_executor.submit(self._post_for_account, name, post_interval, defer_replies)
+            for name in names
+        }
+        results = {}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                logger.error(f"Failed to post for account {name}: {str(e)}")
+                results[name] = {"error": str(e)}
+        return results
+
+    def shutdown(self):
+        self.generation_executor.shutdown(wait=True)
+        self.account_executor.shutdown(wait=True)
@@ -0,0 +1,277 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger("TwitterAgent")
+
+OUTBOX_PATH = os.getenv("OUTBOX_PATH", "/tmp/twitter_agent_outbox.db")
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+# Posted and failed bundles are kept this long, so a re-added bundle is
+# still recognised as already posted
+OUTBOX_RETENTION = float(os.getenv("OUTBOX_RETENTION_DAYS", "7")) * 86400
+# A claimed bundle not finished or released within this many seconds (the
+# process died mid-post) is handed out again
+OUTBOX_CLAIM_TIMEOUT = 600
+
+# Bundle states
+PENDING = "pending"
+POSTING = "posting"
+POSTED = "posted"
+FAILED = "failed"
+
+# Part states; position 0 is the root tweet, 1..n the replies to it.
+# "sending" marks a part whose create_tweet call was started: if the process
+# dies before it is marked posted, the next attempt cannot tell whether X got it
+# without looking for it on the account's timeline.
+SENDING = "sending"
+QUEUED = "queued"  # handed to the reply queue, which posts it from there
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS bundles (
+    key TEXT PRIMARY KEY,
+    account TEXT,
+    topic TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    next_attempt_at REAL NOT NULL,
+    claimed_at REAL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS bundles_due ON bundles (status, next_attempt_at);
+CREATE TABLE IF NOT EXISTS parts (
+    bundle_key TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    tweet_id TEXT,
+    posted_at REAL,
+    PRIMARY KEY (bundle_key, position)
+);
+"""
+
+
+def idempotency_key(tweet, comments, account=None):
+    """Key identifying a bundle by its account and content."""
+    digest = hashlib.sha256()
+    for text in [account or "", tweet] + list(comments):
+        digest.update(text.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()[:32]
+
+
+class Outbox:
+    """
+    Durable SQLite outbox of generated tweet bundles.
+
+    A bundle (root tweet plus replies) is written here before anything is
+    posted, under an idempotency key derived from its content, and each part
+    is marked as it goes out. If posting stops partway, a retry picks the
+    bundle up from the first part not yet posted: no new completion is
+    requested and nothing already posted is sent again. Adding a bundle that
+    is already in the outbox returns the existing one.
+    """
+
+    def __init__(self, path=OUTBOX_PATH, max_attempts=OUTBOX_MAX_ATTEMPTS, retention=OUTBOX_RETENTION):
+        self.path = path
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._purge(time.time() - retention)
+
+    def _purge(self, before):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "DELETE FROM parts WHERE bundle_key IN "
+                    "(SELECT key FROM bundles WHERE status IN ('posted', 'failed') AND updated_at < ?)", (before,)
+                )
+                self._conn.execute(
+                    "DELETE FROM bundles WHERE status IN ('posted', 'failed') AND updated_at < ?", (before,)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def add(self, tweet, comments, topic=None, account=None, key=None):
+        """
+        Store a bundle before posting it.
+
+        Returns:
+            str: The bundle's idempotency key (`key`, or one derived from the content)
+        """
+        key = key or idempotency_key(tweet, comments, account)
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO bundles (key, account, topic, next_attempt_at, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)", (key, account, topic, now, now, now)
+                )
+                if cursor.rowcount:
+                    self._conn.executemany(
+                        "INSERT INTO parts (bundle_key, position, text) VALUES (?, ?, ?)",
+                        [(key, position, text) for position, text in enumerate([tweet] + list(comments))]
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        if not cursor.rowcount:
+            logger.info(f"Bundle {key} is already in the outbox")
+        return key
+
+    def adopt(self, account):
+        """Give bundles stored without an account to `account`. Returns how many there were."""
+        with self._lock:
+            return self._conn.execute("UPDATE bundles SET account = ? WHERE account IS NULL", (account,)).rowcount
+
+    def get(self, key):
+        """
+        Return the bundle as a dict (key, account, topic, status, attempts,
+        created_at, parts), where parts is a list of dicts (position, text, status,
+        tweet_id) in posting order, or None if there is no such bundle.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT key, account, topic, status, attempts, created_at FROM bundles WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            parts = self._conn.execute(
+                "SELECT position, text, status, tweet_id FROM parts WHERE bundle_key = ? ORDER BY position", (key,)
+            ).fetchall()
+        bundle = dict(zip(("key", "account", "topic", "status", "attempts", "created_at"), row))
+        bundle["parts"] = [dict(zip(("position", "text", "status", "tweet_id"), part)) for part in parts]
+        return bundle
+
+    def claim(self, key):
+        """Mark a bundle as being posted. Returns False if it is posted, failed or claimed elsewhere."""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE bundles SET status = 'posting', claimed_at = ?, updated_at = ? "
+                "WHERE key = ? AND (status = 'pending' OR (status = 'posting' AND claimed_at < ?))",
+                (now, now, key, now - OUTBOX_CLAIM_TIMEOUT)
+            )
+        return cursor.rowcount == 1
+
+    def claim_due(self, limit=10, account=None, root_posted=None, now=None):
+        """
+        Claim bundles whose next attempt is due.
+
+        Args:
+            limit: Maximum number of bundles to claim
+            account: Only claim bundles of this account
+            root_posted: True for bundles whose root tweet is already out
+                (only replies left), False for ones whose root is not, None for both
+            now: Override the current time
+
+        Returns:
+            list: Keys of the claimed bundles, oldest first
+        """
+        now = now or time.time()
+        root_filter = ""
+        if root_posted is not None:
+            root_filter = (f"AND {'' if root_posted else 'NOT '}EXISTS (SELECT 1 FROM parts "
+                           "WHERE bundle_key = bundles.key AND position = 0 AND status = 'posted') ")
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                keys = [row[0] for row in self._conn.execute(
+                    "SELECT key FROM bundles "
+                    "WHERE ((status = 'pending' AND next_attempt_at <= ?) "
+                    "OR (status = 'posting' AND claimed_at < ?)) "
+                    "AND (? IS NULL OR account = ?) " + root_filter +
+                    "ORDER BY created_at LIMIT ?",
+                    (now, time.time() - OUTBOX_CLAIM_TIMEOUT, account, account, limit)
+                )]
+                claimed_at = time.time()
+                self._conn.executemany(
+                    "UPDATE bundles SET status = 'posting', claimed_at = ?, updated_at = ? WHERE key = ?",
+                    [(claimed_at, claimed_at, key) for key in keys]
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return keys
+
+    def _set_parts(self, key, positions, status, tweet_id=None):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE parts SET status = ?, tweet_id = COALESCE(?, tweet_id), posted_at = ? "
+                "WHERE bundle_key = ? AND position = ?",
+                [(status, str(tweet_id) if tweet_id else None, now, key, position) for position in positions]
+            )
+
+    def mark_sending(self, key, position):
+        self._set_parts(key, [position], SENDING)
+
+    def mark_posted(self, key, position, tweet_id):
+        self._set_parts(key, [position], POSTED, tweet_id)
+
+    def mark_queued(self, key, positions):
+        self._set_parts(key, positions, QUEUED)
+
+    def unmark_sending(self, key):
+        """Return parts marked sending to pending, once it is known X did not accept them."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE parts SET status = 'pending', posted_at = NULL WHERE bundle_key = ? AND status = 'sending'",
+                (key,)
+            )
+
+    def complete(self, key):
+        """Mark a bundle as fully posted (or handed to the reply queue)."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE bundles SET status = 'posted', claimed_at = NULL, updated_at = ? WHERE key = ?", (now, key)
+            )
+
+    def fail(self, key, error, permanent=False):
+        """
+        Release a bundle after a failed attempt, to be retried with
+        exponential backoff until `max_attempts` is reached. A `permanent`
+        failure (X rejected the request itself) is not retried at all.
+
+        Returns:
+            str: The bundle's new status, "pending" or "failed"
+        """
+        now = time.time()
+        with self._lock:
+            attempts = self._conn.execute("SELECT attempts FROM bundles WHERE key = ?", (key,)).fetchone()[0] + 1
+            status = FAILED if permanent or attempts >= self.max_attempts else PENDING
+            # Backoff before the next attempt: 30s, 60s, 120s, ...
+            self._conn.execute(
+                "UPDATE bundles SET status = ?, attempts = ?, last_error = ?, next_attempt_at = ?, "
+                "claimed_at = NULL, updated_at = ? WHERE key = ?",
+                (status, attempts, error[:500], now + 30 * 2 ** (attempts - 1), now, key)
+            )
+        return status
+
+    def reschedule(self, key, retry_at):
+        """Release a bundle until `retry_at` without counting a failed attempt (e.g. rate limited)."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE bundles SET status = 'pending', next_attempt_at = ?, claimed_at = NULL, updated_at = ? "
+                "WHERE key = ?", (retry_at, time.time(), key)
+            )
+
+    def pending_count(self, account=None):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM bundles WHERE status IN ('pending', 'posting') "
+                "AND (? IS NULL OR account = ?)", (account, account)
+            ).fetchone()[0]
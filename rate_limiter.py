@@ -0,0 +1,210 @@
+import logging
+import os
+import random
+import re
+import threading
+import time
+
+from metrics import MILLISECONDS, get_metrics
+
+logger = logging.getLogger("TwitterAgent")
+
+# Budget assumed for an endpoint until X tells us the real one, as
+# "<requests>/<seconds>"; the x-rate-limit-* headers take over after that
+DEFAULT_RATE_LIMIT = os.getenv("TWEET_RATE_LIMIT", "100/900")
+# Longest we will sleep in-process for a rate limit before rescheduling instead
+RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", "60"))
+RATE_LIMIT_MAX_RETRIES = int(os.getenv("RATE_LIMIT_MAX_RETRIES", "3"))
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 30.0
+
+_ID_SEGMENT = re.compile(r"/\d{4,}(?=/|$)")
+
+
+class RateLimitDeferred(Exception):
+    """Raised instead of sending a request that would be rate limited for longer than we may wait."""
+
+    def __init__(self, endpoint, retry_at):
+        self.endpoint = endpoint
+        self.retry_at = retry_at
+        super().__init__(f"{endpoint} rate limited for {max(0.0, retry_at - time.time()):.0f}s")
+
+
+def is_permanent_error(e):
+    """
+    Whether `e` is an X API rejection that sending again will not fix: any
+    4xx response other than 429 (a duplicate tweet's 403 Forbidden, a 400
+    Bad Request, ...). Rate limits, 5xx responses and network errors are not.
+    """
+    status_code = getattr(getattr(e, "response", None), "status_code", None)
+    return isinstance(status_code, int) and 400 <= status_code < 500 and status_code != 429
+
+
+def endpoint_key(method, url):
+    """Normalise a request to 'METHOD /path' with numeric IDs collapsed, e.g. 'POST /2/tweets'."""
+    path = re.sub(r"^https?://[^/]+", "", url).split("?", 1)[0]
+    return f"{method.upper()} {_ID_SEGMENT.sub('/:id', path)}"
+
+
+class TokenBucket:
+    """
+    Request budget for one (account, endpoint).
+
+    Until rate-limit headers are seen it is a plain token bucket refilling
+    `capacity` tokens every `window` seconds. Once X reports
+    limit/remaining/reset, it follows X's fixed window: `remaining` tokens
+    until `reset_at`, then a full `limit`.
+    """
+
+    def __init__(self, capacity, window):
+        self.capacity = float(capacity)
+        self.refill_rate = capacity / window
+        self.tokens = float(capacity)
+        self.reset_at = None
+        self.updated_at = time.time()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        if self.reset_at is not None:
+            if now >= self.reset_at:
+                self.tokens = self.capacity
+                self.reset_at = None
+        else:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_rate)
+        self.updated_at = now
+
+    def wait_time(self, now=None):
+        """Seconds until a token is available (0 if one is available now)."""
+        now = now or time.time()
+        with self._lock:
+            self._refill(now)
+            if self.tokens >= 1:
+                return 0.0
+            if self.reset_at is not None:
+                return self.reset_at - now
+            return (1 - self.tokens) / self.refill_rate
+
+    def try_acquire(self, now=None):
+        """Take a token if one is available; returns the seconds to wait otherwise."""
+        now = now or time.time()
+        with self._lock:
+            self._refill(now)
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+        return self.wait_time(now)
+
+    def observe(self, limit, remaining, reset_at):
+        with self._lock:
+            if limit:
+                self.capacity = float(limit)
+            self.tokens = float(remaining)
+            self.reset_at = reset_at
+            self.updated_at = time.time()
+
+
+class RateLimiter:
+    """Per-account, per-endpoint request budgets driven by X's x-rate-limit-* headers."""
+
+    def __init__(self, default_limit=DEFAULT_RATE_LIMIT, max_wait=RATE_LIMIT_MAX_WAIT,
+                 max_retries=RATE_LIMIT_MAX_RETRIES):
+        requests_allowed, window = default_limit.split("/")
+        self.default_capacity = int(requests_allowed)
+        self.default_window = float(window)
+        self.max_wait = max_wait
+        self.max_retries = max_retries
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, account, endpoint):
+        key = (account, endpoint)
+        with self._lock:
+            if key not in self._buckets:
+                self._buckets[key] = TokenBucket(self.default_capacity, self.default_window)
+            return self._buckets[key]
+
+    def observe(self, account, endpoint, headers):
+        """Update a bucket from a response's x-rate-limit-* headers, if present."""
+        if "x-rate-limit-remaining" not in headers:
+            return
+        try:
+            limit = int(headers.get("x-rate-limit-limit", 0))
+            remaining = int(headers["x-rate-limit-remaining"])
+            reset_at = float(headers["x-rate-limit-reset"]) if "x-rate-limit-reset" in headers else None
+        except ValueError:
+            return
+        self.bucket(account, endpoint).observe(limit, remaining, reset_at)
+        if remaining == 0:
+            logger.warning(f"Rate limit for {endpoint} exhausted for {account}, resets at {reset_at}")
+
+    def response_hook(self, account):
+        """A requests response hook that feeds every response's headers into this limiter."""
+        def hook(response, *args, **kwargs):
+            self.observe(account, endpoint_key(response.request.method, response.request.url), response.headers)
+        return hook
+
+    def acquire(self, account, endpoint, max_wait=None):
+        """
+        Take a token for `endpoint`, sleeping up to `max_wait` seconds for one.
+        Raises RateLimitDeferred if the wait would be longer.
+        """
+        max_wait = self.max_wait if max_wait is None else max_wait
+        bucket = self.bucket(account, endpoint)
+        while True:
+            wait = bucket.try_acquire()
+            if wait <= 0:
+                return
+            if wait > max_wait:
+                raise RateLimitDeferred(endpoint, time.time() + wait)
+            logger.info(f"Waiting {wait:.1f}s for {endpoint} rate limit")
+            get_metrics().record("rate_limit_wait", wait * 1000, MILLISECONDS, endpoint=endpoint)
+            time.sleep(wait)
+
+    def call(self, account, endpoint, func, max_wait=None, retry_server_errors=True):
+        """
+        Run `func()` within the rate limit for (account, endpoint).
+
+        429s update the bucket from their headers and are retried after the
+        reset if that is within `max_wait`; 5xx errors are retried with
+        jittered exponential backoff, up to `max_retries` times, unless
+        `retry_server_errors` is False. Pass False for requests that must not
+        be sent twice: X often carries out a request it answers with a 503/504.
+        """
+        import tweepy
+        max_wait = self.max_wait if max_wait is None else max_wait
+        for attempt in range(self.max_retries + 1):
+            self.acquire(account, endpoint, max_wait)
+            try:
+                return func()
+            except tweepy.TooManyRequests as e:
+                self.observe(account, endpoint, e.response.headers)
+                bucket = self.bucket(account, endpoint)
+                if bucket.reset_at is None:
+                    # No reset header: hold the endpoint for a backoff period
+                    bucket.observe(None, 0, time.time() + self._backoff(attempt))
+                if attempt == self.max_retries:
+                    raise
+                logger.warning(f"429 from {endpoint} for {account} (attempt {attempt + 1})")
+            except tweepy.TwitterServerError as e:
+                if not retry_server_errors or attempt == self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning(f"{e.response.status_code} from {endpoint}, retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def _backoff(self, attempt):
+        # "Full jitter": a random delay up to the exponential bound
+        return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** (attempt + 1)))
+
+
+_shared_limiter = None
+_shared_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """Return the process-wide rate limiter shared by every agent and account."""
+    global _shared_limiter
+    with _shared_lock:
+        if _shared_limiter is None:
+            _shared_limiter = RateLimiter()
+        return _shared_limiter
@@ -0,0 +1,179 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from rate_limiter import is_permanent_error
+
+logger = logging.getLogger("TwitterAgent")
+
+REPLY_QUEUE_PATH = os.getenv("REPLY_QUEUE_PATH", "/tmp/twitter_agent_replies.db")
+REPLY_MAX_ATTEMPTS = int(os.getenv("REPLY_MAX_ATTEMPTS", "5"))
+# A claimed reply not marked posted/failed within this many seconds (the
+# process died mid-post) is handed out again
+REPLY_CLAIM_TIMEOUT = 600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS replies (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    parent_id TEXT NOT NULL,
+    account TEXT,
+    text TEXT NOT NULL,
+    due_at REAL NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    posted_id TEXT,
+    last_error TEXT,
+    claimed_at REAL,
+    created_at REAL NOT NULL,
+    key TEXT
+);
+CREATE INDEX IF NOT EXISTS replies_due ON replies (status, due_at);
+"""
+
+
+class ReplyQueue:
+    """
+    Durable SQLite queue of replies waiting to be posted.
+
+    Instead of sleeping between replies, the root tweet is posted and each
+    reply is stored with the time it becomes due. drain() posts whatever is
+    due and returns immediately, so it can run at the end of an invocation or
+    at the start of the next one.
+    """
+
+    def __init__(self, path=REPLY_QUEUE_PATH, max_attempts=REPLY_MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        # Queue files written before replies carried an account or key
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(replies)")}
+        if "account" not in columns:
+            self._conn.execute("ALTER TABLE replies ADD COLUMN account TEXT")
+        if "key" not in columns:
+            self._conn.execute("ALTER TABLE replies ADD COLUMN key TEXT")
+        self._conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS replies_key ON replies (key)")
+
+    def enqueue(self, parent_id, texts, delays, account=None, keys=None):
+        """
+        Queue replies to `parent_id`. `delays` are seconds between consecutive
+        replies, so reply k is due at now + sum(delays[:k + 1]). `account`
+        records which account must post them. A reply whose entry in `keys`
+        was queued before is not queued again.
+        """
+        now = time.time()
+        due_at = now
+        rows = []
+        for text, delay, key in zip(texts, delays, keys or [None] * len(texts)):
+            due_at += delay
+            rows.append((str(parent_id), account, text, due_at, now, key))
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO replies (parent_id, account, text, due_at, created_at, key) "
+                "VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+            queued = self._conn.total_changes - before
+        logger.info(f"Queued {queued} replies to tweet {parent_id}")
+        return queued
+
+    def adopt(self, account):
+        """Give replies queued without an account to `account`. Returns how many there were."""
+        with self._lock:
+            return self._conn.execute("UPDATE replies SET account = ? WHERE account IS NULL", (account,)).rowcount
+
+    def _claim_due(self, now, limit, account=None):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    "SELECT id, parent_id, text, attempts FROM replies "
+                    "WHERE ((status = 'pending' AND due_at <= ?) "
+                    "OR (status = 'posting' AND claimed_at < ?)) "
+                    "AND (? IS NULL OR account = ?) ORDER BY due_at LIMIT ?",
+                    (now, time.time() - REPLY_CLAIM_TIMEOUT, account, account, limit),
+                ).fetchall()
+                self._conn.executemany(
+                    "UPDATE replies SET status = 'posting', claimed_at = ? WHERE id = ?",
+                    [(time.time(), row[0]) for row in rows],
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return rows
+
+    def _mark_posted(self, reply_id, posted_id):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE replies SET status = 'posted', posted_id = ?, attempts = attempts + 1 WHERE id = ?",
+                (str(posted_id), reply_id),
+            )
+
+    def _mark_failed(self, reply_id, attempts, error, permanent=False):
+        attempts += 1
+        status = "failed" if permanent or attempts >= self.max_attempts else "pending"
+        # Exponential backoff before the next attempt: 30s, 60s, 120s, ...
+        retry_at = time.time() + 30 * 2 ** (attempts - 1)
+        with self._lock:
+            self._conn.execute(
+                "UPDATE replies SET status = ?, attempts = ?, last_error = ?, due_at = ? WHERE id = ?",
+                (status, attempts, error[:500], retry_at, reply_id),
+            )
+        return status
+
+    def _reschedule(self, reply_id, due_at):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE replies SET status = 'pending', due_at = ? WHERE id = ?", (due_at, reply_id)
+            )
+
+    def drain(self, post_reply, limit=50, now=None, account=None):
+        """
+        Post every reply that is due.
+
+        Args:
+            post_reply: Callable (text, parent_id) -> posted tweet id
+            limit: Maximum number of replies to post in this call
+            now: Override the current time (e.g. to flush everything)
+            account: Only drain replies queued for this account (None drains all)
+
+        Returns:
+            list: (parent_id, posted_id or None) for each reply attempted
+        """
+        results = []
+        for reply_id, parent_id, text, attempts in self._claim_due(now or time.time(), limit, account):
+            try:
+                posted_id = post_reply(text, parent_id)
+                self._mark_posted(reply_id, posted_id)
+                results.append((parent_id, posted_id))
+            except Exception as e:
+                retry_at = getattr(e, "retry_at", None)
+                if retry_at:
+                    # Rate limited before sending: not a failed attempt, just later
+                    self._reschedule(reply_id, retry_at)
+                    logger.info(f"Queued reply {reply_id} rescheduled: {str(e)}")
+                    results.append((parent_id, None))
+                    continue
+                # X rejecting the reply itself (4xx other than 429) is not worth retrying
+                status = self._mark_failed(reply_id, attempts, str(e), permanent=is_permanent_error(e))
+                logger.error(f"Failed to post queued reply {reply_id} to {parent_id} ({status}): {str(e)}")
+                results.append((parent_id, None))
+        return results
+
+    def pending_count(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM replies WHERE status IN ('pending', 'posting')"
+            ).fetchone()[0]
+
+    def next_due_at(self):
+        """Return when the next pending reply becomes due, or None."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT MIN(due_at) FROM replies WHERE status = 'pending'"
+            ).fetchone()[0]
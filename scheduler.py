@@ -0,0 +1,213 @@
+import heapq
+import itertools
+import json
+import logging
+import os
+import random
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger("TwitterAgent")
+
+SCHEDULER_STATE_PATH = os.getenv("SCHEDULER_STATE_PATH", "/tmp/twitter_agent_schedule.json")
+
+# What to do about slots that passed while nothing was running
+MISSED_SKIP = "skip"          # drop them, wait for the next future slot
+MISSED_RUN_ONCE = "run_once"  # run once now for all of them, then realign
+MISSED_CATCH_UP = "catch_up"  # run once per missed slot
+MISSED_POLICIES = (MISSED_SKIP, MISSED_RUN_ONCE, MISSED_CATCH_UP)
+
+
+class Job:
+    """
+    A recurring job.
+
+    Slots are `interval` seconds apart, anchored to the first slot, so the
+    cadence does not drift by however long each run takes. Each run happens
+    at its slot plus a random offset of up to `jitter` seconds. If `prepare`
+    is given it is called `prefetch` seconds ahead of the run and its result
+    is handed to `func`, so expensive work happens before the slot.
+    """
+
+    def __init__(self, name, func, interval, jitter=0, missed=MISSED_RUN_ONCE,
+                 prepare=None, prefetch=0, max_catch_up=10):
+        if missed not in MISSED_POLICIES:
+            raise ValueError(f"Unknown missed-run policy: {missed}")
+        self.name = name
+        self.func = func
+        self.interval = float(interval)
+        self.jitter = float(jitter)
+        self.missed = missed
+        self.prepare = prepare
+        self.prefetch = float(prefetch) if prepare else 0.0
+        self.max_catch_up = max_catch_up
+        self.next_slot = None
+        self.run_at = None
+        self.prepared = None
+
+    def schedule(self, slot):
+        self.next_slot = slot
+        self.run_at = slot + (random.uniform(0, self.jitter) if self.jitter else 0)
+        self.prepared = None
+
+    def __repr__(self):
+        return f"Job({self.name!r}, every {self.interval:.0f}s)"
+
+
+class Scheduler:
+    """
+    Priority-queue scheduler for recurring jobs.
+
+    Use run_forever() as a long-lived daemon (stops cleanly on SIGINT/SIGTERM
+    or stop()), or run_pending() from a cron/EventBridge-triggered process to
+    run whatever is due now. Next-slot times are persisted to `state_path` so
+    a cron-driven scheduler keeps its cadence between processes.
+    """
+
+    def __init__(self, state_path=SCHEDULER_STATE_PATH):
+        self.state_path = state_path
+        self.jobs = {}
+        self._heap = []
+        self._counter = itertools.count()
+        self._stop = threading.Event()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="scheduler-prefetch")
+        self._state = self._load_state()
+
+    def _load_state(self):
+        if not self.state_path or not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable scheduler state {self.state_path}: {str(e)}")
+            return {}
+
+    def _save_state(self):
+        if not self.state_path:
+            return
+        state = dict(self._state, **{name: job.next_slot for name, job in self.jobs.items()})
+        tmp_path = f"{self.state_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self.state_path)
+        except OSError as e:
+            logger.warning(f"Could not persist scheduler state to {self.state_path}: {str(e)}")
+
+    def _push(self, job):
+        heapq.heappush(self._heap, (job.run_at, next(self._counter), job.name))
+
+    def add_job(self, job, first_slot=None):
+        """
+        Register a job. Its first slot is the persisted one, else `first_slot`,
+        else one interval from now, so a process that lost its state (a fresh
+        Lambda container) does not run the job straight away.
+        """
+        slot = self._state.get(job.name)
+        if slot is None:
+            slot = first_slot or time.time() + job.interval
+        job.schedule(slot)
+        self.jobs[job.name] = job
+        self._push(job)
+        if job.name not in self._state:
+            # Persist the new job's anchor now, not only after its first run
+            self._state[job.name] = slot
+            self._save_state()
+        logger.info(f"Scheduled job {job.name} every {job.interval:.0f}s, next run at {time.ctime(job.run_at)}")
+        return job
+
+    def _due_slots(self, job, now):
+        """How many runs are owed for `job` at `now`, per its missed-run policy."""
+        missed = int((now - job.next_slot) // job.interval)
+        if missed <= 0:
+            return 1
+        if job.missed == MISSED_SKIP:
+            return 0
+        if job.missed == MISSED_RUN_ONCE:
+            return 1
+        return min(missed + 1, job.max_catch_up)
+
+    def _prepared_result(self, job):
+        """Result of the prefetch for `job`, re-running prepare() if the prefetch failed."""
+        future, job.prepared = job.prepared, None
+        if future is not None:
+            try:
+                return future.result()
+            except Exception as e:
+                logger.warning(f"Prefetch for job {job.name} failed, preparing inline: {str(e)}")
+        return job.prepare()
+
+    def _run(self, job, runs):
+        for _ in range(runs):
+            try:
+                if job.prepare:
+                    job.func(self._prepared_result(job))
+                else:
+                    job.func()
+            except Exception as e:
+                logger.error(f"Scheduled job {job.name} failed: {str(e)}")
+
+    def _reschedule(self, job, now):
+        slot = job.next_slot + job.interval
+        if slot <= now:
+            # Realign to the first slot after now, keeping the original anchor
+            slot += ((now - slot) // job.interval + 1) * job.interval
+        job.schedule(slot)
+        self._push(job)
+
+    def _prefetch(self, now):
+        for job in self.jobs.values():
+            if job.prepare and job.prepared is None and job.run_at - job.prefetch <= now:
+                logger.info(f"Prefetching for job {job.name} due at {time.ctime(job.run_at)}")
+                job.prepared = self._executor.submit(job.prepare)
+
+    def run_pending(self, now=None):
+        """Run every job that is due, reschedule it and persist the schedule. Returns the names run."""
+        now = now or time.time()
+        self._prefetch(now)
+        ran = []
+        popped = False
+        while self._heap and self._heap[0][0] <= now:
+            popped = True
+            _, _, name = heapq.heappop(self._heap)
+            job = self.jobs[name]
+            runs = self._due_slots(job, now)
+            if runs == 0:
+                logger.info(f"Skipping missed runs of job {job.name}")
+            else:
+                self._run(job, runs)
+                ran.append(job.name)
+            self._reschedule(job, time.time())
+        if popped:
+            self._save_state()
+        return ran
+
+    def next_wakeup(self):
+        """Seconds until the next run or prefetch is due."""
+        if not self._heap:
+            return None
+        times = [self._heap[0][0]]
+        times += [job.run_at - job.prefetch for job in self.jobs.values() if job.prepare and job.prepared is None]
+        return max(0.0, min(times) - time.time())
+
+    def stop(self):
+        self._stop.set()
+
+    def run_forever(self, install_signal_handlers=True):
+        """Run jobs as they come due until stop() or SIGINT/SIGTERM."""
+        if install_signal_handlers and threading.current_thread() is threading.main_thread():
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(sig, lambda signum, frame: self.stop())
+        logger.info(f"Scheduler started with {len(self.jobs)} jobs")
+        try:
+            while not self._stop.is_set():
+                self.run_pending()
+                wakeup = self.next_wakeup()
+                self._stop.wait(60 if wakeup is None else min(wakeup, 3600))
+        finally:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._save_state()
+            logger.info("Scheduler stopped")
@@ -0,0 +1,176 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger("TwitterAgent")
+
+# Cache file lives next to /tmp/twitter_agent.log so warm Lambda containers reuse it
+TOPIC_CACHE_PATH = os.getenv("TOPIC_CACHE_PATH", "/tmp/twitter_agent_topics.json")
+TOPIC_CACHE_TTL = float(os.getenv("TOPIC_CACHE_TTL", "3600"))
+# TTL for topics from a round in which some source failed, so it is retried soon
+TOPIC_CACHE_PARTIAL_TTL = float(os.getenv("TOPIC_CACHE_PARTIAL_TTL", "300"))
+TOPIC_CACHE_MAX_STALE = float(os.getenv("TOPIC_CACHE_MAX_STALE", "86400"))
+TOPIC_CACHE_MAX_ENTRIES = int(os.getenv("TOPIC_CACHE_MAX_ENTRIES", "16"))
+# Refresh stale entries on a background thread; Lambda freezes the container
+# once the handler returns, so there they are refreshed inline instead
+TOPIC_CACHE_BACKGROUND_REFRESH = os.getenv(
+    "TOPIC_CACHE_BACKGROUND_REFRESH", "" if os.getenv("AWS_LAMBDA_FUNCTION_NAME") else "1"
+).lower() in ("1", "true", "yes")
+
+
+class TopicCache:
+    """
+    TTL cache for scraped topics, held in memory and mirrored to a JSON file.
+
+    Entries younger than their TTL (`ttl` unless set with another) are served
+    as-is. Entries older than that but younger than `max_stale` are served
+    immediately while a background thread refreshes them
+    (stale-while-revalidate), or, without `background_refresh`, are refreshed
+    inline first and only served if the refresh fails. Anything older, or
+    anything beyond `max_entries` (least recently used first), is evicted.
+    """
+
+    def __init__(self, path=TOPIC_CACHE_PATH, ttl=TOPIC_CACHE_TTL,
+                 max_stale=TOPIC_CACHE_MAX_STALE, max_entries=TOPIC_CACHE_MAX_ENTRIES,
+                 background_refresh=TOPIC_CACHE_BACKGROUND_REFRESH):
+        self.path = path
+        self.ttl = ttl
+        self.max_stale = max(max_stale, ttl)
+        self.max_entries = max_entries
+        self.background_refresh = background_refresh
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            for key, entry in data.items():
+                self._entries[key] = (entry["fetched_at"], entry["value"], entry.get("ttl"))
+            self._evict(time.time())
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable topic cache {self.path}: {str(e)}")
+            self._entries.clear()
+
+    def _save(self):
+        if not self.path:
+            return
+        data = {key: {"fetched_at": fetched_at, "value": value, "ttl": ttl}
+                for key, (fetched_at, value, ttl) in self._entries.items()}
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Could not persist topic cache to {self.path}: {str(e)}")
+
+    def _evict(self, now):
+        for key in [k for k, (fetched_at, _, _) in self._entries.items()
+                    if now - fetched_at > self.max_stale]:
+            del self._entries[key]
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key):
+        """Return (value, age_seconds) for a servable entry, or (None, None)."""
+        value, age, _ = self._get(key)
+        return value, age
+
+    def _get(self, key):
+        now = time.time()
+        with self._lock:
+            self._evict(now)
+            if key not in self._entries:
+                return None, None, None
+            self._entries.move_to_end(key)
+            fetched_at, value, ttl = self._entries[key]
+            return value, now - fetched_at, self.ttl if ttl is None else ttl
+
+    def set(self, key, value, ttl=None):
+        """Cache `value`, fresh for `ttl` seconds (default: the cache's TTL)."""
+        with self._lock:
+            self._entries[key] = (time.time(), value, ttl)
+            self._entries.move_to_end(key)
+            self._evict(time.time())
+            self._save()
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+            self._save()
+
+    def _load_into(self, key, loader, ttl_for):
+        value = loader()
+        if value:
+            self.set(key, value, ttl_for(value) if ttl_for else None)
+        return value
+
+    def _refresh(self, key, loader, ttl_for=None):
+        try:
+            value = self._load_into(key, loader, ttl_for)
+            if value:
+                logger.info(f"Refreshed topic cache entry '{key}'")
+            return value
+        except Exception as e:
+            logger.error(f"Refresh of topic cache entry '{key}' failed: {str(e)}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _refresh_in_background(self, key, loader, ttl_for=None):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        threading.Thread(target=self._refresh, args=(key, loader, ttl_for),
+                         name=f"topic-cache-refresh-{key}", daemon=True).start()
+
+    def get_or_load(self, key, loader, ttl_for=None):
+        """
+        Return the cached value for `key`, calling `loader()` only on a miss.
+
+        Stale hits are returned straight away and refreshed in the background,
+        or refreshed inline (the loader bounds how long that takes) without
+        `background_refresh`. Empty loader results are returned but not
+        cached, so the next call retries.
+
+        Args:
+            key: Cache key
+            loader: Callable returning the value to cache
+            ttl_for: Optional callable giving the TTL to cache a loaded value
+                for, or None for the cache's TTL
+        """
+        value, age, ttl = self._get(key)
+        if value is not None:
+            if age <= ttl:
+                return value
+            if self.background_refresh:
+                logger.info(f"Serving stale topics for '{key}' ({age:.0f}s old), refreshing")
+                self._refresh_in_background(key, loader, ttl_for)
+                return value
+            logger.info(f"Topics for '{key}' are {age:.0f}s old, refreshing before serving them")
+            return self._refresh(key, loader, ttl_for) or value
+
+        return self._load_into(key, loader, ttl_for)
+
+
+_shared_cache = None
+
+
+def get_topic_cache():
+    """Return the process-wide topic cache, creating it on first use."""
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = TopicCache()
+    return _shared_cache
@@ -0,0 +1,207 @@
+import logging
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+import zlib
+from array import array
+from collections import OrderedDict
+
+logger = logging.getLogger("TwitterAgent")
+
+TOPIC_HISTORY_PATH = os.getenv("TOPIC_HISTORY_PATH", "/tmp/twitter_agent_history.db")
+# Estimated Jaccard similarity (of character shingles) at which two texts count as the same
+TOPIC_HISTORY_THRESHOLD = float(os.getenv("TOPIC_HISTORY_THRESHOLD", "0.6"))
+# Entries kept per history; the oldest are evicted beyond this
+TOPIC_HISTORY_MAX_ENTRIES = int(os.getenv("TOPIC_HISTORY_MAX_ENTRIES", "20000"))
+# Posts older than this no longer block a topic from coming back
+TOPIC_HISTORY_WINDOW = float(os.getenv("TOPIC_HISTORY_WINDOW_DAYS", "30")) * 86400
+
+TOPIC = "topic"
+TWEET = "tweet"
+
+SHINGLE_SIZE = 4
+NUM_PERM = 64
+BANDS = 16  # 16 bands of 4 rows: pairs around 0.5 similarity and above become candidates
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+# Fixed seed so signatures stored by one process match those computed by the next
+_rng = random.Random(20240501)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    account TEXT,
+    kind TEXT NOT NULL,
+    text TEXT NOT NULL,
+    signature BLOB NOT NULL,
+    tweet_id TEXT,
+    created_at REAL NOT NULL
+);
+"""
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """Overlapping character `size`-grams of `text`, casefolded with punctuation removed."""
+    # Letters and digits of any script count: CJK or Cyrillic topics keep their signal.
+    # For ASCII text this is the same as the old [^a-z0-9] normalization, so stored signatures still match.
+    normalized = " ".join(_NON_WORD.sub(" ", unicodedata.normalize("NFC", text).casefold()).split())
+    if not normalized:
+        # Nothing but symbols (e.g. emoji): compare them as they are rather than as one empty shingle
+        normalized = text.strip()
+    if len(normalized) <= size:
+        return {normalized}
+    return {normalized[i:i + size] for i in range(len(normalized) - size + 1)}
+
+
+def minhash(text):
+    """MinHash signature of `text`'s shingles, as a tuple of NUM_PERM 32-bit ints."""
+    hashes = [zlib.crc32(shingle.encode("utf-8")) for shingle in shingles(text)]
+    return tuple(min(((a * h + b) % _PRIME) & _MAX_HASH for h in hashes) for a, b in _PERMUTATIONS)
+
+
+def similarity(signature, other):
+    """Estimated Jaccard similarity of the texts behind two signatures."""
+    return sum(1 for x, y in zip(signature, other) if x == y) / len(signature)
+
+
+def _band_keys(signature):
+    rows = len(signature) // BANDS
+    return [(band, hash(signature[band * rows:(band + 1) * rows])) for band in range(BANDS)]
+
+
+class TopicHistory:
+    """
+    Persistent history of posted topics and tweet texts with a MinHash/LSH
+    near-duplicate index.
+
+    Each entry is stored in SQLite with its MinHash signature. In memory the
+    signatures are bucketed by LSH band, so a lookup only compares against
+    the few entries sharing a band with the query instead of the whole
+    history. At most `max_entries` entries are kept, oldest evicted first.
+    """
+
+    def __init__(self, path=TOPIC_HISTORY_PATH, threshold=TOPIC_HISTORY_THRESHOLD,
+                 max_entries=TOPIC_HISTORY_MAX_ENTRIES, window=TOPIC_HISTORY_WINDOW):
+        self.path = path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.window = window
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._entries = OrderedDict()  # id -> (account, kind, signature, created_at, text)
+        self._buckets = {}  # (account, kind, band, band hash) -> {ids}
+        self._load()
+
+    def _load(self):
+        self._conn.execute("DELETE FROM history WHERE created_at < ?", (time.time() - self.window,))
+        rows = self._conn.execute(
+            "SELECT id, account, kind, text, signature, created_at FROM history ORDER BY id DESC LIMIT ?",
+            (self.max_entries,)
+        ).fetchall()
+        for entry_id, account, kind, text, blob, created_at in reversed(rows):
+            self._index(entry_id, account, kind, tuple(array("I", blob)), created_at, text)
+
+    def _index(self, entry_id, account, kind, signature, created_at, text):
+        self._entries[entry_id] = (account, kind, signature, created_at, text)
+        for band_key in _band_keys(signature):
+            self._buckets.setdefault((account, kind) + band_key, set()).add(entry_id)
+
+    def _evict(self):
+        evicted = None
+        while len(self._entries) > self.max_entries:
+            entry_id, (account, kind, signature, _, _) = self._entries.popitem(last=False)
+            for band_key in _band_keys(signature):
+                bucket = self._buckets.get((account, kind) + band_key)
+                if bucket is not None:
+                    bucket.discard(entry_id)
+                    if not bucket:
+                        del self._buckets[(account, kind) + band_key]
+            evicted = entry_id
+        if evicted is not None:
+            self._conn.execute("DELETE FROM history WHERE id <= ?", (evicted,))
+
+    def _most_similar(self, signature, kind, account, now):
+        candidates = set()
+        for band_key in _band_keys(signature):
+            candidates |= self._buckets.get((account, kind) + band_key, set())
+        best = None
+        for entry_id in candidates:
+            _, _, other, created_at, text = self._entries[entry_id]
+            if now - created_at > self.window:
+                continue
+            score = similarity(signature, other)
+            if best is None or score > best[0]:
+                best = (score, text)
+        return best
+
+    def most_similar(self, text, kind=TOPIC, account=None):
+        """Return (similarity, text) of the closest recent entry, or None if nothing is close."""
+        with self._lock:
+            return self._most_similar(minhash(text), kind, account, time.time())
+
+    def is_duplicate(self, text, kind=TOPIC, account=None):
+        match = self.most_similar(text, kind, account)
+        return match is not None and match[0] >= self.threshold
+
+    def filter_new(self, topics, account=None):
+        """
+        Drop topics that are near-duplicates of recently posted topics or of
+        an earlier topic in the same list. Order is preserved.
+        """
+        now = time.time()
+        fresh = []
+        kept_signatures = []
+        with self._lock:
+            for topic in topics:
+                signature = minhash(topic)
+                match = self._most_similar(signature, TOPIC, account, now)
+                if match is not None and match[0] >= self.threshold:
+                    logger.info(f"Skipping topic already posted ({match[0]:.2f} similar): {topic}")
+                    continue
+                if any(similarity(signature, kept) >= self.threshold for kept in kept_signatures):
+                    continue
+                kept_signatures.append(signature)
+                fresh.append(topic)
+        return fresh
+
+    def record(self, topic=None, tweet=None, account=None, tweet_id=None):
+        """Add a posted topic and/or tweet text to the history."""
+        now = time.time()
+        with self._lock:
+            for kind, text in ((TOPIC, topic), (TWEET, tweet)):
+                if not text:
+                    continue
+                signature = minhash(text)
+                cursor = self._conn.execute(
+                    "INSERT INTO history (account, kind, text, signature, tweet_id, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (account, kind, text, array("I", signature).tobytes(),
+                     str(tweet_id) if tweet_id else None, now)
+                )
+                self._index(cursor.lastrowid, account, kind, signature, now, text)
+            self._evict()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_shared_history = None
+_shared_lock = threading.Lock()
+
+
+def get_topic_history():
+    """Return the process-wide topic history, opening it on first use."""
+    global _shared_history
+    with _shared_lock:
+        if _shared_history is None:
+            _shared_history = TopicHistory()
+        return _shared_history
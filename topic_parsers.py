@@ -0,0 +1,197 @@
+"""
+Streaming, selector-restricted extraction of topic titles and their links.
+
+Rather than building a full BeautifulSoup tree for a listing page and keeping
+five elements of it, these parsers are fed the response body chunk by chunk,
+only buffer the text of elements matching a simple selector, and stop reading
+as soon as they have `limit` items.
+"""
+import re
+import xml.etree.ElementTree as ET
+from html.parser import HTMLParser
+
+CHUNK_SIZE = 16 * 1024
+
+# Elements that never get an end tag and so must not affect nesting depth
+VOID_ELEMENTS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input",
+    "link", "meta", "param", "source", "track", "wbr",
+}
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def iter_chunks(body, chunk_size=CHUNK_SIZE):
+    """Yield the body in chunks; accepts a string or an iterable of chunks."""
+    if isinstance(body, (str, bytes)):
+        for i in range(0, len(body), chunk_size):
+            yield body[i:i + chunk_size]
+    else:
+        yield from body
+
+
+def parse_selector(selector):
+    """
+    Turn a descendant selector like 'h2.post-block__title a' into a list of
+    (tag, class) steps. Only tag and single-class steps are supported.
+    """
+    steps = []
+    for part in selector.split():
+        tag, _, cls = part.partition(".")
+        steps.append((tag or None, cls or None))
+    return steps
+
+
+class SelectorTextExtractor(HTMLParser):
+    """
+    Collect the text of elements matching a descendant selector, stopping
+    after `limit` matches. Feed it chunks and check `done` between feeds.
+
+    Each item's link is the href of the matched element (or an anchor inside
+    it), else the last href matching `link_pattern` seen before it, as on
+    listings where the link sits next to the title rather than around it.
+    """
+
+    def __init__(self, selector, limit=5, link_pattern=None):
+        super().__init__(convert_charrefs=True)
+        self.steps = parse_selector(selector)
+        self.limit = limit
+        self.link_pattern = re.compile(link_pattern) if link_pattern else None
+        self.items = []
+        self.links = []
+        self.done = False
+        self._open = []  # [tag, depth] for each matched selector step
+        self._text = []
+        self._href = None
+        self._last_link = None
+
+    def _matches(self, step, tag, attrs):
+        step_tag, step_cls = step
+        if step_tag and step_tag != tag:
+            return False
+        if step_cls:
+            classes = (dict(attrs).get("class") or "").split()
+            return step_cls in classes
+        return True
+
+    @property
+    def _capturing(self):
+        return len(self._open) == len(self.steps)
+
+    def handle_starttag(self, tag, attrs):
+        if self.done or tag in VOID_ELEMENTS:
+            return
+        href = dict(attrs).get("href") if tag == "a" else None
+        if not self._capturing and self._matches(self.steps[len(self._open)], tag, attrs):
+            self._open.append([tag, 1])
+            if self._capturing:
+                self._text = []
+            if href:
+                self._note_link(href)
+            return
+        if href:
+            self._note_link(href)
+        for entry in reversed(self._open):
+            if entry[0] == tag:
+                entry[1] += 1
+                break
+
+    def _note_link(self, href):
+        href = href.strip()
+        if self._capturing:
+            self._href = self._href or href
+        elif self.link_pattern and self.link_pattern.search(href):
+            self._last_link = href
+
+    def handle_endtag(self, tag):
+        if self.done:
+            return
+        for i in range(len(self._open) - 1, -1, -1):
+            entry = self._open[i]
+            if entry[0] != tag:
+                continue
+            entry[1] -= 1
+            if entry[1] == 0:
+                if self._capturing:
+                    self._emit()
+                del self._open[i:]
+            break
+
+    def handle_data(self, data):
+        if self._capturing and not self.done:
+            self._text.append(data)
+
+    def _emit(self):
+        text = _WHITESPACE.sub(" ", "".join(self._text)).strip()
+        link = self._href or self._last_link
+        self._text = []
+        self._href = None
+        self._last_link = None
+        if text:
+            self.items.append(text)
+            self.links.append(link)
+            if len(self.items) >= self.limit:
+                self.done = True
+
+
+def extract_items(body, selector, limit=5, link_pattern=None):
+    """
+    Return (text, href) for the first `limit` elements matching `selector`,
+    reading no more of `body` than needed. href is None if none was found.
+    """
+    extractor = SelectorTextExtractor(selector, limit, link_pattern)
+    for chunk in iter_chunks(body):
+        if isinstance(chunk, bytes):
+            chunk = chunk.decode("utf-8", errors="replace")
+        extractor.feed(chunk)
+        if extractor.done:
+            break
+    return list(zip(extractor.items, extractor.links))
+
+
+def extract_text(body, selector, limit=5):
+    """
+    Return the text of the first `limit` elements matching `selector`,
+    reading no more of `body` than needed.
+    """
+    return [text for text, _ in extract_items(body, selector, limit)]
+
+
+def extract_feed_items(body, limit=5):
+    """
+    Return (title, link) for the first `limit` items/entries of an RSS or
+    Atom feed using an incremental XML pull parser; finished items are
+    cleared as we go.
+    """
+    parser = ET.XMLPullParser(events=("start", "end"))
+    path = []
+    items = []
+    title = link = None
+    for chunk in iter_chunks(body):
+        parser.feed(chunk)
+        for event, elem in parser.read_events():
+            name = elem.tag.rsplit("}", 1)[-1]
+            if event == "start":
+                path.append(name)
+                if name in ("item", "entry"):
+                    title = link = None
+                continue
+            path.pop()
+            if path and path[-1] in ("item", "entry"):
+                if name == "title":
+                    title = _WHITESPACE.sub(" ", elem.text or "").strip()
+                elif name == "link" and not link:
+                    # RSS puts the URL in the text, Atom in an href attribute
+                    link = (elem.get("href") or elem.text or "").strip() or None
+            elif name in ("item", "entry"):
+                if title:
+                    items.append((title, link))
+                    if len(items) >= limit:
+                        return items
+                elem.clear()
+    return items
+
+
+def extract_feed_titles(body, limit=5):
+    """Return the first `limit` item/entry titles from an RSS or Atom feed."""
+    return [title for title, _ in extract_feed_items(body, limit)]
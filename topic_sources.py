@@ -0,0 +1,276 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib.parse import urljoin
+
+from metrics import get_metrics
+from topic_parsers import CHUNK_SIZE, extract_feed_items, extract_items
+
+logger = logging.getLogger("TwitterAgent")
+
+# Per-source (connect, read) timeout and the overall deadline for a fetch round, in seconds
+SOURCE_TIMEOUT = (
+    float(os.getenv("TOPIC_SOURCE_CONNECT_TIMEOUT", "2")),
+    float(os.getenv("TOPIC_SOURCE_READ_TIMEOUT", "4")),
+)
+FETCH_DEADLINE = float(os.getenv("TOPIC_FETCH_DEADLINE", "5"))
+# Unread body left once the parser has its topics is read off (up to this
+# many bytes) so the keep-alive connection can go back to the session's pool
+DRAIN_LIMIT = 64 * 1024
+
+USER_AGENT = "TweetSage/1.0 (+https://github.com/SrLeet03/TweetSage)"
+
+_session = None
+_executor = None
+
+
+def get_session():
+    """
+    Return the process-wide keep-alive session used for topic sources.
+    The session is created on first use and reused across warm invocations.
+    """
+    global _session
+    if _session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=0)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update({"User-Agent": USER_AGENT})
+        _session = session
+    return _session
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="topic-source")
+    return _executor
+
+
+def parse_arxiv_listing(body, limit=5):
+    """Extract (paper title, abstract URL) pairs from an arXiv listing page."""
+    items = extract_items(body, 'div.list-title', limit, link_pattern=r'/abs/')
+    return [(title.replace('Title:', '', 1).strip(), link) for title, link in items]
+
+
+def parse_techcrunch_category(body, limit=5):
+    """Extract (headline, article URL) pairs from a TechCrunch category page."""
+    return extract_items(body, 'h2.post-block__title a', limit)
+
+
+def parse_feed(body, limit=5):
+    """Extract (item title, link) pairs from an RSS or Atom feed."""
+    return extract_feed_items(body, limit)
+
+
+def _split_items(items, base_url):
+    """Split parser output into topics and {topic: absolute URL}."""
+    topics = []
+    links = {}
+    for item in items:
+        if isinstance(item, tuple):
+            item, link = item
+            if link:
+                links[item] = urljoin(base_url, link)
+        topics.append(item)
+    return topics, links
+
+
+class TopicSource:
+    """
+    A pollable topic feed: where to fetch it, how to parse it, and how many
+    topics to keep.
+
+    Each source remembers the ETag / Last-Modified validators and the topics
+    parsed from its last full response, so repeat polls are sent as
+    conditional GETs and a 304 reuses the previous topics without parsing.
+
+    `parser(chunks, limit)` returns titles, or (title, url) pairs; the URLs
+    are kept in `links` as the canonical link for each topic.
+    """
+
+    def __init__(self, name, url, parser, limit=5):
+        self.name = name
+        self.url = url
+        self.parser = parser
+        self.limit = limit
+        self.etag = None
+        self.last_modified = None
+        self.topics = []
+        self.links = {}
+        self.stats = {"hits": 0, "misses": 0, "not_modified": 0}
+        self._lock = threading.Lock()
+
+    def record(self, outcome):
+        with self._lock:
+            self.stats[outcome] += 1
+
+    def conditional_headers(self):
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def fetch(self, session, timeout=SOURCE_TIMEOUT, deadline_at=None):
+        """
+        Fetch and parse this source, returning at most `limit` topics.
+
+        With `deadline_at` (a time.monotonic() value) the request's timeouts
+        are cut to the time left and the body stops being read once it
+        passes, raising requests.Timeout, so the fetch ends on its own.
+        The outcome is counted in `stats` here, whether or not anyone is
+        still waiting for the result.
+        """
+        with get_metrics().span("source_fetch", source=self.name):
+            try:
+                return self._fetch(session, timeout, deadline_at)
+            except Exception:
+                self.record("misses")
+                raise
+
+    def _fetch(self, session, timeout, deadline_at):
+        start = time.monotonic()
+        if deadline_at is not None:
+            remaining = deadline_at - start
+            if remaining <= 0:
+                raise requests.Timeout(f"Deadline passed before {self.name} was fetched")
+            timeout = tuple(min(part, remaining) for part in timeout)
+        # Stream the body so the parser can stop reading once it has `limit` topics
+        with session.get(self.url, headers=self.conditional_headers(),
+                         timeout=timeout, stream=True) as response:
+            if response.status_code == 304 and self.topics:
+                self.record("not_modified")
+                logger.info(f"Topic source {self.name} not modified, reusing {len(self.topics)} topics")
+                return list(self.topics)
+            if response.status_code != 200:
+                self.record("misses")
+                logger.warning(f"Topic source {self.name} returned HTTP {response.status_code}")
+                self._drain(response, deadline_at)
+                return []
+
+            if response.encoding is None:
+                response.encoding = "utf-8"
+            chunks = response.iter_content(chunk_size=CHUNK_SIZE, decode_unicode=True)
+            if deadline_at is not None:
+                chunks = self._until(chunks, deadline_at)
+            # The body is parsed as it streams in, so this includes reading it
+            with get_metrics().span("html_parse", source=self.name):
+                items = self.parser(chunks, limit=self.limit)
+            self._drain(response, deadline_at)
+        topics, links = _split_items(items, self.url)
+
+        if topics:
+            self.etag = response.headers.get("ETag")
+            self.last_modified = response.headers.get("Last-Modified")
+            self.topics = topics
+            self.links = links
+            self.record("hits")
+        else:
+            self.record("misses")
+        logger.info(f"Fetched {len(topics)} topics from {self.name} in {time.monotonic() - start:.2f}s")
+        return topics
+
+    def _drain(self, response, deadline_at):
+        # Closing a response with body left unread closes its connection too;
+        # reading off a small remainder lets urllib3 put it back in the pool
+        drained = 0
+        try:
+            while drained < DRAIN_LIMIT and (deadline_at is None or time.monotonic() < deadline_at):
+                chunk = response.raw.read(CHUNK_SIZE)
+                if not chunk:
+                    return
+                drained += len(chunk)
+        except Exception as e:
+            logger.debug(f"Gave up reading the rest of {self.name}: {str(e)}")
+
+    def _until(self, chunks, deadline_at):
+        # The read timeout bounds each socket read, not the whole body
+        for chunk in chunks:
+            if time.monotonic() > deadline_at:
+                raise requests.Timeout(f"Topic source {self.name} was still sending at the deadline")
+            yield chunk
+
+    def __repr__(self):
+        return f"TopicSource({self.name!r}, {self.url!r})"
+
+
+# Registry of topic sources polled by fetch_topics(), in priority order
+SOURCES = {}
+
+
+def register_source(source):
+    """Add (or replace) a topic source in the registry."""
+    SOURCES[source.name] = source
+    return source
+
+
+def unregister_source(name):
+    return SOURCES.pop(name, None)
+
+
+def topic_links(topics=None):
+    """Return {topic: source URL} for `topics` (default: every topic) from the last fetch of each source."""
+    links = {}
+    for source in SOURCES.values():
+        links.update(source.links)
+    if topics is None:
+        return links
+    return {topic: links[topic] for topic in topics if topic in links}
+
+
+def get_source_stats():
+    """Return {source name: hit/miss/304 counters} for every registered source."""
+    return {name: dict(source.stats) for name, source in SOURCES.items()}
+
+
+register_source(TopicSource("arxiv", "https://arxiv.org/list/cs.AI/recent", parse_arxiv_listing))
+register_source(TopicSource("techcrunch", "https://techcrunch.com/category/artificial-intelligence/", parse_techcrunch_category))
+
+
+def fetch_topics(sources=None, timeout=SOURCE_TIMEOUT, deadline=FETCH_DEADLINE):
+    """
+    Fetch all topic sources in parallel over the shared session.
+
+    Args:
+        sources: Iterable of TopicSource objects, defaults to the registry
+        timeout: Per-source requests (connect, read) timeout, cut to the time left
+        deadline: Overall wall-clock budget in seconds for the whole round
+
+    Returns:
+        tuple: (topics in source order, names of the sources that failed,
+        came back empty or missed the deadline). Those sources contribute
+        nothing; they never hold up the others.
+    """
+    sources = list(sources if sources is not None else SOURCES.values())
+    session = get_session()
+    executor = _get_executor()
+    # Each fetch is given the deadline too, so a slow source's request times
+    # out by itself rather than keeping a pool thread busy after we move on
+    deadline_at = time.monotonic() + deadline
+    futures = [executor.submit(source.fetch, session, timeout, deadline_at) for source in sources]
+    done, not_done = wait(futures, timeout=deadline)
+
+    topics = []
+    failed = []
+    for source, future in zip(sources, futures):
+        if future in not_done:
+            # Its stats are updated when its own timeouts end the request
+            failed.append(source.name)
+            logger.warning(f"Topic source {source.name} missed the {deadline}s deadline")
+            continue
+        try:
+            source_topics = future.result()
+        except Exception as e:
+            logger.error(f"Error fetching topics from {source.name}: {str(e)}")
+            source_topics = []
+        if not source_topics:
+            failed.append(source.name)
+        topics.extend(source_topics)
+    return topics, failed
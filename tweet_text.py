@@ -0,0 +1,185 @@
+import re
+import unicodedata
+
+# X's counting rules (twitter-text v3 configuration): code points in the
+# LIGHT_RANGES weigh 1, everything else 2; each URL counts as a t.co link of
+# URL_LENGTH whatever its real length; an emoji sequence (ZWJ families, skin
+# tones, flags, keycaps) weighs 2 as a whole. Text is counted in NFC.
+MAX_WEIGHTED_LENGTH = 280
+URL_LENGTH = 23
+LIGHT_WEIGHT = 1
+HEAVY_WEIGHT = 2
+EMOJI_WEIGHT = 2
+LIGHT_RANGES = ((0x0000, 0x10FF), (0x2000, 0x200D), (0x2010, 0x201F), (0x2032, 0x2037))
+
+ELLIPSIS = "…"
+
+# Everything outside the light ranges
+_HEAVY = re.compile("[^" + "".join(f"\\u{low:04x}-\\u{high:04x}" for low, high in LIGHT_RANGES) + "]")
+
+# Top-level domains recognised in links written without a scheme, e.g.
+# "arxiv.org/abs/1234"; X links those too, and each costs URL_LENGTH
+_TLDS = ("com|org|net|edu|gov|io|ai|dev|app|co|me|ly|tv|gg|so|xyz|info|tech|news|blog|uk|us|de|fr|ca|eu|in|jp|"
+         "cn|au|ch|nl|se|no|es|it|ru|br|ml|to|sh|fm|am|is")
+_URL_TAIL = r"(?:[/?#][^\s<>\"]*[^\s<>\".,;:!?)'\]])?"
+_URL = (r"(?:https?://|www\.)[^\s<>\"]*[^\s<>\".,;:!?)'\]]"
+        r"|(?<![@\w.-])(?:[a-z0-9](?:[a-z0-9-]*[a-z0-9])?\.)+(?:" + _TLDS + r")(?![\w-])" + _URL_TAIL)
+
+_PICTOGRAPHS = ("\u203c\u2049\u2122\u2139\u2194-\u2199\u21a9\u21aa\u231a\u231b\u2328\u23cf\u23e9-\u23f3"
+                "\u23f8-\u23fa\u24c2\u25aa\u25ab\u25b6\u25c0\u25fb-\u25fe\u2600-\u27bf\u2934\u2935"
+                "\u2b05-\u2b07\u2b1b\u2b1c\u2b50\u2b55\u3030\u303d\u3297\u3299"
+                "\U0001f000-\U0001f1e5\U0001f200-\U0001f3fa\U0001f400-\U0001faff")
+_SKIN_TONES = "\U0001f3fb-\U0001f3ff"
+_EMOJI_ELEMENT = (f"(?:[{_PICTOGRAPHS}][\ufe0e\ufe0f]?[{_SKIN_TONES}]?"
+                  f"|[\u00a9\u00ae]\ufe0f|[{_SKIN_TONES}])")
+_EMOJI = (f"(?:[\U0001f1e6-\U0001f1ff]{{2}}|[0-9#*]\ufe0f?\u20e3"
+          f"|{_EMOJI_ELEMENT}[\U000e0020-\U000e007f]*(?:\u200d{_EMOJI_ELEMENT})*)")
+
+_URL_RE = re.compile(_URL, re.IGNORECASE)
+# Cheap scan of the lowercased text for where a URL might be; only the words
+# around hits are matched against _URL_RE. (IGNORECASE makes it 2-3x slower.)
+_URL_HINT = re.compile(r"\.(?:" + _TLDS + r")\b|://|www\.")
+_WORD_END = re.compile(r"\S*")
+_EMOJI_RE = re.compile(_EMOJI)
+# A single-code-point emoji already weighs HEAVY_WEIGHT; only sequences, which
+# contain one of these, need counting as emoji
+_EMOJI_SEQUENCE_HINT = re.compile("[\u200d\ufe0e\ufe0f\u20e3\U0001f1e6-\U0001f1ff\U0001f3fb-\U0001f3ff"
+                                  "\U000e0020-\U000e007f]")
+_CLUSTER_START = re.compile(f"{_EMOJI}|.", re.DOTALL)
+_ASCII_RUN = re.compile("[\x00-\x7f]+")
+# Code points that attach to the cluster before them
+_JOINERS = set("\u200d\ufe0e\ufe0f\u20e3")
+
+
+def _url_spans(text):
+    """(start, end) of each URL in `text`."""
+    spans = []
+    position = 0
+    lowered = text.lower()
+    if len(lowered) != len(text):
+        # A few characters lowercase to two; keep those as they are so offsets line up
+        lowered = "".join(char if len(char.lower()) != 1 else char.lower() for char in text)
+    for hint in _URL_HINT.finditer(lowered):
+        if hint.start() < position:
+            continue
+        start = max(text.rfind(" ", 0, hint.start()), text.rfind("\n", 0, hint.start())) + 1
+        end = _WORD_END.match(text, hint.start()).end()
+        match = _URL_RE.search(text, start, end)
+        if match:
+            spans.append(match.span())
+        position = end
+    return spans
+
+
+def _text_length(text):
+    """Weighted length of text without URLs."""
+    if text.isascii():
+        return len(text)
+    emoji = 0
+    if _EMOJI_SEQUENCE_HINT.search(text):
+        text, emoji = _EMOJI_RE.subn("", text)
+    heavy = len(_HEAVY.findall(text))
+    return len(text) + (HEAVY_WEIGHT - LIGHT_WEIGHT) * heavy + EMOJI_WEIGHT * emoji
+
+
+def weighted_length(text):
+    """Length of `text` as X counts it against MAX_WEIGHTED_LENGTH."""
+    if not text.isascii():
+        text = unicodedata.normalize("NFC", text)
+    elif "." not in text:
+        # No URL can be in it: the common case costs one pass
+        return len(text)
+    length = 0
+    position = 0
+    for start, end in _url_spans(text):
+        length += _text_length(text[position:start]) + URL_LENGTH
+        position = end
+    return length + _text_length(text[position:])
+
+
+def is_valid(text, limit=MAX_WEIGHTED_LENGTH):
+    """Whether X would accept `text` as a post of at most `limit` weighted characters."""
+    return bool(text.strip()) and weighted_length(text) <= limit
+
+
+def _attaches(char):
+    return char in _JOINERS or unicodedata.category(char)[0] == "M"
+
+
+def _pieces(text, start, end):
+    """
+    Yield (start, end, weight, divisible) for the pieces text[start:end] may
+    be cut between: runs of ASCII, which can be cut anywhere, and grapheme
+    clusters, which cannot.
+    """
+    position = start
+    while position < end:
+        run = _ASCII_RUN.match(text, position, end)
+        if run:
+            run_end = run.end()
+            if run_end < end and _attaches(text[run_end]):
+                # The last ASCII character carries a mark or is a keycap base
+                run_end -= 1
+            if run_end > position:
+                yield position, run_end, run_end - position, True
+                position = run_end
+                continue
+        cluster_end = _CLUSTER_START.match(text, position, end).end()
+        while cluster_end < end and _attaches(text[cluster_end]):
+            cluster_end += 1
+            if text[cluster_end - 1] == "\u200d":
+                # Joined to the next character too
+                cluster_end = _CLUSTER_START.match(text, cluster_end, end).end() if cluster_end < end else end
+        yield position, cluster_end, _text_length(text[position:cluster_end]), False
+        position = cluster_end
+
+
+def truncate(text, limit=MAX_WEIGHTED_LENGTH, ellipsis=ELLIPSIS):
+    """
+    Shorten `text` to at most `limit` weighted characters, ending it with
+    `ellipsis` if anything was cut.
+
+    Text is cut at the last word boundary, unless that would drop more than
+    half of what fits; then at a grapheme boundary. URLs, emoji sequences
+    and combining marks are never split, and a hashtag or mention cut short
+    is dropped rather than posted half.
+
+    Args:
+        text: The text to fit
+        limit: Maximum weighted length of the result
+        ellipsis: Appended to truncated text (counts towards `limit`)
+
+    Returns:
+        str: `text` unchanged if it fits, else the truncated NFC text
+    """
+    if weighted_length(text) <= limit:
+        return text
+    text = unicodedata.normalize("NFC", text)
+    budget = limit - weighted_length(ellipsis)
+
+    def pieces():
+        position = 0
+        for start, end in _url_spans(text):
+            yield from _pieces(text, position, start)
+            yield start, end, URL_LENGTH, False
+            position = end
+        yield from _pieces(text, position, len(text))
+
+    used = 0
+    cut_at = 0
+    for start, end, weight, divisible in pieces():
+        if used + weight > budget:
+            if divisible:
+                cut_at = start + budget - used
+            break
+        used += weight
+        cut_at = end
+
+    cut = text[:cut_at]
+    if cut_at < len(text) and not text[cut_at].isspace():
+        # Cut inside a word: back off to where it starts
+        boundary = max(cut.rfind(" "), cut.rfind("\n"))
+        word = cut[boundary + 1:]
+        if boundary >= len(cut) // 2 or word[:1] in ("#", "@", "$"):
+            cut = cut[:boundary + 1] if boundary >= 0 else ""
+    return cut.rstrip() + ellipsis